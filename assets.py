@@ -0,0 +1,354 @@
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+
+import pygame
+
+from world import SoundEvent
+
+IMAGE_PATH = 'resources/images/'
+SOUND_PATH = 'resources/sounds/'
+CACHE_PATH = 'resources/cache/'
+
+# 캐시 형식을 바꾸면 올려서 예전 캐시를 버린다
+CACHE_VERSION = 3
+
+# 이미지 리스트 이름과 프레임 수
+# 리스트의 0번은 그리지 않는 프레임이라 None으로 비워둔다
+IMAGE_FRAME_COUNTS = {
+    'background': 0,
+    'heart': 2,
+    'line': 0,
+    'line_safe_zone': 0,
+    'rod': 0,
+    'effect': 5,
+    'enemy': 2,
+    'player': 3,
+    'man': 3,
+    'woman': 3,
+}
+
+# 아틀라스에 넣지 않고 따로 저장하는 큰 이미지
+SEPARATE_IMAGE_NAMES = ('background',)
+
+ATLAS_WIDTH = 256
+ATLAS_PADDING = 1
+
+ATLAS_FILE = 'atlas.rgba'
+IMAGE_MANIFEST_FILE = 'images.json'
+SOUND_MANIFEST_FILE = 'sounds.json'
+
+
+def get_image_paths(name):
+    frame_count = IMAGE_FRAME_COUNTS[name]
+    if frame_count == 0:
+        return [IMAGE_PATH + name + '.png']
+    return [IMAGE_PATH + name + str(i) + '.png' for i in range(1, frame_count + 1)]
+
+
+# 원본 파일을 읽지 않고 (경로, 수정 시간, 크기)로 만드는 가벼운 캐시 키
+# 이 키가 그대로면 캐시를 바로 쓰고, 바뀌었을 때만 내용 해시로 정말 바뀌었는지 본다
+def calc_stat_key(path_list, extra=''):
+    stat_key = [extra]
+    for path in path_list:
+        stat = os.stat(path)
+        stat_key.append([path, stat.st_mtime_ns, stat.st_size])
+    return stat_key
+
+
+# 파일 내용으로 캐시 키를 만든다
+def calc_content_hash(path_list, extra=''):
+    sha = hashlib.sha256(('%d:%s' % (CACHE_VERSION, extra)).encode())
+    for path in path_list:
+        sha.update(path.encode())
+        with open(path, 'rb') as file:
+            sha.update(file.read())
+    return sha.hexdigest()
+
+
+# 다른 캐시 형식으로 만든 매니페스트는 없는 것으로 본다
+def read_manifest(file_name):
+    try:
+        with open(CACHE_PATH + file_name, encoding='utf-8') as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or manifest.get('version') != CACHE_VERSION:
+        return None
+    return manifest
+
+
+# 캐시 파일은 임시 파일에 다 쓴 뒤 바꿔 넣는다
+# 여러 프로세스가 동시에 캐시를 만들어도 읽는 쪽은 반쯤 쓰인 파일을 보지 않는다
+def write_cache_file(file_name, data):
+    os.makedirs(CACHE_PATH, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=CACHE_PATH, prefix=file_name + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+        os.replace(temp_path, CACHE_PATH + file_name)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+# 매니페스트는 캐시 파일을 모두 쓴 다음에 마지막으로 쓴다
+def write_manifest(file_name, manifest):
+    manifest['version'] = CACHE_VERSION
+    write_cache_file(file_name, json.dumps(manifest).encode('utf-8'))
+
+
+# 높이가 큰 순서로 선반(shelf) 방식으로 배치한다
+def pack_frames(size_list, atlas_width=ATLAS_WIDTH):
+    atlas_width = max([atlas_width] + [width for width, height in size_list])
+    order = sorted(range(len(size_list)), key=lambda i: -size_list[i][1])
+    position_list = [None] * len(size_list)
+    pos_x = 0
+    pos_y = 0
+    shelf_height = 0
+
+    for i in order:
+        width, height = size_list[i]
+        if pos_x + width > atlas_width:
+            pos_x = 0
+            pos_y += shelf_height + ATLAS_PADDING
+            shelf_height = 0
+        position_list[i] = (pos_x, pos_y)
+        pos_x += width + ATLAS_PADDING
+        shelf_height = max(shelf_height, height)
+
+    return position_list, (atlas_width, pos_y + shelf_height)
+
+
+# .aseprite 원본이 있고 aseprite가 설치되어 있으면 PNG로 내보낸다
+def export_aseprite_sources():
+    aseprite = shutil.which('aseprite')
+    if aseprite is None:
+        return False
+
+    for name in IMAGE_FRAME_COUNTS:
+        source_path = IMAGE_PATH + name + '.aseprite'
+        if not os.path.exists(source_path):
+            continue
+
+        if IMAGE_FRAME_COUNTS[name] == 0:
+            save_path = IMAGE_PATH + name + '.png'
+        else:
+            save_path = IMAGE_PATH + name + '{frame1}.png'
+        subprocess.run([aseprite, '--batch', source_path, '--save-as', save_path], check=True)
+
+    return True
+
+
+# 이미지 원본이 바뀌었을 때만 아틀라스와 큰 이미지 캐시를 다시 만든다
+# 시작할 때는 원본의 파일 정보만 보고, 정보가 바뀐 경우에만 원본을 읽어 내용 해시를 비교한다
+def build_image_cache(force=False):
+    path_list = []
+    for name in IMAGE_FRAME_COUNTS:
+        path_list += get_image_paths(name)
+    stat_key = calc_stat_key(path_list)
+
+    manifest = read_manifest(IMAGE_MANIFEST_FILE)
+    if not force and manifest is not None and manifest['stat_key'] == stat_key:
+        return manifest
+
+    # 체크아웃이나 복사로 시간만 바뀌었으면 키만 고쳐 쓰고 캐시는 그대로 쓴다
+    content_hash = calc_content_hash(path_list)
+    if not force and manifest is not None and manifest['hash'] == content_hash:
+        manifest['stat_key'] = stat_key
+        write_manifest(IMAGE_MANIFEST_FILE, manifest)
+        return manifest
+
+    frame_list = []
+    for name in IMAGE_FRAME_COUNTS:
+        if name in SEPARATE_IMAGE_NAMES:
+            continue
+        for path in get_image_paths(name):
+            frame_list.append((name, pygame.image.load(path)))
+
+    position_list, atlas_size = pack_frames([image.get_size() for name, image in frame_list])
+    atlas = pygame.Surface(atlas_size, pygame.SRCALPHA)
+    frames = {}
+    for (name, image), position in zip(frame_list, position_list):
+        atlas.blit(image, position)
+        frames.setdefault(name, []).append([position[0], position[1], image.get_width(), image.get_height()])
+
+    write_cache_file(ATLAS_FILE, pygame.image.tobytes(atlas, 'RGBA'))
+
+    separate = {}
+    for name in SEPARATE_IMAGE_NAMES:
+        image = pygame.image.load(get_image_paths(name)[0])
+        write_cache_file(name + '.rgba', pygame.image.tobytes(image, 'RGBA'))
+        separate[name] = list(image.get_size())
+
+    manifest = {
+        'stat_key': stat_key,
+        'hash': content_hash,
+        'atlas_size': list(atlas_size),
+        'frames': frames,
+        'separate': separate,
+    }
+    write_manifest(IMAGE_MANIFEST_FILE, manifest)
+    return manifest
+
+
+# 파일이 없거나 크기가 맞지 않으면 None
+def read_raw_image(file_name, size):
+    try:
+        with open(CACHE_PATH + file_name, 'rb') as file:
+            data = file.read()
+    except OSError:
+        return None
+    if len(data) != size[0] * size[1] * 4:
+        return None
+    return pygame.image.frombytes(data, tuple(size), 'RGBA')
+
+
+# 매니페스트대로 캐시 이미지를 모두 읽는다, 하나라도 못 읽으면 None
+def read_cached_images(manifest):
+    atlas = read_raw_image(ATLAS_FILE, manifest['atlas_size'])
+    if atlas is None:
+        return None
+
+    separate = {}
+    for name, size in manifest['separate'].items():
+        separate[name] = read_raw_image(name + '.rgba', size)
+        if separate[name] is None:
+            return None
+    return atlas, separate
+
+
+# PNG를 하나씩 읽어서 이미지 리스트를 만든다
+def load_image_files():
+    image_lists = {}
+
+    for name in IMAGE_FRAME_COUNTS:
+        image_lists[name] = [None] + [pygame.image.load(path) for path in get_image_paths(name)]
+
+    return image_lists
+
+
+# 이미지 로드
+# 캐시된 아틀라스 하나와 배경만 읽고, 각 프레임은 아틀라스의 서브서피스로 나눠준다
+# convert는 화면이 있을 때만 가능하므로 헤드리스 모드에서는 False로 둔다
+def load_image_lists(convert=False, use_cache=True):
+    if not use_cache:
+        image_lists = load_image_files()
+        if convert:
+            for image_list in image_lists.values():
+                image_list[1:] = [image.convert_alpha() for image in image_list[1:]]
+        return image_lists
+
+    manifest = build_image_cache()
+    cached_images = read_cached_images(manifest)
+    if cached_images is None:
+        # 매니페스트와 맞지 않는 캐시 파일은 다시 만든다
+        manifest = build_image_cache(force=True)
+        cached_images = read_cached_images(manifest)
+    atlas, separate = cached_images
+    if convert:
+        atlas = atlas.convert_alpha()
+
+    image_lists = {}
+    for name, rect_list in manifest['frames'].items():
+        image_lists[name] = [None] + [atlas.subsurface(rect) for rect in rect_list]
+
+    for name, image in separate.items():
+        if convert:
+            image = image.convert_alpha()
+        image_lists[name] = [None, image]
+
+    return image_lists
+
+
+# 디코딩된 사운드 샘플을 캐시해두고 다음부터는 그대로 읽는다
+# 믹서 형식(주파수, 포맷, 채널)이 바뀌면 다시 디코딩한다
+def load_sound(file_name, use_cache=True):
+    path = SOUND_PATH + file_name
+    if not use_cache:
+        return pygame.mixer.Sound(path)
+
+    mixer_format = str(pygame.mixer.get_init())
+    stat_key = calc_stat_key([path], mixer_format)
+    cache_file = CACHE_PATH + file_name + '.pcm'
+
+    # 파일 정보가 같으면 원본은 열지 않는다
+    manifest = read_manifest(SOUND_MANIFEST_FILE) or {}
+    entry = manifest.get(file_name)
+    is_cached = entry is not None and os.path.exists(cache_file) and os.path.getsize(cache_file) == entry['size']
+    if is_cached and entry['stat_key'] != stat_key:
+        content_hash = calc_content_hash([path], mixer_format)
+        is_cached = entry['hash'] == content_hash
+        if is_cached:
+            entry['stat_key'] = stat_key
+            write_manifest(SOUND_MANIFEST_FILE, manifest)
+
+    if is_cached:
+        with open(cache_file, 'rb') as file:
+            return pygame.mixer.Sound(buffer=file.read())
+
+    sound = pygame.mixer.Sound(path)
+    raw = sound.get_raw()
+    write_cache_file(file_name + '.pcm', raw)
+    manifest[file_name] = {'stat_key': stat_key, 'hash': calc_content_hash([path], mixer_format), 'size': len(raw)}
+    write_manifest(SOUND_MANIFEST_FILE, manifest)
+    return sound
+
+
+# pygame 믹서로 실제 소리를 내는 사운드 플레이어
+class SoundPlayer:
+    def __init__(self, use_cache=True):
+        self.voice_sound = load_sound('voice.wav', use_cache)
+        self.voice_length = self.voice_sound.get_length()
+
+        self.heartbeat_sound_slow = load_sound('heart_beat_slow.wav', use_cache)
+        self.heartbeat_sound_fast = load_sound('heart_beat_fast.wav', use_cache)
+
+        self.gunshot_sound_list = []
+        for i in range(1, 7):
+            self.gunshot_sound_list.append(load_sound('bang' + str(i) + '.ogg', use_cache))
+
+        self.clear_sound = load_sound('clear.wav', use_cache)
+
+    def get_sound(self, sound_event, index=0):
+        if sound_event == SoundEvent.voice:
+            return self.voice_sound
+        elif sound_event == SoundEvent.heartbeat_slow:
+            return self.heartbeat_sound_slow
+        elif sound_event == SoundEvent.heartbeat_fast:
+            return self.heartbeat_sound_fast
+        elif sound_event == SoundEvent.gunshot:
+            return self.gunshot_sound_list[index]
+        return self.clear_sound
+
+    def play(self, sound_event, index=0):
+        self.get_sound(sound_event, index).play()
+
+    def stop(self, sound_event):
+        if sound_event == SoundEvent.gunshot:
+            for sound in self.gunshot_sound_list:
+                sound.stop()
+        else:
+            self.get_sound(sound_event).stop()
+
+
+# 에셋 캐시를 미리 만든다: python assets.py
+def main():
+    if export_aseprite_sources():
+        print('exported .aseprite sources')
+
+    manifest = build_image_cache(force=True)
+    print('atlas %dx%d, %d sprite lists' % (manifest['atlas_size'][0], manifest['atlas_size'][1],
+                                            len(manifest['frames'])))
+
+    pygame.mixer.init()
+    for file_name in os.listdir(SOUND_PATH):
+        load_sound(file_name)
+    print('sound cache ready')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+import queue
+import threading
+import time
+
+import pygame
+
+from world import SoundEvent
+
+# 믹서 채널을 이 개수만큼 예약해서 직접 나눠 쓴다
+CHANNEL_COUNT = 8
+
+# 사운드별 (우선순위, 동시에 낼 수 있는 최대 개수, 최소 재생 간격(초))
+# 채널이 모자라면 우선순위가 낮은 소리부터 끊는다
+SOUND_RULES = {
+    SoundEvent.voice: (3, 1, 0),
+    SoundEvent.clear: (3, 1, 0),
+    SoundEvent.heartbeat_slow: (2, 1, 0),
+    SoundEvent.heartbeat_fast: (2, 1, 0),
+    SoundEvent.gunshot: (1, 4, 0.06),
+}
+
+COMMAND_PLAY = 0
+COMMAND_STOP = 1
+
+
+# SoundPlayer 앞에 붙는 채널 풀
+# play, stop은 한 프레임 동안 모아두었다가 flush에서 한 번에 넘기고, 실제 믹서 호출은 오디오 스레드에서 한다
+# 같은 프레임에 같은 소리가 여러 번 불리면 한 번만 낸다
+class VoicePool:
+    def __init__(self, sound_player, channel_count=CHANNEL_COUNT, use_thread=True):
+        self.sound_player = sound_player
+        pygame.mixer.set_num_channels(max(pygame.mixer.get_num_channels(), channel_count))
+        pygame.mixer.set_reserved(channel_count)
+        self.channel_list = [pygame.mixer.Channel(i) for i in range(channel_count)]
+
+        # 채널별 (사운드, 우선순위, 시작 시간), 오디오 스레드에서만 바꾼다
+        self.channel_state_list = [None] * channel_count
+        self.last_play_time_dict = {}
+
+        self.command_list = []
+        self.pending_play_dict = {}
+
+        self.merged_count = 0
+        self.limited_count = 0
+        self.stolen_count = 0
+        self.dropped_count = 0
+
+        self.command_queue = None
+        self.thread = None
+        if use_thread:
+            self.command_queue = queue.SimpleQueue()
+            self.thread = threading.Thread(target=self.run, name='audio', daemon=True)
+            self.thread.start()
+
+    def play(self, sound_event, index=0):
+        if sound_event in self.pending_play_dict:
+            self.merged_count += 1
+            return
+        self.pending_play_dict[sound_event] = index
+        self.command_list.append((COMMAND_PLAY, sound_event, index))
+
+    # 아직 넘기지 않은 같은 소리의 재생은 취소한다
+    def stop(self, sound_event):
+        if sound_event in self.pending_play_dict:
+            del self.pending_play_dict[sound_event]
+            self.command_list = [command for command in self.command_list
+                                 if command[0] != COMMAND_PLAY or command[1] != sound_event]
+        self.command_list.append((COMMAND_STOP, sound_event, 0))
+
+    # 매 프레임 한 번 불러서 모아둔 명령을 넘긴다
+    def flush(self):
+        if not self.command_list:
+            return
+        command_list = self.command_list
+        self.command_list = []
+        self.pending_play_dict = {}
+
+        if self.command_queue is not None:
+            self.command_queue.put(command_list)
+        else:
+            self.execute(command_list)
+
+    def close(self):
+        self.flush()
+        if self.thread is not None:
+            self.command_queue.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        while True:
+            command_list = self.command_queue.get()
+            if command_list is None:
+                return
+            self.execute(command_list)
+
+    def execute(self, command_list):
+        for command, sound_event, index in command_list:
+            if command == COMMAND_PLAY:
+                self.start_sound(sound_event, index)
+            else:
+                self.stop_sound(sound_event)
+
+    # 같은 소리가 최대 개수만큼 나고 있으면 가장 오래된 것을, 아니면 빈 채널을,
+    # 빈 채널이 없으면 우선순위가 더 낮은 것 중 가장 오래된 것을 쓴다
+    def find_channel(self, sound_event, priority, max_voice_count):
+        same_list = []
+        free_index = None
+        steal_index = None
+        for i, channel in enumerate(self.channel_list):
+            channel_state = self.channel_state_list[i]
+            if channel_state is None or not channel.get_busy():
+                if free_index is None:
+                    free_index = i
+                continue
+            if channel_state[0] == sound_event:
+                same_list.append(i)
+            if channel_state[1] < priority:
+                if steal_index is None or channel_state[1:] < self.channel_state_list[steal_index][1:]:
+                    steal_index = i
+
+        if len(same_list) >= max_voice_count:
+            return min(same_list, key=lambda i: self.channel_state_list[i][2])
+        if free_index is not None:
+            return free_index
+        if steal_index is not None:
+            self.stolen_count += 1
+        return steal_index
+
+    def start_sound(self, sound_event, index):
+        priority, max_voice_count, min_interval = SOUND_RULES[sound_event]
+        now = time.perf_counter()
+        if now - self.last_play_time_dict.get(sound_event, -min_interval) < min_interval:
+            self.limited_count += 1
+            return
+
+        channel_index = self.find_channel(sound_event, priority, max_voice_count)
+        if channel_index is None:
+            self.dropped_count += 1
+            return
+
+        self.last_play_time_dict[sound_event] = now
+        self.channel_state_list[channel_index] = (sound_event, priority, now)
+        self.channel_list[channel_index].play(self.sound_player.get_sound(sound_event, index))
+
+    def stop_sound(self, sound_event):
+        for i, channel_state in enumerate(self.channel_state_list):
+            if channel_state is not None and channel_state[0] == sound_event:
+                self.channel_list[i].stop()
+                self.channel_state_list[i] = None
@@ -0,0 +1,179 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+# 창과 소리 없이 돌린다
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+
+from assets import load_image_lists
+from render import BandedRenderer, DirtyRenderer
+from simulate import runner_policy
+from text import GlyphText
+from world import SCREEN_WIDTH, SCREEN_HEIGHT, World
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+BASELINE_PATH = 'benchmark_baseline.json'
+
+FRAME_TIME = 1 / 60
+CROWD_SIZE_LIST = [120, 1000, 10000]
+PHASE_LIST = ['update', 'collision', 'render', 'timer_text']
+PERCENTILE_LIST = [50, 95, 99]
+
+# 기준값보다 이 비율 이상 느려지면 실패로 본다
+REGRESSION_THRESHOLD = 0.25
+
+# 원래 아주 짧은 단계는 측정 오차가 비율로 크게 보이므로 이 시간(ms) 이하의 차이는 무시한다
+MIN_REGRESSION_TIME = 0.05
+
+
+def calc_percentile(sorted_list, percent):
+    index = min(int(len(sorted_list) * percent / 100), len(sorted_list) - 1)
+    return sorted_list[index]
+
+
+# 한 군중 크기에서 프레임마다 단계별 소요 시간을 잰다
+# 게임 화면과 같이 고정된 시드, 같은 입력으로 진행하고 dirty rect 렌더러로 그린다
+# render_threads를 주면 dirty rect 렌더러 대신 띠 렌더러로 그린다
+def run_benchmark(image_lists, screen, timer_font, crowd_size, crowd_backend, frame_count, warmup_count, seed,
+                  render_threads=None):
+    world = World(image_lists, seed=seed, player_count=crowd_size, crowd_backend=crowd_backend)
+    world.run_until_time_over = True
+    if render_threads is not None:
+        renderer = BandedRenderer(world, image_lists['background'][1], render_threads or None)
+    else:
+        renderer = DirtyRenderer(world, image_lists['background'][1])
+    timer_rect = pygame.Rect(SCREEN_WIDTH - 220, 15, 220, timer_font.get_linesize())
+    timer_text_renderer = GlyphText(timer_font, (203, 36, 89))
+    timer_text_renderer.render('TIME : 0123456789.')
+
+    time_lists = {phase: [] for phase in PHASE_LIST}
+    perf_counter = time.perf_counter
+
+    for frame_index in range(warmup_count + frame_count):
+        if world.is_over:
+            seed += 1
+            world.reset(seed)
+            renderer.invalidate()
+
+        key_state = runner_policy(world)
+
+        start_time = perf_counter()
+        world.advance_time(FRAME_TIME, key_state)
+        world.update_objects()
+        update_time = perf_counter()
+        world.update_collision()
+        collision_time = perf_counter()
+        renderer.render(screen, [timer_rect])
+        render_time = perf_counter()
+        timer_text = timer_text_renderer.render('TIME : ' + str(round(world.config.remain_time - world.game_timer, 2)))
+        screen.blit(timer_text, (SCREEN_WIDTH - 220, 15))
+        end_time = perf_counter()
+
+        if frame_index < warmup_count:
+            continue
+
+        time_lists['update'].append(update_time - start_time)
+        time_lists['collision'].append(collision_time - update_time)
+        time_lists['render'].append(render_time - collision_time)
+        time_lists['timer_text'].append(end_time - render_time)
+
+    if render_threads is not None:
+        renderer.close()
+
+    result = {}
+    for phase, time_list in time_lists.items():
+        time_list.sort()
+        result[phase] = {'p%d' % percent: round(calc_percentile(time_list, percent) * 1000, 4)
+                         for percent in PERCENTILE_LIST}
+    return result
+
+
+# 기준값과 비교해서 느려진 단계를 (키, 단계, 기준, 현재) 리스트로 돌려준다
+def find_regressions(result_dict, baseline_dict, metric, threshold):
+    regression_list = []
+    for key, result in result_dict.items():
+        baseline = baseline_dict.get(key)
+        if baseline is None:
+            continue
+        for phase, stats in result.items():
+            if phase not in baseline:
+                continue
+            baseline_value = baseline[phase][metric]
+            if stats[metric] > baseline_value * (1 + threshold) and \
+                    stats[metric] - baseline_value > MIN_REGRESSION_TIME:
+                regression_list.append((key, phase, baseline_value, stats[metric]))
+    return regression_list
+
+
+def main():
+    parser = argparse.ArgumentParser(description='단계별 프레임 시간을 재고 기준값과 비교한다')
+    parser.add_argument('--sizes', type=int, nargs='+', default=CROWD_SIZE_LIST, help='측정할 군중 크기')
+    parser.add_argument('--crowd', choices=['object', 'numpy'], default='numpy' if numpy is not None else 'object')
+    parser.add_argument('--frames', type=int, default=600)
+    parser.add_argument('--warmup', type=int, default=60)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--metric', choices=['p%d' % percent for percent in PERCENTILE_LIST], default='p95',
+                        help='기준값과 비교할 백분위수')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help='이 비율 이상 느려지면 실패 (0.25 = 25%%)')
+    parser.add_argument('--save', action='store_true', help='이번 결과를 기준값으로 저장')
+    parser.add_argument('--render-threads', metavar='N', type=int,
+                        help='띠 렌더러를 N개 스레드로 쓴다 (0이면 코어 수), 결과는 따로 저장된다')
+    args = parser.parse_args()
+
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    image_lists = load_image_lists(convert=True)
+    timer_font = pygame.font.Font('resources/fonts/LAB디지털.ttf', 40)
+
+    baseline_dict = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline_dict = json.load(file)
+
+    result_dict = {}
+    for crowd_size in args.sizes:
+        key = '%s/%d' % (args.crowd, crowd_size)
+        if args.render_threads is not None:
+            key += '/banded%d' % args.render_threads
+        result_dict[key] = run_benchmark(image_lists, screen, timer_font, crowd_size, args.crowd, args.frames,
+                                         args.warmup, args.seed, args.render_threads)
+
+        print(key)
+        for phase, stats in result_dict[key].items():
+            line = '  %-10s' % phase + ''.join('  %s %8.3f ms' % (name, value) for name, value in stats.items())
+            baseline = baseline_dict.get(key, {}).get(phase)
+            if baseline is not None:
+                line += '  (baseline %s %.3f ms)' % (args.metric, baseline[args.metric])
+            print(line)
+
+    pygame.quit()
+
+    if args.save:
+        baseline_dict.update(result_dict)
+        with open(args.baseline, 'w', encoding='utf-8') as file:
+            json.dump(baseline_dict, file, indent=2, sort_keys=True)
+            file.write('\n')
+        print('saved baseline to ' + args.baseline)
+        return
+
+    regression_list = find_regressions(result_dict, baseline_dict, args.metric, args.threshold)
+    for key, phase, baseline_value, value in regression_list:
+        print('REGRESSION %s %s: %s %.3f ms -> %.3f ms (+%.0f%%)'
+              % (key, phase, args.metric, baseline_value, value, (value / baseline_value - 1) * 100))
+    if regression_list:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
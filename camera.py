@@ -0,0 +1,142 @@
+from collections import OrderedDict
+
+import pygame
+
+# 배경 타일 한 장의 크기
+TILE_SIZE = 256
+
+# 만들어둔 타일을 이 개수까지 들고 있다가 넘으면 가장 오래 안 쓴 것부터 버린다
+MAX_TILE_COUNT = 64
+
+# 필드가 배경 그림보다 길면 결승선 쪽(위)과 출발선 쪽(아래)은 그대로 두고 그 사이 빈 땅을 반복한다
+FINISH_AREA_HEIGHT = 100
+START_AREA_HEIGHT = 40
+
+# 필드가 배경 그림보다 넓으면 그림을 가운데 두고 양옆은 왼쪽 끝의 빈 땅 폭만큼을 반복한다
+SIDE_BAND_WIDTH = 200
+
+
+# 필드 좌표 하나가 배경 그림의 어느 좌표에서 오는지
+def calc_source_y(pos_y, field_height, image_height):
+    if field_height <= image_height or pos_y < FINISH_AREA_HEIGHT:
+        return pos_y
+    if pos_y >= field_height - START_AREA_HEIGHT:
+        return pos_y - (field_height - image_height)
+    return FINISH_AREA_HEIGHT + (pos_y - FINISH_AREA_HEIGHT) % (image_height - FINISH_AREA_HEIGHT - START_AREA_HEIGHT)
+
+
+def calc_source_x(pos_x, field_width, image_width):
+    pos_x -= (field_width - image_width) // 2
+    if 0 <= pos_x < image_width:
+        return pos_x
+    return pos_x % SIDE_BAND_WIDTH
+
+
+# start부터 end까지를 배경 그림에서 이어지는 구간별 (필드 좌표, 그림 좌표, 길이)로 나눈다
+def calc_source_runs(start, end, calc_source):
+    run_list = []
+    for pos in range(start, end):
+        source = calc_source(pos)
+        if run_list and run_list[-1][1] + run_list[-1][2] == source:
+            run_list[-1][2] += 1
+        else:
+            run_list.append([pos, source, 1])
+    return run_list
+
+
+# 배경 그림 한 장을 필드 크기만큼 늘려서 타일 단위로 나눠 그린다
+# 타일은 처음 보일 때 만들고, 그림에서 한 조각으로 이어지는 타일은 복사하지 않고 서브서피스로 쓴다
+class TiledBackground:
+    def __init__(self, image, field_width, field_height, tile_size=TILE_SIZE):
+        self.image = image
+        self.field_width = field_width
+        self.field_height = field_height
+        self.tile_size = tile_size
+        self.field_rect = pygame.Rect(0, 0, field_width, field_height)
+        self.tile_dict = OrderedDict()
+
+    def get_tile(self, tile_x, tile_y):
+        key = (tile_x, tile_y)
+        tile = self.tile_dict.get(key)
+        if tile is not None:
+            self.tile_dict.move_to_end(key)
+            return tile
+
+        tile = self.create_tile(self.get_tile_rect(tile_x, tile_y))
+        self.tile_dict[key] = tile
+        if len(self.tile_dict) > MAX_TILE_COUNT:
+            self.tile_dict.popitem(last=False)
+        return tile
+
+    def get_tile_rect(self, tile_x, tile_y):
+        size = self.tile_size
+        return pygame.Rect(tile_x * size, tile_y * size, size, size).clip(self.field_rect)
+
+    def create_tile(self, tile_rect):
+        image_width, image_height = self.image.get_size()
+        x_run_list = calc_source_runs(tile_rect.left, tile_rect.right,
+                                      lambda pos_x: calc_source_x(pos_x, self.field_width, image_width))
+        y_run_list = calc_source_runs(tile_rect.top, tile_rect.bottom,
+                                      lambda pos_y: calc_source_y(pos_y, self.field_height, image_height))
+
+        if len(x_run_list) == 1 and len(y_run_list) == 1:
+            return self.image.subsurface((x_run_list[0][1], y_run_list[0][1], tile_rect.width, tile_rect.height))
+
+        tile = pygame.Surface(tile_rect.size, self.image.get_flags(), self.image)
+        blit_list = []
+        for pos_y, source_y, height in y_run_list:
+            for pos_x, source_x, width in x_run_list:
+                blit_list.append((self.image, (pos_x - tile_rect.left, pos_y - tile_rect.top),
+                                  (source_x, source_y, width, height)))
+        tile.blits(blit_list, False)
+        return tile
+
+    # 화면의 rect 영역에 view_x, view_y에서 본 필드 배경을 그리는 (타일, 위치, 영역) 리스트
+    # 타일 캐시는 여기서만 바뀌므로 다른 스레드에서 그릴 때는 리스트를 먼저 만들어서 넘긴다
+    def get_blit_list(self, view_x, view_y, rect):
+        area = rect.move(view_x, view_y).clip(self.field_rect)
+        if area.width == 0 or area.height == 0:
+            return []
+
+        size = self.tile_size
+        blit_list = []
+        for tile_y in range(area.top // size, (area.bottom - 1) // size + 1):
+            for tile_x in range(area.left // size, (area.right - 1) // size + 1):
+                tile_rect = self.get_tile_rect(tile_x, tile_y)
+                clip_rect = area.clip(tile_rect)
+                blit_list.append((self.get_tile(tile_x, tile_y), (clip_rect.left - view_x, clip_rect.top - view_y),
+                                  clip_rect.move(-tile_rect.left, -tile_rect.top)))
+        return blit_list
+
+    # 화면의 rect 영역에 view_x, view_y에서 본 필드 배경을 그린다, rect가 없으면 화면 전체
+    def blit(self, surface, view_x, view_y, rect=None):
+        if rect is None:
+            rect = surface.get_rect()
+        surface.blits(self.get_blit_list(view_x, view_y, rect), False)
+
+
+# 필드에서 화면에 보이는 영역, 따라가는 좌표를 화면 가운데 두고 필드 밖은 보이지 않게 한다
+# 필드가 화면과 같은 크기면 항상 (0, 0)에 있다
+class Camera:
+    def __init__(self, view_width, view_height, field_width, field_height):
+        self.view_width = view_width
+        self.view_height = view_height
+        self.field_width = field_width
+        self.field_height = field_height
+        self.is_scrolling = field_width > view_width or field_height > view_height
+        self.view_x = 0
+        self.view_y = 0
+
+    def calc_view_position(self, center_x, center_y):
+        view_x = max(min(int(center_x) - self.view_width // 2, self.field_width - self.view_width), 0)
+        view_y = max(min(int(center_y) - self.view_height // 2, self.field_height - self.view_height), 0)
+        return view_x, view_y
+
+    def calc_view_rect(self, center_x, center_y):
+        return pygame.Rect(self.calc_view_position(center_x, center_y), (self.view_width, self.view_height))
+
+    def look_at(self, center_x, center_y):
+        self.view_x, self.view_y = self.calc_view_position(center_x, center_y)
+
+    def get_view_rect(self):
+        return pygame.Rect(self.view_x, self.view_y, self.view_width, self.view_height)
@@ -0,0 +1,46 @@
+import pygame
+
+# 결과 메모가 이보다 커지면 비운다
+MAX_OVERLAP_MEMO_SIZE = 65536
+
+
+# 스프라이트 프레임별 충돌 마스크와 마스크끼리 겹치는지 결과를 캐시한다
+# 마스크는 이미지(프레임) 하나에 한 번만 만들어서 같은 이미지 리스트를 쓰는 모든 참가자가 나눠 쓴다
+# 두 이미지의 상대 위치가 같으면 결과도 같으므로 (프레임 쌍, 오프셋)으로 메모한다
+class MaskCache:
+    def __init__(self):
+        self.mask_dict = {}
+        self.overlap_memo = {}
+        self.hit_count = 0
+        self.miss_count = 0
+
+    # 이미지가 사라져서 id가 재사용되지 않도록 이미지도 같이 들고 있는다
+    def get_mask(self, image):
+        entry = self.mask_dict.get(id(image))
+        if entry is None:
+            entry = (image, pygame.mask.from_surface(image))
+            self.mask_dict[id(image)] = entry
+        return entry[1]
+
+    # 이미지 리스트의 모든 프레임 마스크를 미리 만들어둔다
+    def prepare(self, image_list):
+        for image in image_list[1:]:
+            self.get_mask(image)
+
+    # rect는 각 이미지를 그리는 위치와 크기, 렉트가 겹치지 않으면 마스크를 보지 않는다
+    def overlap(self, image_a, rect_a, image_b, rect_b):
+        if not rect_a.colliderect(rect_b):
+            return False
+
+        key = (id(image_a), id(image_b), rect_b.x - rect_a.x, rect_b.y - rect_a.y)
+        result = self.overlap_memo.get(key)
+        if result is not None:
+            self.hit_count += 1
+            return result
+
+        self.miss_count += 1
+        if len(self.overlap_memo) >= MAX_OVERLAP_MEMO_SIZE:
+            self.overlap_memo.clear()
+        result = self.get_mask(image_a).overlap(self.get_mask(image_b), (key[2], key[3])) is not None
+        self.overlap_memo[key] = result
+        return result
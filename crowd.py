@@ -0,0 +1,199 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import pygame
+
+from world import (
+    PLATFORM_HEIGHT, PLAYER_COL_WIDTH, PLAYER_COL_HEIGHT,
+    PLAYER_STATE_RENDER_INDEX, CollideLayer, EnemyState, PlayerState,
+)
+
+MOVE_INTERVAL = 0.1
+
+# OtherPlayer.move()와 같은 확률: 위 15/20, 왼쪽 2/20, 오른쪽 2/20, 아래 1/20
+MOVE_UP_MAX = 15
+MOVE_LEFT_MAX = 17
+MOVE_RIGHT_MAX = 19
+
+
+# rect.left처럼 pygame.Rect 속성에 실수를 넣었을 때와 같은 반올림 (0.5는 0에서 먼 쪽으로)
+# pygame.Rect(x, y, w, h) 생성자와 blit 위치는 반올림하지 않고 0 쪽으로 자른다
+def round_rect_value(value):
+    return np.where(value >= 0, np.floor(value + 0.5), np.ceil(value - 0.5))
+
+
+# 다른 참가자 전체를 NumPy 배열로 들고 한 번에 진행시키는 군중
+# OtherPlayer 객체 리스트 대신 World(crowd_backend='numpy')에서 사용한다
+class ArrayCrowd:
+    def __init__(self, world, man_image_list, woman_image_list, man_count, woman_count):
+        if np is None:
+            raise ImportError('numpy is required for the numpy crowd backend')
+
+        self.world = world
+        self.image_lists = (man_image_list, woman_image_list)
+        self.width = man_image_list[1].get_width()
+        self.height = man_image_list[1].get_height()
+        self.count = man_count + woman_count
+        self.rng = np.random.default_rng(world.random.getrandbits(64))
+
+        # 0: 남자, 1: 여자
+        self.sprite_set = np.zeros(self.count, dtype=np.int8)
+        self.sprite_set[man_count:] = 1
+
+        self.pos_x = np.zeros(self.count, dtype=np.float64)
+        self.pos_y = np.zeros(self.count, dtype=np.float64)
+        self.prev_pos_x = np.zeros(self.count, dtype=np.float64)
+        self.prev_pos_y = np.zeros(self.count, dtype=np.float64)
+        self.state = np.zeros(self.count, dtype=np.int8)
+        self.move_time = np.zeros(self.count, dtype=np.float64)
+        self.move_index = np.zeros(self.count, dtype=np.int32)
+        self.wait_time = np.zeros(self.count, dtype=np.float64)
+        self.after_wait_time = np.zeros(self.count, dtype=np.float64)
+        self.check_move = np.zeros(self.count, dtype=bool)
+
+    def seed(self, seed):
+        self.rng = np.random.default_rng(seed)
+
+    def initialize(self):
+        self.state[:] = PlayerState.idle.value
+        self.move_time[:] = 0
+        self.move_index[:] = 0
+        self.wait_time[:] = 0
+        self.after_wait_time[:] = 0
+        self.check_move[:] = False
+        self.pos_x[:] = self.rng.integers(0, self.world.field_width - self.width, size=self.count, endpoint=True)
+        self.pos_y[:] = self.world.field_height - PLATFORM_HEIGHT - self.height
+
+    def save_previous_position(self):
+        np.copyto(self.prev_pos_x, self.pos_x)
+        np.copyto(self.prev_pos_y, self.pos_y)
+
+    # OtherPlayer.move()를 mask에 해당하는 참가자에게 한 번에 적용
+    def move(self, mask):
+        self.move_time[mask] += self.world.delta_time
+        fire = mask & (self.move_time >= MOVE_INTERVAL)
+        self.state[mask & ~fire] = PlayerState.idle.value
+
+        fire_index = np.flatnonzero(fire)
+        if fire_index.size == 0:
+            return
+
+        self.move_time[fire_index] = 0
+        self.state[fire_index] = PlayerState.move.value
+
+        speed = self.world.config.other_player_speed
+        direction = self.rng.integers(1, 20, size=fire_index.size, endpoint=True)
+        dx = np.where((direction > MOVE_UP_MAX) & (direction <= MOVE_LEFT_MAX), -speed, 0.0)
+        dx = np.where((direction > MOVE_LEFT_MAX) & (direction <= MOVE_RIGHT_MAX), speed, dx)
+        dy = np.where(direction <= MOVE_UP_MAX, -speed, 0.0)
+        dy = np.where(direction > MOVE_RIGHT_MAX, speed, dy)
+        self.pos_x[fire_index] += dx
+        self.pos_y[fire_index] += dy
+
+    def update(self):
+        world = self.world
+        dead_index = None
+        active = (self.pos_y > 28) & (self.state != PlayerState.dead.value)
+
+        if world.enemy.state == EnemyState.ready.value:
+            self.check_move[active] = False
+            self.move(active)
+        elif world.enemy.state == EnemyState.watch.value:
+            need_index = np.flatnonzero(active & ~self.check_move)
+            if need_index.size > 0:
+                self.move_index[need_index] = self.rng.integers(1, world.other_player_move_range,
+                                                                size=need_index.size, endpoint=True)
+                self.check_move[need_index] = True
+
+            chosen = active & (self.move_index == 1)
+            start_index = np.flatnonzero(chosen & (self.wait_time == 0))
+            if start_index.size > 0:
+                self.after_wait_time[start_index] = self.rng.random(size=start_index.size) * (world.config.watch_time - 2)
+
+            self.wait_time[chosen] += world.delta_time
+            self.move(chosen & (self.wait_time >= self.after_wait_time))
+
+            dead_index = np.flatnonzero(chosen & (self.wait_time >= self.after_wait_time + 1))
+            for i in range(dead_index.size):
+                world.play_gunshot_sound()
+            world.record_death(dead_index.size)
+            self.state[dead_index] = PlayerState.dead.value
+
+        np.clip(self.pos_x, 0, world.field_width - self.width, out=self.pos_x)
+        np.minimum(self.pos_y, world.field_height - PLATFORM_HEIGHT - self.height, out=self.pos_y)
+
+        # 시체는 더 이상 움직이지 않으므로 죽은 순간에 정적 인덱스에 넣는다
+        if dead_index is not None and dead_index.size > 0:
+            self.make_corpses(dead_index)
+
+    # 픽셀 충돌이면 스프라이트 렉트를, 아니면 충돌 박스를 정적 인덱스에 넣는다
+    def make_corpses(self, dead_index):
+        spatial_grid = self.world.spatial_grid_list[CollideLayer.group_b.value]
+        if self.world.config.pixel_collision:
+            # calc_sprite_rect, 그리는 위치와 같이 0 쪽으로 자른다
+            left = np.trunc(self.pos_x[dead_index]).astype(np.int64)
+            top = np.trunc(self.pos_y[dead_index]).astype(np.int64)
+            width = self.width
+            height = self.height
+        else:
+            left, top = self.calc_collider_origin(dead_index)
+            width = PLAYER_COL_WIDTH
+            height = PLAYER_COL_HEIGHT
+        for i, rect_left, rect_top in zip(dead_index.tolist(), left.tolist(), top.tolist()):
+            spatial_grid.make_static(i, pygame.Rect(rect_left, rect_top, width, height))
+
+    # calc_rect_collider와 같은 충돌 렉트의 left, top
+    def calc_collider_origin(self, index):
+        left = round_rect_value(self.pos_x[index] + self.width / 2 - PLAYER_COL_WIDTH / 2)
+        top = round_rect_value(self.pos_y[index] + self.height - PLAYER_COL_HEIGHT)
+        return left.astype(np.int64), top.astype(np.int64)
+
+    # 참가자 한 명의 지금 프레임 이미지
+    def get_image(self, index):
+        return self.image_lists[self.sprite_set[index]][PLAYER_STATE_RENDER_INDEX[self.state[index]]]
+
+    def count_state(self, state):
+        return int(np.count_nonzero(self.state == state))
+
+    def count_success(self):
+        return int(np.count_nonzero((self.pos_y <= 28) & (self.state != PlayerState.dead.value)))
+
+    # (참가자 번호, 이미지, x, y)를 돌려준다
+    # view_rect를 주면 그 영역에 걸치는 참가자만 골라서 영역 기준 좌표로 돌려준다
+    def iter_sprites(self, alpha=1.0, view_rect=None):
+        image_lists = self.image_lists
+        if alpha == 1.0:
+            pos_x = self.pos_x
+            pos_y = self.pos_y
+        else:
+            pos_x = self.prev_pos_x + (self.pos_x - self.prev_pos_x) * alpha
+            pos_y = self.prev_pos_y + (self.pos_y - self.prev_pos_y) * alpha
+
+        if view_rect is None:
+            index_list = range(self.count)
+            sprite_set = self.sprite_set
+            state = self.state
+        else:
+            # 렉트에 넣을 때처럼 0 쪽으로 잘라서 비교한다
+            left = np.trunc(pos_x)
+            top = np.trunc(pos_y)
+            visible_index = np.flatnonzero((left < view_rect.right) & (left + self.width > view_rect.left) &
+                                           (top < view_rect.bottom) & (top + self.height > view_rect.top))
+            index_list = visible_index.tolist()
+            pos_x = pos_x[visible_index] - view_rect.x
+            pos_y = pos_y[visible_index] - view_rect.y
+            sprite_set = self.sprite_set[visible_index]
+            state = self.state[visible_index]
+
+        render_index = np.take(PLAYER_STATE_RENDER_INDEX, state)
+        for i, sprite_set, index, x, y in zip(index_list, sprite_set.tolist(), render_index.tolist(),
+                                              pos_x.tolist(), pos_y.tolist()):
+            yield i, image_lists[sprite_set][index], x, y
+
+    def get_blit_list(self, alpha=1.0, view_rect=None):
+        return [(image, (x, y)) for i, image, x, y in self.iter_sprites(alpha, view_rect)]
+
+    def render(self, surface, alpha=1.0, view_rect=None):
+        surface.blits(self.get_blit_list(alpha, view_rect), False)
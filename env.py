@@ -0,0 +1,405 @@
+import argparse
+import multiprocessing
+import os
+import random
+import time
+from multiprocessing import shared_memory
+
+import pygame
+
+from world import MAX_PLAYER_COUNT, PLATFORM_HEIGHT, OnKeyDown, EnemyState, PlayerState, CollideLayer, World
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# gymnasium이 있으면 관측과 행동 공간을 같이 알려준다 (없어도 reset, step은 똑같이 쓸 수 있다)
+try:
+    from gymnasium import spaces
+except ImportError:
+    spaces = None
+
+FRAME_TIME = 1 / 60
+
+# 행동 번호별로 누르고 있는 키, 이동은 키가 눌리는 순간에만 한 칸 가므로 연타하려면 0과 번갈아 골라야 한다
+ACTION_KEYS = (None, OnKeyDown.up, OnKeyDown.down, OnKeyDown.left, OnKeyDown.right, OnKeyDown.space)
+
+# 관측에 넣을 가까운 시체 수와 찾는 거리(픽셀)
+NEAR_CORPSE_COUNT = 4
+NEAR_CORPSE_RADIUS = 96
+
+# 플레이어 12개 + 가까운 시체마다 (dx, dy, 있는지)
+OBSERVATION_SIZE = 12 + NEAR_CORPSE_COUNT * 3
+
+# 보상: 출발선에서 결승선까지 가면 PROGRESS_REWARD, 막대 왕복을 놓치지 않으면 한 번에 PASS_REWARD
+PROGRESS_REWARD = 1.0
+PASS_REWARD = 0.05
+SUCCESS_REWARD = 1.0
+DEAD_REWARD = -1.0
+
+# Player.update에서 결승선으로 보는 높이
+FINISH_POS_Y = 28
+
+
+# gymnasium이 없으면 (None, None)
+def create_spaces():
+    if spaces is None:
+        return None, None
+    return spaces.Box(-np.inf, np.inf, (OBSERVATION_SIZE,), np.float32), spaces.Discrete(len(ACTION_KEYS))
+
+
+# 플레이어 한 명이 한 판을 진행하는 reset/step 환경
+# 다른 참가자, 적, 심장박동 막대는 World가 원래 규칙대로 진행시키고, 행동은 플레이어의 키 입력이 된다
+# 관측은 float32 배열: 플레이어 위치, 느려졌는지, 적 상태와 상태 시간, 박자, 노란 구간 대비 막대 위치, 가까운 시체
+class RoundEnv:
+    def __init__(self, image_lists=None, seed=None, player_count=MAX_PLAYER_COUNT, crowd_backend='numpy',
+                 config=None, delta_time=FRAME_TIME, max_episode_steps=None):
+        if np is None:
+            raise ImportError('numpy is required for the training environment')
+        if image_lists is None:
+            from assets import load_image_lists
+            image_lists = load_image_lists()
+
+        self.seed_random = random.Random(seed)
+        self.world = World(image_lists, seed=seed, player_count=player_count, crowd_backend=crowd_backend,
+                           config=config)
+        self.delta_time = delta_time
+        self.max_episode_steps = max_episode_steps
+        self.step_count = 0
+        self.last_pos_y = 0
+        self.last_pass_count = 0
+        self.start_pos_y = self.world.field_height - PLATFORM_HEIGHT - self.world.player.height
+        self.key_state_list = []
+        for key in ACTION_KEYS:
+            key_state = [False] * OnKeyDown.max_length.value
+            if key is not None:
+                key_state[key.value] = True
+            self.key_state_list.append(key_state)
+
+        self.observation_space, self.action_space = create_spaces()
+
+    # seed를 주지 않으면 판마다 새 시드를 뽑는다
+    def reset(self, seed=None, options=None):
+        if seed is not None:
+            self.seed_random.seed(seed)
+        self.world.reset(self.seed_random.getrandbits(63))
+        self.step_count = 0
+        self.last_pos_y = self.world.player.pos_y
+        self.last_pass_count = 0
+        return self.get_observation(), {}
+
+    def step(self, action):
+        observation = np.empty(OBSERVATION_SIZE, np.float32)
+        reward, terminated, truncated = self.step_into(action, observation)
+        info = {}
+        if terminated or truncated:
+            info['success'] = self.world.player.state == PlayerState.success.value
+        return observation, reward, terminated, truncated, info
+
+    # 관측을 새로 만들지 않고 out에 바로 쓴다, 벡터 환경은 공유 배열의 한 줄을 넘긴다
+    def step_into(self, action, out):
+        world = self.world
+        player = world.player
+        world.step(self.delta_time, self.key_state_list[action])
+        self.step_count += 1
+
+        reward = (self.last_pos_y - player.pos_y) / (self.start_pos_y - FINISH_POS_Y) * PROGRESS_REWARD
+        self.last_pos_y = player.pos_y
+
+        rod = world.rod
+        if rod.pass_count != self.last_pass_count:
+            if rod.miss_count == 0:
+                reward += PASS_REWARD * (rod.pass_count - self.last_pass_count)
+            self.last_pass_count = rod.pass_count
+
+        terminated = False
+        if player.state == PlayerState.success.value:
+            reward += SUCCESS_REWARD
+            terminated = True
+        elif player.state == PlayerState.dead.value:
+            reward += DEAD_REWARD
+            terminated = True
+        truncated = not terminated and self.max_episode_steps is not None and self.step_count >= self.max_episode_steps
+
+        self.write_observation(out)
+        return reward, terminated, truncated
+
+    def get_observation(self):
+        observation = np.empty(OBSERVATION_SIZE, np.float32)
+        self.write_observation(observation)
+        return observation
+
+    def write_observation(self, out):
+        world = self.world
+        config = world.config
+        player = world.player
+        enemy = world.enemy
+        rod = world.rod
+        safe_zone = world.line_safe_zone
+        line = world.line
+
+        if enemy.state == EnemyState.watch.value:
+            state_time = enemy.state_time / config.watch_time
+        else:
+            state_time = enemy.state_time / config.ready_time
+
+        # 노란 구간 가운데를 0으로 한 막대 위치, 선 길이의 절반이 1
+        zone_center_x = safe_zone.pos_x + safe_zone.width / 2
+        rod_center_x = rod.pos_x + rod.width / 2
+        in_zone = safe_zone.pos_x - rod.width < rod.pos_x < safe_zone.pos_x + safe_zone.width
+
+        center_x = player.pos_x + player.width / 2
+        center_y = player.pos_y + player.height - player.col_height / 2
+        value_list = [
+            center_x / world.field_width * 2 - 1,
+            (player.pos_y - FINISH_POS_Y) / (self.start_pos_y - FINISH_POS_Y) * 2 - 1,
+            1.0 if player.speed < 2 else 0.0,
+            1.0 if player.state == PlayerState.move.value else 0.0,
+            float(enemy.state),
+            min(state_time, 1.0),
+            enemy.beat_rate / config.beat_rate_max,
+            (rod_center_x - zone_center_x) / (line.width / 2),
+            1.0 if rod.is_left else -1.0,
+            1.0 if in_zone else 0.0,
+            1.0 if rod.save else 0.0,
+            1.0 - world.game_timer / config.remain_time,
+        ]
+
+        # 시체는 공간 인덱스에서 찾는다, 가까운 순서로 넣고 모자란 자리는 0
+        corpse_list = []
+        search_rect = pygame.Rect(center_x - NEAR_CORPSE_RADIUS, center_y - NEAR_CORPSE_RADIUS,
+                                  NEAR_CORPSE_RADIUS * 2, NEAR_CORPSE_RADIUS * 2)
+        spatial_grid = world.spatial_grid_list[CollideLayer.group_b.value]
+        for item, item_rect in spatial_grid.query_static_rects(search_rect):
+            offset_x = (item_rect.centerx - center_x) / NEAR_CORPSE_RADIUS
+            offset_y = (item_rect.centery - center_y) / NEAR_CORPSE_RADIUS
+            corpse_list.append((offset_x * offset_x + offset_y * offset_y, offset_x, offset_y))
+        corpse_list.sort()
+        for i in range(NEAR_CORPSE_COUNT):
+            if i < len(corpse_list):
+                value_list += (corpse_list[i][1], corpse_list[i][2], 1.0)
+            else:
+                value_list += (0.0, 0.0, 0.0)
+
+        out[:] = value_list
+
+
+# 환경 여러 개의 관측, 보상, 끝났는지를 한 배열에 모아둔다
+# 끝난 환경은 그 자리에서 바로 새 판을 시작하고, 끝나기 직전 관측은 final_observation에 남긴다
+class VectorBuffers:
+    def __init__(self, env_count, buffer=None):
+        self.env_count = env_count
+        self.layout = [
+            ('observation', (env_count, OBSERVATION_SIZE), np.float32),
+            ('final_observation', (env_count, OBSERVATION_SIZE), np.float32),
+            ('reward', (env_count,), np.float32),
+            ('terminated', (env_count,), np.bool_),
+            ('truncated', (env_count,), np.bool_),
+            ('success', (env_count,), np.bool_),
+            ('action', (env_count,), np.int64),
+        ]
+        self.size = sum(int(np.prod(shape)) * np.dtype(dtype).itemsize for name, shape, dtype in self.layout)
+        if buffer is None:
+            buffer = bytearray(self.size)
+
+        # 모든 배열이 버퍼 하나를 나눠 쓰므로 공유 메모리에 그대로 올릴 수 있다
+        offset = 0
+        for name, shape, dtype in self.layout:
+            array = np.ndarray(shape, dtype, buffer, offset)
+            setattr(self, name, array)
+            offset += array.nbytes
+
+    # start부터 end까지의 환경을 받은 action으로 한 스텝씩 진행시킨다
+    def step_envs(self, env_list, start):
+        for i, env in enumerate(env_list, start):
+            reward, terminated, truncated = env.step_into(self.action[i], self.observation[i])
+            self.reward[i] = reward
+            self.terminated[i] = terminated
+            self.truncated[i] = truncated
+            if terminated or truncated:
+                self.final_observation[i] = self.observation[i]
+                self.success[i] = env.world.player.state == PlayerState.success.value
+                env.reset()
+                env.write_observation(self.observation[i])
+            else:
+                self.success[i] = False
+
+    def reset_envs(self, env_list, start, seed=None):
+        for i, env in enumerate(env_list, start):
+            env.reset(None if seed is None else seed + i)
+            env.write_observation(self.observation[i])
+
+    def get_info(self):
+        return {'final_observation': self.final_observation, 'success': self.success}
+
+
+# 한 프로세스 안에서 env_count개의 판을 차례로 진행시키는 벡터 환경
+# 돌려주는 배열은 다음 step에서 덮어쓰므로 남겨둘 값은 복사해서 쓴다
+class VectorEnv:
+    def __init__(self, env_count, image_lists=None, seed=None, **env_kwargs):
+        if np is None:
+            raise ImportError('numpy is required for the training environment')
+        if image_lists is None:
+            from assets import load_image_lists
+            image_lists = load_image_lists()
+
+        self.env_count = env_count
+        self.env_list = [RoundEnv(image_lists, None if seed is None else seed + i, **env_kwargs)
+                         for i in range(env_count)]
+        self.buffers = VectorBuffers(env_count)
+        self.observation_space, self.action_space = create_spaces()
+
+    def reset(self, seed=None, options=None):
+        self.buffers.reset_envs(self.env_list, 0, seed)
+        return self.buffers.observation, {}
+
+    def step(self, action_list):
+        buffers = self.buffers
+        buffers.action[:] = action_list
+        buffers.step_envs(self.env_list, 0)
+        return buffers.observation, buffers.reward, buffers.terminated, buffers.truncated, buffers.get_info()
+
+    def close(self):
+        pass
+
+
+COMMAND_RESET = 0
+COMMAND_STEP = 1
+COMMAND_CLOSE = 2
+
+
+# 작업 프로세스는 맡은 구간의 환경만 들고 공유 메모리의 자기 줄에 결과를 쓴다
+# 에셋 캐시는 부모가 만들어두므로 읽기만 한다
+def run_worker(connection, memory_name, env_count, start, end, seed, env_kwargs):
+    from assets import load_image_lists
+    memory = shared_memory.SharedMemory(memory_name)
+    try:
+        buffers = VectorBuffers(env_count, memory.buf)
+        image_lists = load_image_lists()
+        env_list = [RoundEnv(image_lists, None if seed is None else seed + i, **env_kwargs)
+                    for i in range(start, end)]
+        connection.send(True)
+
+        while True:
+            command, argument = connection.recv()
+            if command == COMMAND_STEP:
+                buffers.step_envs(env_list, start)
+            elif command == COMMAND_RESET:
+                buffers.reset_envs(env_list, start, argument)
+            else:
+                break
+            connection.send(True)
+    finally:
+        # 공유 메모리를 가리키는 배열이 남아있으면 닫을 수 없다
+        buffers = None
+        memory.close()
+        connection.close()
+
+
+# 환경을 worker_count개 프로세스에 나눠서 동시에 진행시키는 벡터 환경
+# 관측과 보상은 공유 메모리 배열에 바로 쓰이고, 파이프로는 명령과 완료 신호만 오간다
+class ProcessVectorEnv:
+    def __init__(self, env_count, worker_count=None, seed=None, **env_kwargs):
+        if np is None:
+            raise ImportError('numpy is required for the training environment')
+        if worker_count is None:
+            worker_count = os.cpu_count() or 1
+        worker_count = max(min(worker_count, env_count), 1)
+
+        # 작업 프로세스들이 빈 캐시를 동시에 만들지 않게 띄우기 전에 한 번 만든다
+        from assets import build_image_cache
+        build_image_cache()
+
+        self.env_count = env_count
+        self.memory = shared_memory.SharedMemory(create=True, size=VectorBuffers(env_count).size)
+        self.buffers = VectorBuffers(env_count, self.memory.buf)
+        self.connection_list = []
+        self.process_list = []
+        for i in range(worker_count):
+            start = env_count * i // worker_count
+            end = env_count * (i + 1) // worker_count
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=run_worker, name='env-%d' % i, daemon=True,
+                                              args=(worker_connection, self.memory.name, env_count, start, end,
+                                                    seed, env_kwargs))
+            process.start()
+            worker_connection.close()
+            self.connection_list.append(connection)
+            self.process_list.append(process)
+        self.wait()
+
+        self.observation_space, self.action_space = create_spaces()
+
+    def wait(self):
+        for connection in self.connection_list:
+            connection.recv()
+
+    def reset(self, seed=None, options=None):
+        for connection in self.connection_list:
+            connection.send((COMMAND_RESET, seed))
+        self.wait()
+        return self.buffers.observation, {}
+
+    def step(self, action_list):
+        buffers = self.buffers
+        buffers.action[:] = action_list
+        for connection in self.connection_list:
+            connection.send((COMMAND_STEP, None))
+        self.wait()
+        return buffers.observation, buffers.reward, buffers.terminated, buffers.truncated, buffers.get_info()
+
+    def close(self):
+        if self.memory is None:
+            return
+        for connection in self.connection_list:
+            connection.send((COMMAND_CLOSE, None))
+        for process in self.process_list:
+            process.join()
+        for connection in self.connection_list:
+            connection.close()
+        self.buffers = None
+        self.memory.close()
+        self.memory.unlink()
+        self.memory = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='무작위 행동으로 학습 환경의 처리량을 잰다')
+    parser.add_argument('--envs', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=0, help='0이면 한 프로세스에서 돌린다')
+    parser.add_argument('--steps', type=int, default=100000, help='모든 환경을 합친 스텝 수')
+    parser.add_argument('--players', type=int, default=MAX_PLAYER_COUNT)
+    parser.add_argument('--crowd', choices=['object', 'numpy'], default='numpy')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    env_kwargs = {'player_count': args.players, 'crowd_backend': args.crowd}
+    if args.workers > 0:
+        vector_env = ProcessVectorEnv(args.envs, args.workers, args.seed, **env_kwargs)
+    else:
+        vector_env = VectorEnv(args.envs, seed=args.seed, **env_kwargs)
+
+    rng = np.random.default_rng(args.seed)
+    vector_env.reset(args.seed)
+    episode_count = 0
+    success_count = 0
+    start_time = time.perf_counter()
+    try:
+        for i in range(max(args.steps // args.envs, 1)):
+            observation, reward, terminated, truncated, info = vector_env.step(
+                rng.integers(0, len(ACTION_KEYS), args.envs))
+            episode_count += int(np.count_nonzero(terminated | truncated))
+            success_count += int(np.count_nonzero(info['success']))
+    finally:
+        vector_env.close()
+    elapsed_time = time.perf_counter() - start_time
+
+    step_count = max(args.steps // args.envs, 1) * args.envs
+    print('envs: %d, workers: %d, steps: %d, episodes: %d, success: %d, %.2f s (%.0f steps/s)'
+          % (args.envs, args.workers, step_count, episode_count, success_count, elapsed_time,
+             step_count / max(elapsed_time, 1e-9)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+
+# 창과 소리 없이 돌린다
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+# 표준 출력으로 프레임을 내보낼 때 pygame 인사말이 섞이지 않게 한다
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import pygame
+
+from assets import load_image_lists
+from render import DirtyRenderer
+from replay import ReplayPlayer, load_replay
+from text import GlyphText
+from world import SCREEN_WIDTH, SCREEN_HEIGHT
+
+FRAME_RATE = 60
+
+# 인코딩을 기다리는 프레임이 이보다 많으면 시뮬레이션이 기다린다
+FRAME_QUEUE_SIZE = 8
+
+# 메모리 순서대로 R, G, B 바이트가 오는 24비트 서피스
+RGB_MASKS = (0x0000ff, 0x00ff00, 0xff0000, 0)
+
+
+# 렌더링한 프레임을 백그라운드 스레드에서 내보낸다
+# 프레임 서피스는 미리 만든 풀에서 꺼내 쓰고, 쓰기가 끝나면 풀로 돌아온다 (프레임마다 복사하지 않는다)
+# 대기열이 차면 submit이 기다리므로 쓰는 쪽이 느려도 메모리가 늘지 않는다
+# 순서가 상관없는 출력은 스레드를 여러 개 둬서 나눠 쓴다
+class FrameWriter:
+    def __init__(self, size, queue_size=FRAME_QUEUE_SIZE, thread_count=1):
+        self.size = size
+        self.frame_queue = queue.Queue(maxsize=queue_size)
+        self.free_queue = queue.Queue()
+        for i in range(queue_size + thread_count + 1):
+            self.free_queue.put(pygame.Surface(size, 0, 24, RGB_MASKS))
+        self.frame_count = 0
+        self.error = None
+        self.thread_list = [threading.Thread(target=self.run, name='export', daemon=True)
+                            for i in range(thread_count)]
+        for thread in self.thread_list:
+            thread.start()
+
+    # 다음 프레임을 그릴 서피스, 쓰는 중인 서피스가 모두 돌아오지 않았으면 기다린다
+    def get_frame_surface(self):
+        self.check_error()
+        return self.free_queue.get()
+
+    def submit(self, surface):
+        self.check_error()
+        self.frame_queue.put((self.frame_count, surface))
+        self.frame_count += 1
+
+    def close(self):
+        for thread in self.thread_list:
+            self.frame_queue.put(None)
+        for thread in self.thread_list:
+            thread.join()
+        self.check_error()
+        self.finish()
+
+    def check_error(self):
+        if self.error is not None:
+            raise RuntimeError('frame writer failed') from self.error
+
+    def run(self):
+        while True:
+            item = self.frame_queue.get()
+            if item is None:
+                break
+            index, surface = item
+            # 실패하면 남은 프레임은 버리면서 서피스만 돌려줘서 메인 스레드가 멈추지 않게 한다
+            if self.error is None:
+                try:
+                    self.write_frame(index, surface)
+                except Exception as e:
+                    self.error = e
+            self.free_queue.put(surface)
+
+    def write_frame(self, index, surface):
+        pass
+
+    def finish(self):
+        pass
+
+
+# 헤더 없는 RGB 프레임을 이어서 쓴다, ffmpeg -f rawvideo -pix_fmt rgb24로 읽을 수 있다
+# path가 '-'면 표준 출력으로 내보내서 인코더에 파이프로 넘긴다
+class RawFrameWriter(FrameWriter):
+    def __init__(self, path, size, queue_size=FRAME_QUEUE_SIZE):
+        if path == '-':
+            self.file = sys.stdout.buffer
+        else:
+            self.file = open(path, 'wb')
+        super().__init__(size, queue_size)
+
+    # 서피스 메모리를 그대로 보고 쓴다, 줄 끝에 여백이 있으면 줄마다 잘라서 쓴다
+    def write_frame(self, index, surface):
+        view = memoryview(surface.get_buffer())
+        width, height = self.size
+        pitch = surface.get_pitch()
+        if pitch == width * 3:
+            self.file.write(view)
+            return
+        for y in range(height):
+            self.file.write(view[y * pitch:y * pitch + width * 3])
+
+    def finish(self):
+        self.file.flush()
+        if self.file is not sys.stdout.buffer:
+            self.file.close()
+
+
+# 프레임마다 PNG 파일 하나를 쓴다, 압축이 오래 걸리므로 코어 수만큼 스레드를 둬서 나눠 쓴다
+class PngFrameWriter(FrameWriter):
+    def __init__(self, directory, size, queue_size=FRAME_QUEUE_SIZE, thread_count=None):
+        os.makedirs(directory, exist_ok=True)
+        self.path_format = os.path.join(directory, 'frame_%06d.png')
+        if thread_count is None:
+            thread_count = os.cpu_count() or 1
+        super().__init__(size, queue_size, thread_count)
+
+    def write_frame(self, index, surface):
+        pygame.image.save(surface, self.path_format % index)
+
+
+# 리플레이를 화면 없이 진행시키면서 frame_rate마다 한 장씩 그려서 writer로 넘긴다
+# 게임 화면과 같이 모든 렌더 레이어를 그리고 남은 시간을 표시한다
+# 캔버스는 프레임마다 이어서 쓰므로 DirtyRenderer로 바뀐 영역만 다시 그린 뒤 프레임 서피스로 옮긴다
+# 크기가 다르면 도트 그림이 뭉개지지 않게 가장 가까운 픽셀로 늘리고, smooth면 부드럽게 늘린다
+def export_replay(replay, image_lists, writer, frame_rate=FRAME_RATE, timer_text_renderer=None, smooth=False):
+    world = replay.create_world(image_lists)
+    replay_player = ReplayPlayer(replay)
+    step_list = replay.step_list
+    canvas = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+    renderer = DirtyRenderer(world, image_lists['background'][1].convert())
+    extra_rect_list = []
+    if timer_text_renderer is not None:
+        extra_rect_list.append(pygame.Rect(SCREEN_WIDTH - 220, 15, 220, timer_text_renderer.font.get_linesize()))
+    frame_time = 1 / frame_rate
+
+    while not replay_player.is_finished():
+        for delta_time, key_state in replay_player.advance(frame_time):
+            world.step(delta_time, key_state)
+
+        # 다음 스텝까지 남은 비율만큼 보간한다
+        alpha = 1.0
+        if not replay_player.is_finished():
+            alpha = min(replay_player.accumulator / step_list[replay_player.step_index][0], 1.0)
+
+        renderer.render(canvas, extra_rect_list, alpha)
+        if timer_text_renderer is not None:
+            remain_time = world.config.remain_time - world.game_timer
+            canvas.blit(timer_text_renderer.render('TIME : ' + str(round(remain_time, 2))), (SCREEN_WIDTH - 220, 15))
+
+        surface = writer.get_frame_surface()
+        if surface.get_size() == canvas.get_size():
+            surface.blit(canvas, (0, 0))
+        elif smooth:
+            surface.blit(pygame.transform.smoothscale(canvas, surface.get_size()), (0, 0))
+        else:
+            surface.blit(pygame.transform.scale(canvas, surface.get_size()), (0, 0))
+        writer.submit(surface)
+
+    return world
+
+
+def parse_size(text):
+    width, height = text.split('x')
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='리플레이를 화면 없이 영상 프레임으로 내보낸다')
+    parser.add_argument('path', help='리플레이 파일')
+    parser.add_argument('output', help='raw면 파일 경로 (-는 표준 출력), png면 폴더')
+    parser.add_argument('--format', choices=['raw', 'png'], help='기본은 output이 .raw나 -면 raw, 아니면 png')
+    parser.add_argument('--size', type=parse_size, default=(SCREEN_WIDTH, SCREEN_HEIGHT), metavar='WIDTHxHEIGHT')
+    parser.add_argument('--fps', type=int, default=FRAME_RATE)
+    parser.add_argument('--smooth', action='store_true', help='크기를 바꿀 때 부드럽게 늘린다')
+    parser.add_argument('--no-timer', action='store_true', help='남은 시간을 그리지 않는다')
+    args = parser.parse_args()
+
+    output_format = args.format
+    if output_format is None:
+        output_format = 'raw' if args.output == '-' or args.output.endswith('.raw') else 'png'
+
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    image_lists = load_image_lists(convert=True)
+
+    timer_text_renderer = None
+    if not args.no_timer:
+        timer_font = pygame.font.Font('resources/fonts/LAB디지털.ttf', 40)
+        timer_text_renderer = GlyphText(timer_font, (203, 36, 89))
+
+    replay = load_replay(args.path)
+    if output_format == 'raw':
+        writer = RawFrameWriter(args.output, args.size)
+    else:
+        writer = PngFrameWriter(args.output, args.size)
+
+    start_time = time.perf_counter()
+    try:
+        export_replay(replay, image_lists, writer, args.fps, timer_text_renderer, args.smooth)
+    finally:
+        writer.close()
+    elapsed_time = time.perf_counter() - start_time
+
+    # 표준 출력은 프레임이 나가는 곳일 수 있으므로 결과는 표준 에러로 알린다
+    game_time = writer.frame_count / args.fps
+    print('exported %d frames (%.1f s at %d fps) in %.1f s, %.1fx real time'
+          % (writer.frame_count, game_time, args.fps, elapsed_time, game_time / max(elapsed_time, 1e-9)),
+          file=sys.stderr)
+    if output_format == 'raw':
+        print('encode with: ffmpeg -f rawvideo -pix_fmt rgb24 -s %dx%d -r %d -i %s clip.mp4'
+              % (args.size[0], args.size[1], args.fps, args.output), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+import time
+from collections import deque
+
+import pygame
+
+from profiler import RollingHistogram
+from world import create_key_state
+
+# 입력 지연 히스토그램 구간(ms)과 들고 있을 개수
+LATENCY_EDGES = (1, 2, 4, 8, 12, 16.7, 25, 33.3, 50, 75, 100, 150, 250)
+LATENCY_WINDOW = 512
+
+
+# deadline(perf_counter 초)까지 이벤트를 기다리면서 받는 즉시 event.timestamp에 받은 시간을 적는다
+# pygame 이벤트에는 시간이 없어서, 프레임 사이에 잠들어 있는 동안 깨어나서 받아야 시간이 정확하다
+# 업데이트나 렌더링 중에 들어온 이벤트는 다음에 꺼낼 때의 시간이 적힌다
+def wait_events(deadline):
+    event_list = []
+    while True:
+        now = time.perf_counter()
+        for event in pygame.event.get():
+            event.timestamp = now
+            event_list.append(event)
+
+        remain_time = int((deadline - now) * 1000)
+        if remain_time <= 0:
+            return event_list
+
+        event = pygame.event.wait(remain_time)
+        if event.type != pygame.NOEVENT:
+            event.timestamp = time.perf_counter()
+            event_list.append(event)
+
+
+def stamp_events(event_list, timestamp):
+    for event in event_list:
+        event.timestamp = timestamp
+    return event_list
+
+
+# KEYDOWN, KEYUP을 받은 순서와 시간 그대로 쌓아두었다가 시뮬레이션 스텝마다 키 상태로 나눠준다
+# 프레임 하나가 여러 스텝을 진행하면 이벤트는 받은 시간이 들어가는 스텝에 적용되고,
+# 한 스텝 안에서 같은 키가 두 번 바뀌면 뒤의 것은 다음 스텝으로 밀어서 짧게 누른 키도 빠지지 않는다
+# 프레임이 밀려도 이벤트는 버리지 않으므로 연타 횟수는 프레임 수와 상관없이 모두 들어간다
+class InputQueue:
+    def __init__(self, key_map):
+        self.key_index_dict = {pygame_key: on_key_down.value for on_key_down, pygame_key in key_map.items()}
+        self.event_queue = deque()
+        self.key_state = create_key_state()
+        self.last_take_time = time.perf_counter()
+
+        # 스텝에 적용됐지만 아직 화면에 나가지 않은 이벤트의 시간
+        self.applied_time_list = []
+        self.latency_histogram = RollingHistogram(LATENCY_WINDOW, LATENCY_EDGES)
+
+    # 판을 시작할 때 지금 눌려있는 키 상태에서 다시 시작한다
+    def reset(self, key_state):
+        self.event_queue.clear()
+        self.key_state = list(key_state)
+        self.last_take_time = time.perf_counter()
+        self.applied_time_list = []
+
+    # 게임 키가 아닌 이벤트는 무시한다
+    def push_event(self, event):
+        if event.type != pygame.KEYDOWN and event.type != pygame.KEYUP:
+            return
+        key_index = self.key_index_dict.get(event.key)
+        if key_index is None:
+            return
+        self.event_queue.append((event.timestamp, key_index, event.type == pygame.KEYDOWN))
+
+    # 지난번부터 지금까지의 시간을 step_count개 스텝에 고르게 나누고 스텝마다 키 상태를 만든다
+    # 스텝이 없는 프레임이면 이벤트는 그대로 두었다가 다음 프레임에 적용한다
+    def take_key_states(self, step_count):
+        now = time.perf_counter()
+        if step_count == 0:
+            return []
+
+        start_time = self.last_take_time
+        self.last_take_time = now
+        event_queue = self.event_queue
+        key_state_list = []
+        for i in range(step_count):
+            step_end_time = start_time + (now - start_time) * (i + 1) / step_count
+            key_state = list(self.key_state)
+            changed_set = set()
+            while event_queue:
+                timestamp, key_index, is_down = event_queue[0]
+                if timestamp > step_end_time and i < step_count - 1:
+                    break
+                if key_state[key_index] != is_down:
+                    if key_index in changed_set:
+                        break
+                    changed_set.add(key_index)
+                    key_state[key_index] = is_down
+                    self.applied_time_list.append(timestamp)
+                event_queue.popleft()
+
+            self.key_state = key_state
+            key_state_list.append(key_state)
+        return key_state_list
+
+    # 화면에 내보낸 직후 부르면 그 프레임에 적용된 입력의 지연 시간을 기록한다
+    def present(self, timestamp):
+        for applied_time in self.applied_time_list:
+            self.latency_histogram.add((timestamp - applied_time) * 1000)
+        self.applied_time_list = []
+
+    # 최근 입력의 입력부터 화면까지 걸린 시간(ms)
+    def get_latency_stats(self):
+        value_list = sorted(self.latency_histogram.value_list)
+        if not value_list:
+            return None
+        return {
+            'count': len(value_list),
+            'mean': self.latency_histogram.calc_mean(),
+            'p50': value_list[len(value_list) // 2],
+            'p95': value_list[min(int(len(value_list) * 0.95), len(value_list) - 1)],
+            'max': value_list[-1],
+        }
@@ -0,0 +1,257 @@
+import argparse
+import queue
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+
+# 쓰기는 이 개수까지 모아서 트랜잭션 하나로 넣는다
+WRITE_BATCH_SIZE = 256
+
+# 결과 화면에 보여줄 순위 수
+TOP_COUNT = 5
+
+REQUEST_WRITE = 0
+REQUEST_SUMMARY = 1
+REQUEST_CLOSE = 2
+
+CREATE_SQL = '''
+CREATE TABLE IF NOT EXISTS run (
+    id INTEGER PRIMARY KEY,
+    cabinet TEXT NOT NULL,
+    finish_time REAL NOT NULL,
+    success INTEGER NOT NULL,
+    remain_time REAL NOT NULL,
+    death_count INTEGER NOT NULL,
+    rod_pass_count INTEGER NOT NULL,
+    rod_miss_count INTEGER NOT NULL,
+    seed INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS run_global_score ON run (success, remain_time);
+CREATE INDEX IF NOT EXISTS run_cabinet_score ON run (cabinet, success, remain_time);
+'''
+
+INSERT_SQL = ('INSERT INTO run (cabinet, finish_time, success, remain_time, death_count, rod_pass_count, '
+              'rod_miss_count, seed) VALUES (?, ?, ?, ?, ?, ?, ?, ?)')
+
+
+# 한 판의 결과, 순위는 성공한 판의 남은 시간으로 매긴다
+# 막대를 한 번 놓치면 죽으므로 놓친 수는 0 아니면 1이고, 막대 기록은 버틴 왕복 수와 함께 그대로 남긴다
+class RunRecord:
+    def __init__(self, cabinet, success, remain_time, death_count, rod_pass_count, rod_miss_count, seed=0,
+                 finish_time=None):
+        self.cabinet = cabinet
+        self.finish_time = finish_time if finish_time is not None else time.time()
+        self.success = success
+        self.remain_time = remain_time
+        self.death_count = death_count
+        self.rod_pass_count = rod_pass_count
+        self.rod_miss_count = rod_miss_count
+        self.seed = seed
+
+
+# 순위 저장소 인터페이스, 로컬 SQLite 말고 대회용 서버 대역도 같은 메서드로 만들면 된다
+# cabinet이 None이면 전체 순위
+# 메서드를 빠뜨린 저장소는 만들 때 바로 TypeError가 난다
+class ScoreStore(ABC):
+    @abstractmethod
+    def add_runs(self, record_list):
+        pass
+
+    # 남은 시간이 긴 순서로 (남은 시간, 기계, 끝난 시간)
+    @abstractmethod
+    def get_top(self, count, cabinet=None):
+        pass
+
+    # remain_time보다 남은 시간이 긴 성공 기록 수와 성공 기록 전체 수
+    @abstractmethod
+    def count_better(self, remain_time, cabinet=None):
+        pass
+
+    def close(self):
+        pass
+
+
+# 기록을 SQLite 파일에 쌓는다, 순위 쿼리는 (기계, 성공, 남은 시간) 인덱스만 읽는다
+class SqliteScoreStore(ScoreStore):
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        # 게임 중에 파일을 다른 곳에서 읽어도 쓰기가 막히지 않게 WAL을 쓰고, 트랜잭션마다 fsync하지 않는다
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(CREATE_SQL)
+
+    def add_runs(self, record_list):
+        with self.connection:
+            self.connection.executemany(INSERT_SQL, [
+                (record.cabinet, record.finish_time, int(record.success), record.remain_time, record.death_count,
+                 record.rod_pass_count, record.rod_miss_count, record.seed)
+                for record in record_list
+            ])
+
+    def get_top(self, count, cabinet=None):
+        if cabinet is None:
+            return self.connection.execute(
+                'SELECT remain_time, cabinet, finish_time FROM run WHERE success = 1 '
+                'ORDER BY remain_time DESC LIMIT ?', (count,)).fetchall()
+        return self.connection.execute(
+            'SELECT remain_time, cabinet, finish_time FROM run WHERE cabinet = ? AND success = 1 '
+            'ORDER BY remain_time DESC LIMIT ?', (cabinet, count)).fetchall()
+
+    def count_better(self, remain_time, cabinet=None):
+        if cabinet is None:
+            where = 'success = 1'
+            parameter_list = []
+        else:
+            where = 'cabinet = ? AND success = 1'
+            parameter_list = [cabinet]
+        better_count = self.connection.execute('SELECT COUNT(*) FROM run WHERE %s AND remain_time > ?' % where,
+                                               parameter_list + [remain_time]).fetchone()[0]
+        total_count = self.connection.execute('SELECT COUNT(*) FROM run WHERE ' + where,
+                                              parameter_list).fetchone()[0]
+        return better_count, total_count
+
+    def close(self):
+        self.connection.close()
+
+
+# 결과 화면에 보여줄 순위 정보
+class LeaderboardSummary:
+    def __init__(self, top_list, cabinet_top_list, rank=None, total_count=0, cabinet_rank=None,
+                 cabinet_total_count=0):
+        self.top_list = top_list
+        self.cabinet_top_list = cabinet_top_list
+        self.rank = rank
+        self.total_count = total_count
+        self.cabinet_rank = cabinet_rank
+        self.cabinet_total_count = cabinet_total_count
+
+    # 상위 몇 퍼센트인지, 순위가 없으면 None
+    def calc_top_percent(self):
+        if self.rank is None or self.total_count == 0:
+            return None
+        return self.rank / self.total_count * 100
+
+
+# 저장소를 백그라운드 스레드 하나에서만 쓰고, 게임 루프는 큐에 넣기만 한다
+# 쌓인 기록은 한 번에 모아서 쓰고, 조회는 그 전에 들어온 기록을 모두 쓴 뒤에 해서 Future로 돌려준다
+# store_factory는 스레드 안에서 불려서 SQLite 연결이 그 스레드에서 만들어진다
+class Leaderboard:
+    def __init__(self, store_factory, cabinet, batch_size=WRITE_BATCH_SIZE):
+        self.cabinet = cabinet
+        self.batch_size = batch_size
+        self.request_queue = queue.SimpleQueue()
+        self.written_count = 0
+        self.batch_count = 0
+        self.error = None
+        self.thread = threading.Thread(target=self.run, args=(store_factory,), name='leaderboard', daemon=True)
+        self.thread.start()
+
+    # 기다리지 않는다
+    def submit(self, record):
+        self.request_queue.put((REQUEST_WRITE, record, None))
+
+    # 이 기계와 전체의 상위 순위, 성공한 판이면 remain_time의 순위까지 조회한다
+    def request_summary(self, remain_time=None, top_count=TOP_COUNT):
+        future = Future()
+        self.request_queue.put((REQUEST_SUMMARY, (remain_time, top_count), future))
+        return future
+
+    # 남은 기록을 모두 쓰고 저장소를 닫는다
+    def close(self):
+        if self.thread is None:
+            return
+        self.request_queue.put((REQUEST_CLOSE, None, None))
+        self.thread.join()
+        self.thread = None
+
+    def run(self, store_factory):
+        try:
+            store = store_factory()
+        except Exception as e:
+            self.error = e
+            self.fail_requests(e)
+            return
+
+        try:
+            while True:
+                request_list = [self.request_queue.get()]
+                while len(request_list) < self.batch_size:
+                    try:
+                        request_list.append(self.request_queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                record_list = []
+                is_closing = False
+                for kind, argument, future in request_list:
+                    if kind == REQUEST_WRITE:
+                        record_list.append(argument)
+                        continue
+
+                    self.write_records(store, record_list)
+                    record_list = []
+                    if kind == REQUEST_CLOSE:
+                        is_closing = True
+                        break
+                    self.answer_summary(store, argument, future)
+
+                self.write_records(store, record_list)
+                if is_closing:
+                    break
+        finally:
+            store.close()
+
+    def write_records(self, store, record_list):
+        if not record_list:
+            return
+        try:
+            store.add_runs(record_list)
+            self.written_count += len(record_list)
+            self.batch_count += 1
+        except Exception as e:
+            # 쓰기가 실패해도 게임은 계속한다, 마지막 오류만 남긴다
+            self.error = e
+
+    def answer_summary(self, store, argument, future):
+        remain_time, top_count = argument
+        try:
+            summary = LeaderboardSummary(store.get_top(top_count), store.get_top(top_count, self.cabinet))
+            if remain_time is not None:
+                better_count, summary.total_count = store.count_better(remain_time)
+                summary.rank = better_count + 1
+                better_count, summary.cabinet_total_count = store.count_better(remain_time, self.cabinet)
+                summary.cabinet_rank = better_count + 1
+            future.set_result(summary)
+        except Exception as e:
+            future.set_exception(e)
+
+    # 저장소를 열지 못했으면 남은 조회에 오류를 넘겨서 기다리는 쪽이 멈추지 않게 한다
+    def fail_requests(self, error):
+        while True:
+            kind, argument, future = self.request_queue.get()
+            if future is not None:
+                future.set_exception(error)
+            if kind == REQUEST_CLOSE:
+                return
+
+
+def main():
+    parser = argparse.ArgumentParser(description='순위 기록을 조회한다')
+    parser.add_argument('path', nargs='?', default='leaderboard.sqlite3')
+    parser.add_argument('--cabinet', help='이 기계의 순위만 본다')
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    store = SqliteScoreStore(args.path)
+    try:
+        for i, (remain_time, cabinet, finish_time) in enumerate(store.get_top(args.top, args.cabinet)):
+            print('%3d. %8.3f  %-20s %s' % (i + 1, remain_time, cabinet,
+                                           time.strftime('%Y-%m-%d %H:%M', time.localtime(finish_time))))
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
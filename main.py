@@ -1,516 +1,74 @@
+import argparse
+import os
 import random
-from enum import Enum
+import socket
+import time
 
 import pygame
 
-SCREEN_WIDTH = 640
-SCREEN_HEIGHT = 900
-MAX_PLAYER_COUNT = 120
-
-PLATFORM_HEIGHT = 40
-PLAYER_COL_WIDTH = 12
-PLAYER_COL_HEIGHT = 33
-
-READY_TIME = 4
-WATCH_TIME = 4
-
-other_player_move_range = 10
-REMAIN_TIME = 80
-PLAYER_SPEED = 3
-
-ROAD_POS_X = 18
-
-
-class Scene(Enum):
-    menu = 0
-    play = 1
-    result = 2
-
-
-class RenderLayer(Enum):
-    none = 0
-    back = 1
-    middle = 2
-    front_1 = 3
-    front_2 = 4
-    ui_back = 5
-    ui_middle = 6
-    ui_front = 7
-    max_length = 8
-
-
-class CollideLayer(Enum):
-    none = 0
-    group_a = 1
-    group_b = 2
-    max_length = 3
-
-
-class OnKeyDown(Enum):
-    space = 0
-    left = 1
-    right = 2
-    up = 3
-    down = 4
-    enter = 5
-    max_length = 6
-
-
-class EnemyState(Enum):
-    ready = 0
-    watch = 1
-
-
-class PlayerState(Enum):
-    idle = 0
-    move = 1
-    dead = 2
-    success = 3
-    max_length = 4
-
-
-class GameObject:
-    def __init__(self, image_list, render_layer, collide_layer, pos_x=0, pos_y=0):
-        self.image_list = image_list
-        self.rect = self.image_list[1].get_rect()
-        self.width = self.rect.size[0]
-        self.height = self.rect.size[1]
-        self.col_width = self.width
-        self.col_height = self.height
-        self.pos_x = pos_x
-        self.pos_y = pos_y
-        self.render_time = 0
-        update_object_list.append(self)
-        render_list[render_layer].append(self)
-        collision_list[collide_layer].append(self)
-
-    def initialize(self):
-        pass
-
-    def update(self):
-        pass
-
-    def render(self, index=1):
-        if index > 0:
-            screen.blit(self.image_list[index], (self.pos_x, self.pos_y))
-
-
-class Enemy(GameObject):
-    def __init__(self, image_list, render_layer, collide_layer, pos_x=0, pos_y=0):
-        super().__init__(image_list, render_layer, collide_layer, pos_x, pos_y)
-        self.state = EnemyState.ready.value
-        self.state_time = 0
-        self.is_voice_ready = True
-        self.beat_rate = 0
-
-    def initialize(self):
-        self.state = EnemyState.ready.value
-        self.state_time = 0
-        self.is_voice_ready = True
-        self.beat_rate = 0
-
-    def update(self):
-        self.state_time += clock.get_time() / 1000
-
-        if self.state == EnemyState.ready.value:
-            if self.is_voice_ready is True:
-                self.is_voice_ready = False
-                heartbeat_sound_slow.stop()
-                heartbeat_sound_fast.stop()
-                voice_sound.play()
-
-            if self.state_time >= READY_TIME:
-                self.state_time = 0
-                self.state = EnemyState.watch.value
-                self.beat_rate = random.randint(5, 12)
-
-                if self.beat_rate <= 8:
-                    heartbeat_sound_slow.play()
-                else:
-                    heartbeat_sound_fast.play()
-
-        elif self.state == EnemyState.watch.value:
-            if self.state_time >= WATCH_TIME:
-                self.state_time = 0
-                self.state = EnemyState.ready.value
-                self.is_voice_ready = True
-
-    def render(self, index=1):
-        render_index = index
-
-        if self.state == EnemyState.ready.value:
-            render_index = 1
-        elif self.state == EnemyState.watch.value:
-            render_index = 2
-
-        super().render(render_index)
-
-
-class Player(GameObject):
-    def __init__(self, image_list, render_layer, collide_layer, pos_x=0, pos_y=0):
-        super().__init__(image_list, render_layer, collide_layer, pos_x, pos_y)
-        self.state = PlayerState.idle.value
-        self.speed = PLAYER_SPEED
-        self.key_down_list = []
-        self.col_width = PLAYER_COL_WIDTH
-        self.col_height = PLAYER_COL_HEIGHT
-        for i in range(OnKeyDown.max_length.value):
-            self.key_down_list.append(False)
-
-    def initialize(self):
-        self.state = PlayerState.idle.value
-        self.speed = PLAYER_SPEED
-        self.col_width = PLAYER_COL_WIDTH
-        self.col_height = PLAYER_COL_HEIGHT
-        self.pos_x = SCREEN_WIDTH / 2 - player.width / 2
-        self.pos_y = SCREEN_HEIGHT - PLATFORM_HEIGHT - player.height
-
-    def restore_speed(self):
-        self.speed = PLAYER_SPEED
-
-    def update(self):
-        if self.state == PlayerState.success.value or self.state == PlayerState.dead.value:
-            if self.state == PlayerState.dead.value:
-                play_gunshot_sound()
-
-            global scene_index
-            scene_index = Scene.result.value
-            return
-
-        key = pygame.key.get_pressed()
-
-        if key[pygame.K_LEFT] == 1 and self.key_down_list[OnKeyDown.left.value] is False:
-            self.key_down_list[OnKeyDown.left.value] = True
-            self.pos_x -= self.speed
-            self.state = PlayerState.move.value
-        elif key[pygame.K_LEFT] == 0 and self.key_down_list[OnKeyDown.left.value] is True:
-            self.key_down_list[OnKeyDown.left.value] = False
-            self.state = PlayerState.idle.value
-
-        if key[pygame.K_RIGHT] == 1 and self.key_down_list[OnKeyDown.right.value] is False:
-            self.key_down_list[OnKeyDown.right.value] = True
-            self.pos_x += self.speed
-            self.state = PlayerState.move.value
-        elif key[pygame.K_RIGHT] == 0 and self.key_down_list[OnKeyDown.right.value] is True:
-            self.key_down_list[OnKeyDown.right.value] = False
-            self.state = PlayerState.idle.value
-
-        if key[pygame.K_UP] == 1 and self.key_down_list[OnKeyDown.up.value] is False:
-            self.key_down_list[OnKeyDown.up.value] = True
-            self.pos_y -= self.speed
-            self.state = PlayerState.move.value
-        elif key[pygame.K_UP] == 0 and self.key_down_list[OnKeyDown.up.value] is True:
-            self.key_down_list[OnKeyDown.up.value] = False
-            self.state = PlayerState.idle.value
-
-        if key[pygame.K_DOWN] == 1 and self.key_down_list[OnKeyDown.down.value] is False:
-            self.key_down_list[OnKeyDown.down.value] = True
-            self.pos_y += self.speed
-            self.state = PlayerState.move.value
-        elif key[pygame.K_DOWN] == 0 and self.key_down_list[OnKeyDown.down.value] is True:
-            self.key_down_list[OnKeyDown.down.value] = False
-            self.state = PlayerState.idle.value
-
-        if enemy.state == EnemyState.watch.value and self.state == PlayerState.move.value:
-            self.state = PlayerState.dead.value
-
-        if self.pos_x < 0:
-            self.pos_x = 0
-
-        if self.pos_x > SCREEN_WIDTH - self.width:
-            self.pos_x = SCREEN_WIDTH - self.width
-
-        if self.pos_y >= SCREEN_HEIGHT - PLATFORM_HEIGHT - player.height:
-            self.pos_y = self.pos_y = SCREEN_HEIGHT - PLATFORM_HEIGHT - player.height
-
-        if self.pos_y <= 28:
-            self.state = PlayerState.success.value
-
-    def render(self, index=1):
-        render_index = index
-
-        if self.state == PlayerState.idle.value:
-            render_index = 1
-        elif self.state == PlayerState.move.value:
-            render_index = 2
-        elif self.state == PlayerState.dead.value:
-            render_index = 3
-
-        super().render(render_index)
-
-
-class OtherPlayer(GameObject):
-    def __init__(self, image_list, render_layer, collide_layer, pos_x=0, pos_y=0):
-        super().__init__(image_list, render_layer, collide_layer, pos_x, pos_y)
-        self.state = PlayerState.idle.value
-        self.speed = 4.5
-        self.move_time = 0
-        self.col_width = PLAYER_COL_WIDTH
-        self.col_height = PLAYER_COL_HEIGHT
-        self.move_index = 0
-        self.wait_time = 0
-        self.after_wait_time = 0
-        self.check_move = False
-
-    def initialize(self):
-        self.state = PlayerState.idle.value
-        self.speed = 4.5
-        self.move_time = 0
-        self.col_width = PLAYER_COL_WIDTH
-        self.col_height = PLAYER_COL_HEIGHT
-        self.move_index = 0
-        self.wait_time = 0
-        self.after_wait_time = 0
-        self.check_move = False
-        self.pos_x = random.randint(0, SCREEN_WIDTH - self.width)
-        self.pos_y = SCREEN_HEIGHT - PLATFORM_HEIGHT - self.height
-
-    def restore_speed(self):
-        self.speed = 4.5
-
-    def move(self):
-        self.move_time += clock.get_time() / 1000
-        if self.move_time >= 0.1:
-            self.move_time = 0
-            self.state = PlayerState.move.value
-            index = random.randint(1, 20)
-            if index <= 15:
-                self.pos_y -= self.speed
-            elif index <= 17:
-                self.pos_x -= self.speed
-            elif index <= 19:
-                self.pos_x += self.speed
-            else:
-                self.pos_y += self.speed
-        else:
-            self.state = PlayerState.idle.value
-
-    def update(self):
-        if self.pos_y <= 28 or self.state == PlayerState.dead.value:
-            return
-
-        if enemy.state == EnemyState.ready.value:
-            self.check_move = False
-            self.move()
-        elif enemy.state == EnemyState.watch.value:
-            if self.check_move is False:
-                self.move_index = random.randint(1, other_player_move_range)
-                self.check_move = True
-            if self.move_index == 1:
-                if self.wait_time == 0:
-                    self.after_wait_time = random.random() * (WATCH_TIME - 2)
-
-                self.wait_time += clock.get_time() / 1000
-
-                if self.wait_time >= self.after_wait_time:
-                    self.move()
-
-                if self.wait_time >= self.after_wait_time + 1:
-                    play_gunshot_sound()
-                    self.state = PlayerState.dead.value
-
-        if self.pos_x < 0:
-            self.pos_x = 0
-
-        if self.pos_x > SCREEN_WIDTH - self.width:
-            self.pos_x = SCREEN_WIDTH - self.width
-
-        if self.pos_y >= SCREEN_HEIGHT - PLATFORM_HEIGHT - player.height:
-            self.pos_y = self.pos_y = SCREEN_HEIGHT - PLATFORM_HEIGHT - player.height
-
-    def render(self, index=1):
-        render_index = index
-
-        if self.state == PlayerState.idle.value:
-            render_index = 1
-        elif self.state == PlayerState.move.value:
-            render_index = 2
-        elif self.state == PlayerState.dead.value:
-            render_index = 3
-
-        super().render(render_index)
-
-
-class Heart(GameObject):
-    def __init__(self, image_list, render_layer, collide_layer, pos_x=0, pos_y=0):
-        super().__init__(image_list, render_layer, collide_layer, pos_x, pos_y)
-        self.is_bigger = False
-        self.beat_interval = 0.5
-
-    def initialize(self):
-        self.is_bigger = False
-        self.beat_interval = 0.5
-
-    def render(self, index=1):
-        self.render_time += clock.get_time() / 1000
-        render_index = 1
-
-        if enemy.state == EnemyState.watch.value:
-            if enemy.beat_rate <= 8:
-                if self.render_time < 0.53:
-                    render_index = 2
-                elif self.render_time < 1.06:
-                    render_index = 1
-                else:
-                    self.render_time = 0
-            else:
-                if self.render_time < 0.265:
-                    render_index = 2
-                elif self.render_time < 0.53:
-                    render_index = 1
-                else:
-                    self.render_time = 0
-        else:
-            render_index = 1
-
-        super().render(render_index)
-
-
-class Rod(GameObject):
-    def __init__(self, image_list, render_layer, collide_layer, pos_x=0, pos_y=0):
-        super().__init__(image_list, render_layer, collide_layer, pos_x, pos_y)
-        self.is_left = True
-        self.speed = 50
-        self.key_down = False
-        self.save = False
-
-    def initialize(self):
-        self.is_left = True
-        self.speed = 50
-        self.pos_x = ROAD_POS_X
-        self.key_down = False
-        self.save = False
-
-    def update(self):
-        if enemy.state == EnemyState.watch.value:
-            key = pygame.key.get_pressed()
-
-            if enemy.state == EnemyState.watch.value:
-                if key[pygame.K_SPACE] == 1 and self.key_down is False:
-                    self.key_down = True
-                elif key[pygame.K_SPACE] == 0 and self.key_down is True:
-                    self.key_down = False
-
-            if self.is_left is True:
-                self.pos_x += enemy.beat_rate * self.speed * clock.get_time() / 1000
-
-                if self.pos_x < 300:
-                    if self.key_down is True:
-                        if check_collide_rect(self, line_safe_zone):
-                            if self.save is False:
-                                effect.effect_on(self.pos_x - 6, self.pos_y - 6)
-                                self.save = True
-                        elif self.save is False:
-                            effect.effect_on(self.pos_x - 6, self.pos_y - 6)
-                            player.state = PlayerState.dead.value
-                else:
-                    self.pos_x = 300
-                    self.is_left = False
-
-                    if self.save is False:
-                        player.state = PlayerState.dead.value
-
-                    self.save = False
-
-            elif self.is_left is False:
-                self.pos_x -= enemy.beat_rate * self.speed * clock.get_time() / 1000
-
-                if self.pos_x > ROAD_POS_X:
-                    if self.key_down is True:
-                        if check_collide_rect(self, line_safe_zone):
-                            if self.save is False:
-                                effect.effect_on(self.pos_x - 6, self.pos_y - 6)
-                                self.save = True
-                        elif self.save is False:
-                            effect.effect_on(self.pos_x - 6, self.pos_y - 6)
-                            player.state = PlayerState.dead.value
-                else:
-                    self.pos_x = ROAD_POS_X
-                    self.is_left = True
-
-                    if self.save is False:
-                        player.state = PlayerState.dead.value
-
-                    self.save = False
-        else:
-            self.initialize()
-
-
-class Effect(GameObject):
-    def __init__(self, image_list, render_layer, collide_layer, pos_x=0, pos_y=0):
-        super().__init__(image_list, render_layer, collide_layer, pos_x, pos_y)
-        self.render_time = 0
-        self.render_state = False
-
-
-    def initialize(self):
-        self.render_time = 0
-        self.render_state = False
-        self.pos_x = 0
-        self.pos_y = 0
-
-    def effect_on(self, pos_x, pos_y):
-        self.initialize()
-        self.render_state = True
-        self.pos_x = pos_x
-        self.pos_y = pos_y
-
-    def render(self, index=1):
-        render_index = 0
-
-        if self.render_state is True:
-            self.render_time += clock.get_time() / 1000
-
-            if self.render_time < 0.05:
-                render_index = 1
-            elif self.render_time < 0.1:
-                render_index = 2
-            elif self.render_time < 0.15:
-                render_index = 3
-            elif self.render_time < 0.2:
-                render_index = 4
-            elif self.render_time < 0.25:
-                render_index = 5
-            else:
-                render_index = 0
-
-        super().render(render_index)
-
-
-# 충돌 계산을 위해 렉트 객체를 만들어주는 함수
-def calc_rect_collider(game_object):
-    # 렉트 객체 초기화
-    rect = pygame.Rect(0, 0, 0, 0)
-
-    # 오브젝트가 플레이어라면 충돌 렉트 사이즈에 맞게 재조정
-    if isinstance(game_object, Player) or isinstance(game_object, OtherPlayer):
-        rect.left = game_object.pos_x + game_object.width / 2 - game_object.col_width / 2
-        rect.top = game_object.pos_y + game_object.height - game_object.col_height
-        rect.width = game_object.col_width
-        rect.height = game_object.col_height
-    # 나머지 경우에는 이미지 크기와 위치를 그대로 적용
-    else:
-        rect.left = game_object.pos_x
-        rect.top = game_object.pos_y
-        rect.width = game_object.col_width
-        rect.height = game_object.col_height
-
-    return rect  # 렉트 객체를 반환
-
-
-# 두 객체가 렉트 충돌을 하는지 판별하는 함수
-def check_collide_rect(a, b):
-    # calc_rect_collider함수로 렉트 객체를 생성한 뒤 비교
-    a.rect = calc_rect_collider(a)
-    b.rect = calc_rect_collider(b)
-
-    # 충돌 결과를 리턴
-    return a.rect.colliderect(b.rect)
-
-
-def play_gunshot_sound():
-    index = random.randint(0, 5)
-    gunshot_sound_list[index].play()
+from assets import SoundPlayer, load_image_lists
+from audio import VoicePool
+from input import InputQueue, stamp_events, wait_events
+from leaderboard import Leaderboard, RunRecord, SqliteScoreStore
+from profiler import Profiler, ProfilerOverlay
+from render import BandedRenderer, DirtyRenderer
+from replay import ReplayPlayer, ReplayRecorder, load_replay
+from scene import GameScene, SceneManager
+from snapshot import SnapshotBroadcaster, SnapshotReceiver, SpectatorView
+from text import GlyphText, TextCache, blit_centered
+from timestep import FixedTimestep
+from world import (
+    SCREEN_WIDTH, SCREEN_HEIGHT,
+    Scene, OnKeyDown, EnemyState, PlayerState, SoundEvent, GameConfig, World, create_key_state,
+)
+
+# 바뀐 영역만 화면에 갱신하는 렌더링 모드
+USE_DIRTY_RECT = True
+
+# 화면이 멈춰있는 씬에서 입력을 기다리는 최대 시간(ms)
+IDLE_WAIT_TIME = 500
+
+# 화면이 움직이는 씬의 프레임 간격(초)
+FRAME_TIME = 1 / 60
+
+# 프로파일러 오버레이 켜고 끄기, 최근 프레임 트레이스 저장
+PROFILER_TOGGLE_KEY = pygame.K_F3
+PROFILER_TRACE_KEY = pygame.K_F4
+
+# 게임 키와 pygame 키 매핑
+KEY_MAP = {
+    OnKeyDown.space: pygame.K_SPACE,
+    OnKeyDown.left: pygame.K_LEFT,
+    OnKeyDown.right: pygame.K_RIGHT,
+    OnKeyDown.up: pygame.K_UP,
+    OnKeyDown.down: pygame.K_DOWN,
+    OnKeyDown.enter: pygame.K_RETURN,
+}
+
+
+# 현재 눌린 키를 World에 넘길 키 상태 리스트로 변환
+def read_key_state():
+    key = pygame.key.get_pressed()
+    key_state = create_key_state()
+
+    for on_key_down, pygame_key in KEY_MAP.items():
+        key_state[on_key_down.value] = key[pygame_key] == 1
+
+    return key_state
+
+
+parser = argparse.ArgumentParser(description='Squid Game - Mugungwha')
+parser.add_argument('--record', metavar='DIR', help='판마다 입력을 리플레이 파일로 기록할 폴더')
+parser.add_argument('--replay', metavar='FILE', help='키보드 대신 리플레이 파일로 한 판을 재생')
+parser.add_argument('--profile', action='store_true', help='프로파일러 오버레이를 켜고 시작')
+parser.add_argument('--broadcast', metavar='PORT', type=int, help='이 포트로 관전용 상태 스트림을 내보낸다')
+parser.add_argument('--watch', metavar='HOST:PORT', help='다른 게임의 관전 스트림을 받아서 보기만 한다')
+parser.add_argument('--field', metavar='WIDTHxHEIGHT', help='화면보다 큰 필드에서 카메라가 플레이어를 따라간다')
+parser.add_argument('--render-threads', metavar='N', type=int, help='화면을 띠로 나눠 N개 스레드에서 그린다 (0이면 코어 수)')
+parser.add_argument('--leaderboard', metavar='FILE', default='leaderboard.sqlite3', help='순위 기록을 쌓을 SQLite 파일')
+parser.add_argument('--no-leaderboard', action='store_true', help='순위를 기록하지 않는다')
+parser.add_argument('--cabinet', default=socket.gethostname(), help='순위표에 남길 이 기계의 이름')
+args = parser.parse_args()
 
 # 스크린 정의
 pygame.init()
@@ -521,235 +79,436 @@ icon_image = pygame.image.load('resources/images/icon.png')
 pygame.display.set_icon(icon_image)
 
 # 사운드 로드
-voice_sound = pygame.mixer.Sound('resources/sounds/voice.wav')
-voice_length = voice_sound.get_length()
-
-heartbeat_sound_slow = pygame.mixer.Sound('resources/sounds/heart_beat_slow.wav')
-heartbeat_sound_fast = pygame.mixer.Sound('resources/sounds/heart_beat_fast.wav')
-
-gunshot_sound_list = []
-for i in range(1, 7):
-    gunshot_sound_list.append(pygame.mixer.Sound('resources/sounds/bang' + str(i) + '.ogg'))
-
-clear_sound = pygame.mixer.Sound('resources/sounds/clear.wav')
+# 한꺼번에 여러 명이 죽어도 채널이 모자라거나 프레임이 끊기지 않도록 채널 풀을 거쳐서 낸다
+sound_player = VoicePool(SoundPlayer())
 
 # 이미지 로드
-background_image_list = [None, pygame.image.load('resources/images/background.png')]
-
-heart_image_list = [None]
-for i in range(1, 3):
-    heart_image_list.append(pygame.image.load('resources/images/heart' + str(i) + '.png'))
-
-line_image_list = [None, pygame.image.load('resources/images/line.png')]
-
-line_safe_zone_image_list = [None, pygame.image.load('resources/images/line_safe_zone.png')]
-
-rod_image_list = [None, pygame.image.load('resources/images/rod.png')]
-
-effect_image_list = [None]
-for i in range(1, 6):
-    effect_image_list.append(pygame.image.load('resources/images/effect' + str(i) + '.png'))
-
-enemy_image_list = [None]
-for i in range(1, 3):
-    enemy_image_list.append(pygame.image.load('resources/images/enemy' + str(i) + '.png'))
-
-player_image_list = [None]
-for i in range(1, 4):
-    player_image_list.append(pygame.image.load('resources/images/player' + str(i) + '.png'))
-
-other_player_man_list = [None]
-for i in range(1, 4):
-    other_player_man_list.append(pygame.image.load('resources/images/man' + str(i) + '.png'))
-
-other_player_woman_list = [None]
-for i in range(1, 4):
-    other_player_woman_list.append(pygame.image.load('resources/images/woman' + str(i) + '.png'))
+image_lists = load_image_lists(convert=True)
 
 # 폰트 로드
 timer_font = pygame.font.Font('resources/fonts/LAB디지털.ttf', 40)
 small_font = pygame.font.Font('resources/fonts/DungGeunMo.ttf', 30)
 default_font = pygame.font.Font('resources/fonts/DungGeunMo.ttf', 40)
 large_font = pygame.font.Font('resources/fonts/DungGeunMo.ttf', 60)
+profiler_font = pygame.font.Font('resources/fonts/DungGeunMo.ttf', 14)
+
+text_cache = TextCache()
+timer_text_renderer = GlyphText(timer_font, (203, 36, 89))
+
+# 게임 월드 초기화
+replay = None
+if args.replay is not None:
+    replay = load_replay(args.replay)
+    world = replay.create_world(image_lists, sound_player)
+else:
+    config = None
+    if args.field is not None:
+        field_width, field_height = args.field.split('x')
+        config = GameConfig(field_width=int(field_width), field_height=int(field_height))
+    world = World(image_lists, sound_player, config=config)
+enemy = world.enemy
+player = world.player
+
+renderer = None
+if args.render_threads is not None:
+    renderer = BandedRenderer(world, image_lists['background'][1].convert(), args.render_threads or None)
+elif USE_DIRTY_RECT:
+    renderer = DirtyRenderer(world, image_lists['background'][1].convert())
+timer_rect = pygame.Rect(SCREEN_WIDTH - 220, 15, 220, timer_font.get_linesize())
+timestep = FixedTimestep()
+input_queue = InputQueue(KEY_MAP)
+
+profiler = Profiler()
+profiler_overlay = ProfilerOverlay(profiler, profiler_font)
+profiler_overlay.latency_histogram = input_queue.latency_histogram
+
+# 순위 기록은 백그라운드 스레드에서 쓰고 읽는다
+leaderboard = None
+if not args.no_leaderboard and args.replay is None and args.watch is None:
+    leaderboard = Leaderboard(lambda: SqliteScoreStore(args.leaderboard), args.cabinet)
+
+broadcaster = None
+if args.broadcast is not None:
+    broadcaster = SnapshotBroadcaster(port=args.broadcast)
+    print('broadcasting on port %d' % broadcaster.port)
+
+
+# 꺼져 있을 때는 월드와 렌더러에서 아예 시간을 재지 않도록 profiler를 떼어낸다
+def set_profiler_enabled(enabled):
+    profiler.set_enabled(enabled)
+    profiler_overlay.visible = enabled
+    world.profiler = profiler if enabled else None
+    if renderer is not None:
+        renderer.invalidate()
+
+
+def export_profiler_trace():
+    path = time.strftime('trace_%Y%m%d_%H%M%S.json')
+    event_count = profiler.export_trace(path)
+    print('saved %d trace events to %s' % (event_count, path))
+
+
+class MenuScene(GameScene):
+    def __init__(self):
+        super().__init__()
+        self.menu_screen = None
+
+    # 메뉴 화면은 바뀌는 것이 없으므로 한 번만 그려두고 계속 쓴다
+    def compose_menu_screen(self):
+        surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+        surface.blit(image_lists['background'][1], (0, 0))
+        surface.blit(image_lists['enemy'][2], (enemy.pos_x, enemy.pos_y))
 
-# 오브젝트 관리 리스트 생성
-update_object_list = []
-
-render_list = []
-for i in range(RenderLayer.max_length.value):
-    render_list.append([])
-
-collision_list = []
-for i in range(CollideLayer.max_length.value):
-    collision_list.append([])
+        # 타이틀
+        blit_centered(surface, text_cache.render(large_font, '오징어 게임', True, (203, 36, 89)), 200)
 
-# 오브젝트 초기화
-background = GameObject(background_image_list, RenderLayer.back.value, CollideLayer.none.value)
+        # 정보 텍스트
+        blit_centered(surface, text_cache.render(default_font, '시작, 심장박동: SPACE 키', True, (0, 0, 0)), 400)
+        blit_centered(surface, text_cache.render(default_font, '이동: 방향키', True, (0, 0, 0)), 500)
+
+        return surface
+
+    def on_enter(self):
+        self.is_idle = False
+        scene_manager.preload(Scene.play.value)
+
+    def handle_event(self, event):
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
+            scene_manager.change(Scene.play.value)
+
+    def render(self, surface):
+        if self.is_idle:
+            return []
+
+        if self.menu_screen is None:
+            self.menu_screen = self.compose_menu_screen()
+        surface.blit(self.menu_screen, (0, 0))
+        self.is_idle = True
+        return None
+
+
+class PlayScene(GameScene):
+    def __init__(self):
+        super().__init__()
+        self.round_seed = 0
+        self.recorder = None
+        self.replay_player = None
+        self.alpha = 0
+
+    # 메뉴에 있는 동안 새 판을 미리 준비해둔다
+    # 리플레이와 기록을 위해 판마다 시드를 정해서 시작한다
+    def preload(self):
+        if replay is not None:
+            self.round_seed = replay.seed
+        else:
+            self.round_seed = random.getrandbits(63)
+        world.reset(self.round_seed)
+        timer_text_renderer.render('TIME : 0123456789.')
+
+    def on_enter(self):
+        timestep.reset()
+        input_queue.reset(read_key_state())
+        if renderer is not None:
+            renderer.invalidate()
+
+        # 새 판은 위치가 한꺼번에 바뀌므로 키프레임부터 보낸다
+        if broadcaster is not None:
+            broadcaster.encoder.force_keyframe = True
+
+        if replay is not None:
+            self.replay_player = ReplayPlayer(replay)
+        elif args.record is not None:
+            os.makedirs(args.record, exist_ok=True)
+            path = os.path.join(args.record, time.strftime('round_%Y%m%d_%H%M%S.sqrp'))
+            self.recorder = ReplayRecorder(path, world, self.round_seed)
+
+    def on_exit(self):
+        if self.recorder is not None:
+            self.recorder.close(world)
+            self.recorder = None
+
+    def handle_event(self, event):
+        input_queue.push_event(event)
+
+        # 기록하거나 재생할 때는 입력 밖에서 상태를 바꾸는 디버그 키를 막는다
+        if self.recorder is not None or self.replay_player is not None:
+            return
 
-heart = Heart(heart_image_list, RenderLayer.ui_front.value, CollideLayer.none.value)
-heart.pos_x = 0
-heart.pos_y = SCREEN_HEIGHT - 45
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_d:
+            if enemy.state == EnemyState.ready.value:
+                enemy.set_state(EnemyState.watch.value)
+            elif enemy.state == EnemyState.watch.value:
+                enemy.set_state(EnemyState.ready.value)
 
-line = GameObject(line_image_list, RenderLayer.ui_back.value, CollideLayer.none.value)
-line.pos_x = 10
-line.pos_y = SCREEN_HEIGHT - 28
+    def update(self, delta_time):
+        if self.replay_player is not None:
+            step_list = self.replay_player.advance(delta_time)
+            self.alpha = 1.0
+        else:
+            # 프레임마다 눌린 키를 보지 않고 그동안 들어온 키 이벤트를 스텝마다 나눠서 적용한다
+            key_state_list = input_queue.take_key_states(timestep.advance(delta_time))
+            step_list = [(timestep.step_time, key_state) for key_state in key_state_list]
+            self.alpha = timestep.alpha
+
+        for step_time, key_state in step_list:
+            world.step(step_time, key_state)
+            if self.recorder is not None:
+                self.recorder.record(step_time, key_state)
+
+        if broadcaster is not None:
+            broadcaster.update(world, delta_time)
+
+        if world.is_over or (self.replay_player is not None and self.replay_player.is_finished()):
+            scene_manager.change(Scene.result.value)
+
+    def render(self, surface):
+        extra_rect_list = [timer_rect]
+        if profiler_overlay.visible:
+            extra_rect_list.append(profiler_overlay.rect)
+
+        update_rect_list = None
+        if renderer is not None:
+            update_rect_list = renderer.render(surface, extra_rect_list, self.alpha)
+        else:
+            world.render(surface, self.alpha)
+
+        profiler.begin('text')
+        self.render_timer(surface)
+        profiler.end()
+
+        if profiler_overlay.visible:
+            profiler.begin('overlay')
+            profiler_overlay.render(surface)
+            profiler.end()
+        return update_rect_list
+
+    def render_timer(self, surface):
+        timer_text = timer_text_renderer.render('TIME : ' + str(round(world.config.remain_time - world.game_timer, 2)))
+        surface.blit(timer_text, (SCREEN_WIDTH - 220, 15))
+
+
+class ResultScene(GameScene):
+    def __init__(self):
+        super().__init__()
+        self.result_screen = None
+        self.summary_future = None
+        self.is_drawn = False
+
+    # 결과 화면은 마지막 플레이 장면 위에 글자를 얹은 것이라 씬에 들어올 때 한 번만 합성한다
+    def compose_result_screen(self):
+        # 화면을 복사하면 켜져 있던 프로파일러 오버레이까지 굳어버리므로 월드를 새 표면에 다시 그린다
+        play_scene = scene_manager.scene_dict[Scene.play.value]
+        surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+        world.render(surface, play_scene.alpha)
+        play_scene.render_timer(surface)
 
-line_safe_zone = GameObject(line_safe_zone_image_list, RenderLayer.ui_back.value, CollideLayer.none.value)
-line_safe_zone.pos_x = 140
-line_safe_zone.pos_y = SCREEN_HEIGHT - 28
+        # 게임 결과 텍스트
+        if player.state == PlayerState.success.value:
+            result_string = '성   공'
+        else:
+            result_string = '실   패'
+        blit_centered(surface, text_cache.render(large_font, result_string, True, (203, 36, 89)), 200)
 
-rod = Rod(rod_image_list, RenderLayer.ui_middle.value, CollideLayer.none.value)
-rod.pos_x = ROAD_POS_X
-rod.pos_y = SCREEN_HEIGHT - rod.height - 3
+        # 남은 시간 텍스트
+        if player.state == PlayerState.success.value:
+            score_string = '남은 시간: ' + str(round(world.config.remain_time - world.game_timer, 3))
+            blit_centered(surface, default_font.render(score_string, True, (0, 0, 0)), 400)
 
-effect = Effect(effect_image_list, RenderLayer.ui_middle.value, CollideLayer.none.value)
+        # 재시작 정보 텍스트
+        blit_centered(surface, text_cache.render(default_font, '재시작: SPACE 키', True, (0, 0, 0)), 500)
 
-enemy = Enemy(enemy_image_list, RenderLayer.middle.value, CollideLayer.none.value)
-enemy.pos_x = SCREEN_WIDTH / 2 - enemy.width / 2
-enemy.pos_y = 18
+        return surface
 
-player = Player(player_image_list, RenderLayer.front_2.value, CollideLayer.group_a.value)
-player.initialize()
+    def on_enter(self):
+        self.is_idle = False
+        sound_player.stop(SoundEvent.voice)
+        sound_player.stop(SoundEvent.heartbeat_slow)
+        sound_player.stop(SoundEvent.heartbeat_fast)
 
-man_count = random.randint(int((MAX_PLAYER_COUNT + 1) / 3 * 1), int((MAX_PLAYER_COUNT + 1) / 3 * 2))
-woman_count = MAX_PLAYER_COUNT - man_count
+        if player.state == PlayerState.success.value:
+            sound_player.play(SoundEvent.clear)
+
+        self.result_screen = self.compose_result_screen()
+
+        # 기록은 큐에 넣기만 하고, 순위는 조회가 끝나는 프레임에 결과 화면에 덧붙인다
+        if leaderboard is not None:
+            success = player.state == PlayerState.success.value
+            remain_time = round(world.config.remain_time - world.game_timer, 3)
+            leaderboard.submit(RunRecord(leaderboard.cabinet, success, remain_time, world.count_crowd_result()[1],
+                                         world.rod.pass_count, world.rod.miss_count,
+                                         scene_manager.scene_dict[Scene.play.value].round_seed))
+            self.summary_future = leaderboard.request_summary(remain_time if success else None)
+
+    def on_exit(self):
+        self.result_screen = None
+        self.summary_future = None
+        self.is_drawn = False
+
+    def compose_leaderboard(self, summary):
+        pos_y = 580
+        if summary.rank is not None:
+            line = '전체 %d위 / %d (상위 %.1f%%)' % (summary.rank, summary.total_count, summary.calc_top_percent())
+            blit_centered(self.result_screen, small_font.render(line, True, (0, 0, 0)), pos_y)
+            pos_y += 40
+            line = '이 기계 %d위 / %d' % (summary.cabinet_rank, summary.cabinet_total_count)
+            blit_centered(self.result_screen, small_font.render(line, True, (0, 0, 0)), pos_y)
+            pos_y += 40
+
+        for i, (remain_time, cabinet, finish_time) in enumerate(summary.top_list):
+            line = '%d. %.3f  %s' % (i + 1, remain_time, cabinet)
+            blit_centered(self.result_screen, small_font.render(line, True, (0, 0, 0)), pos_y + i * 34)
+
+    def handle_event(self, event):
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
+            scene_manager.change(Scene.menu.value)
+
+    def render(self, surface):
+        if self.is_idle:
+            return []
+
+        # 순위 조회가 끝날 때까지는 잠들지 않고 프레임마다 확인한다
+        future = self.summary_future
+        if future is not None:
+            if not future.done():
+                if self.is_drawn:
+                    return []
+            else:
+                self.summary_future = None
+                if future.exception() is None:
+                    self.compose_leaderboard(future.result())
+
+        surface.blit(self.result_screen, (0, 0))
+        self.is_drawn = True
+        self.is_idle = self.summary_future is None
+        return None
+
+
+# 시뮬레이션 없이 관전 스트림으로 받은 상태만 그린다
+class WatchScene(GameScene):
+    def __init__(self):
+        super().__init__()
+        self.receiver = None
+        self.view = SpectatorView(image_lists)
+        self.renderer = DirtyRenderer(self.view, image_lists['background'][1].convert())
+        self.frame_time = 0
+        self.alpha = 1.0
+
+    def on_enter(self):
+        host, port = args.watch.rsplit(':', 1)
+        self.receiver = SnapshotReceiver(host, int(port))
+        self.renderer.invalidate()
+
+    def on_exit(self):
+        self.receiver.close()
+
+    def update(self, delta_time):
+        frame_list = self.receiver.poll()
+        if frame_list:
+            # 필드 크기가 다른 판이면 배경과 카메라가 바뀌므로 렌더러를 새로 만든다
+            if self.view.apply(frame_list[-1]):
+                self.renderer = DirtyRenderer(self.view, image_lists['background'][1].convert())
+            self.frame_time = 0
+        else:
+            self.frame_time += delta_time
+        self.view.update(delta_time)
+
+        # 스트림 프레임 사이는 지난 프레임과 보간해서 그린다
+        frame = self.view.frame
+        if frame is not None:
+            self.alpha = min(self.frame_time * frame.stream_rate, 1.0)
+
+    def render(self, surface):
+        frame = self.view.frame
+        update_rect_list = self.renderer.render(surface, [timer_rect], self.alpha)
+
+        if frame is None:
+            status_text = text_cache.render(small_font, '연결 중...', True, (0, 0, 0))
+        elif not self.receiver.is_connected:
+            status_text = text_cache.render(small_font, '연결 끊김', True, (0, 0, 0))
+        else:
+            status_text = timer_text_renderer.render('TIME : ' + str(round(frame.remain_time - frame.game_timer, 2)))
+        surface.blit(status_text, (SCREEN_WIDTH - 220, 15))
+        return update_rect_list
 
-for i in range(man_count):
-    other_player = OtherPlayer(other_player_man_list, RenderLayer.front_1.value, CollideLayer.group_b.value)
-    other_player.initialize()
 
-for i in range(woman_count):
-    other_player = OtherPlayer(other_player_woman_list, RenderLayer.front_1.value, CollideLayer.group_b.value)
-    other_player.initialize()
+scene_manager = SceneManager()
+scene_manager.add(Scene.menu.value, MenuScene())
+scene_manager.add(Scene.play.value, PlayScene())
+scene_manager.add(Scene.result.value, ResultScene())
+if args.watch is not None:
+    scene_manager.add(Scene.watch.value, WatchScene())
+    scene_manager.change(Scene.watch.value)
+else:
+    scene_manager.change(Scene.menu.value)
 
 # 기타 변수 초기화
 clock = pygame.time.Clock()
+tick_time = time.perf_counter()
 is_running = True
-scene_index = Scene.menu.value
-game_timer = 0
-is_game_success = False
+set_profiler_enabled(args.profile)
 
 while is_running:
-    clock.tick(60)
+    profiler.begin_frame()
+    scene_manager.apply_change()
+    scene = scene_manager.current_scene
+
+    # 화면이 바뀌지 않는 씬에서는 입력이 올 때까지 잠들어서 CPU를 쓰지 않는다
+    # 다음 프레임까지 기다리는 동안에도 이벤트가 오면 바로 깨어나서 받은 시간을 적는다
+    profiler.begin('wait')
+    if scene.is_idle:
+        event_list = stamp_events([pygame.event.wait(IDLE_WAIT_TIME)] + pygame.event.get(), time.perf_counter())
+    else:
+        event_list = wait_events(tick_time + FRAME_TIME)
+    clock.tick()
+    tick_time = time.perf_counter()
+    profiler.end()
 
-    for event in pygame.event.get():
+    profiler.begin('events')
+    for event in event_list:
         if event.type == pygame.QUIT:
             is_running = False
-        if event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_ESCAPE:
-                is_running = False
-            if scene_index == Scene.menu.value:
-                if event.key == pygame.K_SPACE:
-                    scene_index = Scene.play.value
-            if scene_index == Scene.play.value:
-                if event.key == pygame.K_d:
-                    if enemy.state == EnemyState.ready.value:
-                        enemy.state = EnemyState.watch.value
-                    elif enemy.state == EnemyState.watch.value:
-                        enemy.state = EnemyState.ready.value
-            if scene_index == Scene.result.value:
-                if event.key == pygame.K_SPACE:
-                    scene_index = Scene.menu.value
-
-    if scene_index == Scene.menu.value:
-        game_timer = 0
-        is_game_success = False
-        other_player_move_range = 10
-
-        for game_object in update_object_list:
-            game_object.initialize()
-
-        screen.blit(background_image_list[1], (0, 0))
-        screen.blit(enemy_image_list[2], (enemy.pos_x, enemy.pos_y))
-
-        # 타이틀
-        result_text = large_font.render('오징어 게임', True, (203, 36, 89))
-        text_rect = result_text.get_rect()
-        text_rect.centerx = round(SCREEN_WIDTH / 2)
-        text_rect.y = 200
-        screen.blit(result_text, text_rect)
-
-        # 정보 텍스트
-        replay_text = default_font.render('시작, 심장박동: SPACE 키', True, (0, 0, 0))
-        text_rect = replay_text.get_rect()
-        text_rect.centerx = round(SCREEN_WIDTH / 2)
-        text_rect.y = 400
-        screen.blit(replay_text, text_rect)
-
-        # 정보 텍스트
-        replay_text = default_font.render('이동: 방향키', True, (0, 0, 0))
-        text_rect = replay_text.get_rect()
-        text_rect.centerx = round(SCREEN_WIDTH / 2)
-        text_rect.y = 500
-        screen.blit(replay_text, text_rect)
-
-    if scene_index == Scene.play.value:
-        game_timer += clock.get_time() / 1000
-
-        if game_timer > 35:
-            other_player_move_range = 4
-
-        if game_timer > 44:
-            other_player_move_range = 2
-
-        if game_timer >= REMAIN_TIME:
-            game_timer = REMAIN_TIME
-            player.state = PlayerState.dead.value
-
-        for game_object in update_object_list:
-            game_object.update()
-
-        player.restore_speed()
-
-        for game_object in collision_list[CollideLayer.group_b.value]:
-            if check_collide_rect(player, game_object):
-                if game_object.state == PlayerState.dead.value:
-                    player.speed = 1
-
-        for layer in render_list:
-            for game_object in layer:
-                game_object.render()
-                # pygame.draw.rect(screen, (0, 255, 0), calc_rect_collider(game_object), 1)
-
-        timer_text = timer_font.render('TIME : ' + str(round(REMAIN_TIME - game_timer, 2)), True, (203, 36, 89))
-        screen.blit(timer_text, (SCREEN_WIDTH - 220, 15))
-
-    if scene_index == Scene.result.value:
-        voice_sound.stop()
-        heartbeat_sound_slow.stop()
-        heartbeat_sound_fast.stop()
-
-        # 게임 결과 텍스트 표시
-        if player.state == PlayerState.success.value:
-            result_string = '성   공'
-            if is_game_success is False:
-                clear_sound.play()
-                is_game_success = True
-        else:
-            result_string = '실   패'
-
-        # 게임 결과 텍스트
-        result_text = large_font.render(result_string, True, (203, 36, 89))
-        text_rect = result_text.get_rect()
-        text_rect.centerx = round(SCREEN_WIDTH / 2)
-        text_rect.y = 200
-        screen.blit(result_text, text_rect)
-
-        # 남은 시간 텍스트
-        if player.state == PlayerState.success.value:
-            score_text = default_font.render('남은 시간: ' + str(round(REMAIN_TIME - game_timer, 3)), True, (0, 0, 0))
-            text_rect = score_text.get_rect()
-            text_rect.centerx = round(SCREEN_WIDTH / 2)
-            text_rect.y = 400
-            screen.blit(score_text, text_rect)
-
-        # 재시작 정보 텍스트
-        replay_text = default_font.render('재시작: SPACE 키', True, (0, 0, 0))
-        text_rect = replay_text.get_rect()
-        text_rect.centerx = round(SCREEN_WIDTH / 2)
-        text_rect.y = 500
-        screen.blit(replay_text, text_rect)
-
-    pygame.display.update()
-
-pygame.quit()
\ No newline at end of file
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+            is_running = False
+        if event.type == pygame.KEYDOWN and event.key == PROFILER_TOGGLE_KEY:
+            set_profiler_enabled(not profiler.enabled)
+        if event.type == pygame.KEYDOWN and event.key == PROFILER_TRACE_KEY and profiler.enabled:
+            export_profiler_trace()
+        scene.handle_event(event)
+    profiler.end()
+
+    if scene_manager.apply_change():
+        scene = scene_manager.current_scene
+        clock.tick()
+        tick_time = time.perf_counter()
+
+    profiler.begin('scene.update')
+    scene.update(clock.get_time() / 1000)
+    sound_player.flush()
+    profiler.end()
+
+    profiler.begin('render')
+    update_rect_list = scene.render(screen)
+    profiler.end()
+
+    profiler.begin('display.update')
+    if update_rect_list is None:
+        pygame.display.update()
+    elif update_rect_list:
+        pygame.display.update(update_rect_list)
+    input_queue.present(time.perf_counter())
+    profiler.end()
+    profiler.end_frame()
+
+scene_manager.shutdown()
+latency_stats = input_queue.get_latency_stats()
+if latency_stats is not None:
+    print('input latency %(count)d events, mean %(mean).1f ms, p50 %(p50).1f ms, p95 %(p95).1f ms, max %(max).1f ms'
+          % latency_stats)
+sound_player.close()
+if leaderboard is not None:
+    leaderboard.close()
+if isinstance(renderer, BandedRenderer):
+    renderer.close()
+if broadcaster is not None:
+    broadcaster.close()
+pygame.quit()
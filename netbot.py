@@ -0,0 +1,171 @@
+import argparse
+import asyncio
+import random
+import time
+
+from protocol import (
+    DEFAULT_PORT,
+    MESSAGE_WELCOME, MESSAGE_ROUND_START, MESSAGE_SNAPSHOT, MESSAGE_ROUND_END,
+    INPUT_STRUCT, WELCOME_STRUCT, ROUND_START_STRUCT, ROUND_END_STRUCT, MESSAGE_INPUT,
+    SnapshotHistory, decode_snapshot, encode_hello, encode_message, read_message,
+)
+from replay import pack_key_state
+from world import MAX_PLAYER_COUNT, OnKeyDown, EnemyState, PlayerState, create_key_state
+
+# 감시 시간이 시작될 때 이동 상태로 남아있지 않도록 네트워크 지연을 감안해서 일찍 손을 뗀다
+READY_RELEASE_MARGIN = 0.3
+
+# 막대 위치를 이만큼(초) 앞서 예측해서 누른다
+ROD_LEAD_TIME = 0.02
+
+
+# 서버에 접속해서 스냅샷을 받고 스크립트대로 입력을 보내는 봇 클라이언트
+class BotClient:
+    def __init__(self, name, seed=None):
+        self.name = name
+        self.random = random.Random(seed)
+        self.client_id = 0
+        self.history = SnapshotHistory()
+        self.ack_tick = 0
+        self.input_seq = 0
+        self.round_info = None
+        self.view = {}
+        self.is_up_pressed = False
+        self.last_rod_pos_x = None
+        self.rod_direction = 1
+
+        self.snapshot_count = 0
+        self.full_snapshot_count = 0
+        self.missing_base_count = 0
+        self.received_byte_count = 0
+        self.result_list = []
+
+    def decide_key_state(self, header):
+        key_state = create_key_state()
+        (tick, base_tick, game_timer, enemy_state, beat_rate, enemy_state_time,
+         state, pos_x, pos_y, rod_pos_x, rod_save) = header
+        ready_time, watch_time, remain_time, safe_zone_left, safe_zone_right, rod_width = self.round_info[2:]
+
+        if state != PlayerState.idle.value and state != PlayerState.move.value:
+            return key_state
+
+        if enemy_state == EnemyState.ready.value:
+            self.last_rod_pos_x = None
+            if enemy_state_time < ready_time - READY_RELEASE_MARGIN:
+                self.is_up_pressed = not self.is_up_pressed
+                key_state[OnKeyDown.up.value] = self.is_up_pressed
+            return key_state
+
+        # 막대가 움직이는 방향을 지난 스냅샷과 비교해서 알아낸다
+        if self.last_rod_pos_x is None:
+            self.rod_direction = 1
+        elif rod_pos_x != self.last_rod_pos_x:
+            self.rod_direction = 1 if rod_pos_x > self.last_rod_pos_x else -1
+        self.last_rod_pos_x = rod_pos_x
+
+        predicted_pos_x = rod_pos_x + self.rod_direction * beat_rate * 50 * ROD_LEAD_TIME
+        if not rod_save and safe_zone_left <= predicted_pos_x and predicted_pos_x + rod_width <= safe_zone_right:
+            key_state[OnKeyDown.space.value] = True
+        return key_state
+
+    def handle_snapshot(self, payload, writer):
+        header, changed_list, removed_list = decode_snapshot(payload)
+        tick = header[0]
+        base_tick = header[1]
+        self.snapshot_count += 1
+        if base_tick == 0:
+            self.full_snapshot_count += 1
+
+        view = self.history.apply(tick, base_tick, changed_list, removed_list)
+        if view is None:
+            # 기준 스냅샷을 이미 버렸다면 ack를 올리지 않는다, 서버가 곧 전체 스냅샷을 보낸다
+            self.missing_base_count += 1
+        else:
+            self.view = view
+            self.ack_tick = tick
+
+        if self.round_info is None:
+            return
+        key_state = self.decide_key_state(header)
+        self.input_seq += 1
+        writer.write(encode_message(MESSAGE_INPUT, INPUT_STRUCT.pack(self.input_seq, self.ack_tick,
+                                                                     pack_key_state(key_state))))
+
+    async def run(self, host, port, round_count=1):
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(encode_hello(self.name))
+
+        try:
+            while len(self.result_list) < round_count:
+                message_type, payload = await read_message(reader)
+                self.received_byte_count += len(payload)
+
+                if message_type == MESSAGE_SNAPSHOT:
+                    self.handle_snapshot(payload, writer)
+                elif message_type == MESSAGE_WELCOME:
+                    self.client_id = WELCOME_STRUCT.unpack(payload)[0]
+                elif message_type == MESSAGE_ROUND_START:
+                    self.round_info = ROUND_START_STRUCT.unpack(payload)
+                    self.history.clear()
+                    self.ack_tick = 0
+                    self.view = {}
+                elif message_type == MESSAGE_ROUND_END:
+                    self.result_list.append(ROUND_END_STRUCT.unpack(payload))
+                    self.round_info = None
+        finally:
+            writer.close()
+
+
+async def run_bots(args):
+    server = None
+    server_task = None
+    host = args.host
+    port = args.port
+
+    # 같은 프로세스 안에 서버를 띄워서 루프백으로만 시험한다
+    if args.serve:
+        from assets import load_image_lists
+        from server import GameServer
+
+        server = GameServer(load_image_lists(), args.bots, args.crowd, seed=args.seed)
+        port = await server.start(host, 0)
+        server_task = asyncio.create_task(server.serve_rounds(args.rounds, args.clients, 0.5))
+
+    bot_list = [BotClient('bot%d' % i, seed=i) for i in range(args.clients)]
+    start_time = time.perf_counter()
+    await asyncio.gather(*[bot.run(host, port, args.rounds) for bot in bot_list])
+    elapsed_time = time.perf_counter() - start_time
+
+    if server is not None:
+        await server_task
+        await server.close()
+
+    snapshot_count = sum(bot.snapshot_count for bot in bot_list)
+    byte_count = sum(bot.received_byte_count for bot in bot_list)
+    success_count = sum(1 for bot in bot_list for result in bot.result_list if result[1] == PlayerState.success.value)
+    print('%d clients, %d rounds in %.1f s' % (len(bot_list), args.rounds, elapsed_time))
+    print('  human results: %d success / %d' % (success_count, len(bot_list) * args.rounds))
+    print('  snapshots: %d (%.1f per client per s), full %d, missing base %d'
+          % (snapshot_count, snapshot_count / len(bot_list) / elapsed_time,
+             sum(bot.full_snapshot_count for bot in bot_list), sum(bot.missing_base_count for bot in bot_list)))
+    print('  received: %.1f bytes per snapshot, %.1f KB/s per client'
+          % (byte_count / max(snapshot_count, 1), byte_count / len(bot_list) / elapsed_time / 1024))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='스크립트 봇 클라이언트로 멀티플레이 서버를 시험한다')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--clients', type=int, default=10)
+    parser.add_argument('--rounds', type=int, default=1)
+    parser.add_argument('--serve', action='store_true', help='같은 프로세스에서 서버도 띄운다')
+    parser.add_argument('--bots', type=int, default=MAX_PLAYER_COUNT, help='--serve일 때 서버의 봇 참가자 수')
+    parser.add_argument('--crowd', choices=['object', 'numpy'], default='object')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    asyncio.run(run_bots(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+import bisect
+import json
+import time
+from collections import deque
+
+import pygame
+
+# 최근 몇 프레임을 들고 있을지 (히스토그램, 그래프, 트레이스 모두 같은 길이)
+HISTORY_SIZE = 240
+
+# 히스토그램 구간 경계(ms)
+HISTOGRAM_EDGES = (0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 16.7, 33.3, 50, 100)
+
+OVERLAY_WIDTH = HISTORY_SIZE + 80
+OVERLAY_GRAPH_HEIGHT = 80
+OVERLAY_TOP_COUNT = 8
+OVERLAY_GRAPH_MAX_TIME = 50
+OVERLAY_TARGET_TIME = 1000 / 60
+
+# 글자는 매 프레임 다시 그릴 필요가 없어서 이 간격(초)마다 갱신한다
+OVERLAY_TEXT_INTERVAL = 0.25
+
+
+# 최근 HISTORY_SIZE개 값만 유지하는 구간별 개수 히스토그램
+class RollingHistogram:
+    def __init__(self, window=HISTORY_SIZE, edges=HISTOGRAM_EDGES):
+        self.window = window
+        self.edges = edges
+        self.count_list = [0] * (len(edges) + 1)
+        self.value_list = deque()
+        self.total = 0
+        self.max_value = 0
+
+    def add(self, value):
+        if len(self.value_list) >= self.window:
+            old_value = self.value_list.popleft()
+            self.count_list[bisect.bisect_left(self.edges, old_value)] -= 1
+            self.total -= old_value
+
+        self.value_list.append(value)
+        self.count_list[bisect.bisect_left(self.edges, value)] += 1
+        self.total += value
+
+    def calc_mean(self):
+        if not self.value_list:
+            return 0
+        return self.total / len(self.value_list)
+
+    # 값이 들어있는 구간의 위쪽 경계를 돌려준다
+    def calc_percentile(self, percent):
+        target_count = len(self.value_list) * percent / 100
+        count = 0
+        for i, bucket_count in enumerate(self.count_list):
+            count += bucket_count
+            if count >= target_count and count > 0:
+                if i < len(self.edges):
+                    return self.edges[i]
+                return max(self.value_list)
+        return 0
+
+
+# 프레임 안의 구간별 시간을 잰다
+# 꺼져 있을 때는 begin, end가 바로 돌아가고, World와 렌더러는 profiler가 None이면 아예 재지 않는다
+class Profiler:
+    def __init__(self, history_size=HISTORY_SIZE):
+        self.enabled = False
+        self.history_size = history_size
+        self.origin_time = time.perf_counter()
+        self.frame_start_time = None
+        self.stack = []
+        self.event_list = []
+        self.frame_time_list = deque(maxlen=history_size)
+        self.trace_frame_list = deque(maxlen=history_size)
+        self.histogram_dict = {}
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        self.frame_start_time = None
+        self.stack.clear()
+        self.event_list = []
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self.frame_start_time = time.perf_counter()
+        self.stack.clear()
+        self.event_list = []
+
+    def end_frame(self):
+        if not self.enabled or self.frame_start_time is None:
+            return
+
+        end_time = time.perf_counter()
+        self.add('frame', self.frame_start_time, end_time)
+        self.frame_time_list.append((end_time - self.frame_start_time) * 1000)
+        self.frame_start_time = None
+
+        # 같은 이름의 구간은 프레임 안에서 합쳐서 히스토그램에 넣는다, 이번 프레임에 없던 구간은 0
+        frame_total_dict = {}
+        for name, start_time, duration in self.event_list:
+            frame_total_dict[name] = frame_total_dict.get(name, 0) + duration
+
+        for name in frame_total_dict:
+            if name not in self.histogram_dict:
+                self.histogram_dict[name] = RollingHistogram(self.history_size)
+        for name, histogram in self.histogram_dict.items():
+            histogram.add(frame_total_dict.get(name, 0) * 1000)
+
+        self.trace_frame_list.append(self.event_list)
+        self.event_list = []
+
+    def begin(self, name):
+        if self.enabled:
+            self.stack.append((name, time.perf_counter()))
+
+    def end(self):
+        if self.enabled and self.stack:
+            name, start_time = self.stack.pop()
+            self.add(name, start_time, time.perf_counter())
+
+    # 이미 잰 구간을 넣는다 (반복문 안에서 직접 시간을 재는 곳에서 쓴다)
+    def add(self, name, start_time, end_time):
+        self.event_list.append((name, start_time, end_time - start_time))
+
+    # 평균 시간이 큰 순서로 (이름, 평균 ms, p95 ms)
+    def get_top_costs(self, count=OVERLAY_TOP_COUNT):
+        cost_list = [(name, histogram.calc_mean(), histogram.calc_percentile(95))
+                     for name, histogram in self.histogram_dict.items() if name != 'frame']
+        cost_list.sort(key=lambda cost: -cost[1])
+        return cost_list[:count]
+
+    # 최근 프레임들을 크롬 trace event 형식(chrome://tracing, Perfetto)으로 저장한다
+    def export_trace(self, path):
+        trace_event_list = []
+        for event_list in self.trace_frame_list:
+            for name, start_time, duration in event_list:
+                trace_event_list.append({
+                    'name': name,
+                    'cat': name.split('.')[0],
+                    'ph': 'X',
+                    'ts': (start_time - self.origin_time) * 1000000,
+                    'dur': duration * 1000000,
+                    'pid': 1,
+                    'tid': 1,
+                })
+
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump({'traceEvents': trace_event_list, 'displayTimeUnit': 'ms'}, file)
+        return len(trace_event_list)
+
+
+# 프레임 시간 그래프와 가장 오래 걸린 구간을 화면 위에 그린다
+# latency_histogram을 넣으면 맨 아래 줄에 입력 지연도 보여준다
+class ProfilerOverlay:
+    def __init__(self, profiler, font, pos_x=10, pos_y=60):
+        self.profiler = profiler
+        self.font = font
+        self.visible = False
+        self.latency_histogram = None
+        line_height = font.get_linesize()
+        self.rect = pygame.Rect(pos_x, pos_y, OVERLAY_WIDTH,
+                                OVERLAY_GRAPH_HEIGHT + line_height * (OVERLAY_TOP_COUNT + 2) + 8)
+        self.surface = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+        self.text_surface = pygame.Surface((self.rect.width, self.rect.height - OVERLAY_GRAPH_HEIGHT), pygame.SRCALPHA)
+        self.text_time = 0
+
+    def compose_text(self):
+        self.text_surface.fill((0, 0, 0, 0))
+        line_height = self.font.get_linesize()
+
+        frame_histogram = self.profiler.histogram_dict.get('frame')
+        if frame_histogram is not None:
+            line = 'frame %.2f ms  p95 %.1f ms' % (frame_histogram.calc_mean(), frame_histogram.calc_percentile(95))
+            self.text_surface.blit(self.font.render(line, True, (255, 255, 255)), (4, 4))
+
+        for i, (name, mean_time, p95_time) in enumerate(self.profiler.get_top_costs()):
+            line = '%-20s %6.2f  p95 %5.1f' % (name, mean_time, p95_time)
+            self.text_surface.blit(self.font.render(line, True, (255, 255, 255)), (4, 4 + line_height * (i + 1)))
+
+        if self.latency_histogram is not None and self.latency_histogram.value_list:
+            line = 'input %.1f ms  p95 %.1f ms  max %.1f ms' % (self.latency_histogram.calc_mean(),
+                                                               self.latency_histogram.calc_percentile(95),
+                                                               max(self.latency_histogram.value_list))
+            self.text_surface.blit(self.font.render(line, True, (255, 255, 0)),
+                                   (4, 4 + line_height * (OVERLAY_TOP_COUNT + 1)))
+
+    def render(self, surface):
+        now = time.perf_counter()
+        if now - self.text_time >= OVERLAY_TEXT_INTERVAL:
+            self.text_time = now
+            self.compose_text()
+
+        self.surface.fill((0, 0, 0, 160))
+
+        # 프레임 시간 막대 그래프, 목표 프레임 시간을 넘으면 빨간색
+        scale = OVERLAY_GRAPH_HEIGHT / OVERLAY_GRAPH_MAX_TIME
+        for i, frame_time in enumerate(self.profiler.frame_time_list):
+            height = min(frame_time * scale, OVERLAY_GRAPH_HEIGHT)
+            color = (80, 220, 80) if frame_time <= OVERLAY_TARGET_TIME else (230, 60, 60)
+            pygame.draw.line(self.surface, color, (i, OVERLAY_GRAPH_HEIGHT - 1),
+                             (i, OVERLAY_GRAPH_HEIGHT - 1 - height))
+        target_y = OVERLAY_GRAPH_HEIGHT - 1 - OVERLAY_TARGET_TIME * scale
+        pygame.draw.line(self.surface, (255, 255, 0), (0, target_y), (self.rect.width, target_y))
+
+        self.surface.blit(self.text_surface, (0, OVERLAY_GRAPH_HEIGHT))
+        surface.blit(self.surface, self.rect)
+        return self.rect
@@ -0,0 +1,141 @@
+import struct
+from collections import OrderedDict
+
+# 멀티플레이 서버와 클라이언트가 주고받는 메시지 형식
+# 모든 메시지는 (본문 길이, 종류) 헤더 뒤에 본문이 붙는다
+PROTOCOL_VERSION = 1
+DEFAULT_PORT = 7878
+
+FRAME_HEADER_STRUCT = struct.Struct('<IB')
+
+MESSAGE_HELLO = 1
+MESSAGE_WELCOME = 2
+MESSAGE_INPUT = 3
+MESSAGE_ROUND_START = 4
+MESSAGE_SNAPSHOT = 5
+MESSAGE_ROUND_END = 6
+
+# 클라이언트 -> 서버
+# HELLO: 프로토콜 버전 + 이름(utf-8)
+# INPUT: 입력 번호, 마지막으로 받은 스냅샷 틱(델타 기준), 키 비트마스크
+HELLO_STRUCT = struct.Struct('<H')
+INPUT_STRUCT = struct.Struct('<IIB')
+
+# 서버 -> 클라이언트
+# WELCOME: 클라이언트 번호, 틱 속도, 스냅샷 속도
+# ROUND_START: 판 번호, 내 엔티티 번호, 준비/감시/제한 시간, 노란 구간 왼쪽/오른쪽, 막대 폭
+# ROUND_END: 판 번호, 내 상태, 게임 시간, 결승선 도착/사망/전체 참가자 수
+WELCOME_STRUCT = struct.Struct('<HHH')
+ROUND_START_STRUCT = struct.Struct('<IHfffhhh')
+ROUND_END_STRUCT = struct.Struct('<IBfHHH')
+
+# SNAPSHOT: 틱, 기준 틱(0이면 전체), 게임 시간, 적 상태, 박자, 적 상태 시간,
+#           내 상태, 내 x, y, 내 막대 x, 이번 왕복에 성공했는지, 바뀐 엔티티 수, 사라진 엔티티 수
+# 뒤에 바뀐 엔티티 (번호, x, y, 상태)와 사라진 엔티티 번호가 붙는다
+SNAPSHOT_HEADER_STRUCT = struct.Struct('<IIfBBfBhhhBHH')
+ENTITY_STRUCT = struct.Struct('<HhhB')
+
+# 사람 참가자의 엔티티 번호는 여기서부터 붙인다 (그 아래는 봇 참가자)
+HUMAN_ENTITY_ID_BASE = 0x8000
+
+# 델타 기준으로 쓸 수 있도록 최근 스냅샷을 몇 개까지 들고 있을지
+SNAPSHOT_HISTORY_SIZE = 64
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def encode_message(message_type, payload=b''):
+    return FRAME_HEADER_STRUCT.pack(len(payload), message_type) + payload
+
+
+async def read_message(reader):
+    header = await reader.readexactly(FRAME_HEADER_STRUCT.size)
+    length, message_type = FRAME_HEADER_STRUCT.unpack(header)
+    payload = await reader.readexactly(length) if length > 0 else b''
+    return message_type, payload
+
+
+def encode_hello(name):
+    return encode_message(MESSAGE_HELLO, HELLO_STRUCT.pack(PROTOCOL_VERSION) + name.encode('utf-8'))
+
+
+def decode_hello(payload):
+    version, = HELLO_STRUCT.unpack_from(payload)
+    if version != PROTOCOL_VERSION:
+        raise ProtocolError('unsupported protocol version %d' % version)
+    return payload[HELLO_STRUCT.size:].decode('utf-8', 'replace')
+
+
+# 바뀐 엔티티 리스트 [(번호, x, y, 상태)]와 사라진 번호 리스트를 스냅샷 본문으로 만든다
+# 같은 본문을 받을 클라이언트끼리 나눠 쓸 수 있도록 헤더와 따로 만든다
+def encode_snapshot_body(changed_list, removed_list):
+    data = []
+    if changed_list:
+        data.append(struct.pack('<' + 'HhhB' * len(changed_list), *[value for entity in changed_list
+                                                                     for value in entity]))
+    if removed_list:
+        data.append(struct.pack('<%dH' % len(removed_list), *removed_list))
+    return len(changed_list), len(removed_list), b''.join(data)
+
+
+def encode_snapshot(header, body):
+    changed_count, removed_count, data = body
+    return encode_message(MESSAGE_SNAPSHOT, SNAPSHOT_HEADER_STRUCT.pack(*header, changed_count, removed_count) + data)
+
+
+def decode_snapshot(payload):
+    header = SNAPSHOT_HEADER_STRUCT.unpack_from(payload)
+    changed_count = header[-2]
+    removed_count = header[-1]
+    offset = SNAPSHOT_HEADER_STRUCT.size
+
+    end = offset + changed_count * ENTITY_STRUCT.size
+    changed_list = list(ENTITY_STRUCT.iter_unpack(payload[offset:end]))
+    removed_list = list(struct.unpack_from('<%dH' % removed_count, payload, end))
+    return header[:-2], changed_list, removed_list
+
+
+# 기준 상태와 비교해서 (바뀐 엔티티 리스트, 사라진 번호 리스트)를 만든다
+def diff_views(base_view, view):
+    changed_list = [(entity_id,) + state for entity_id, state in view.items() if base_view.get(entity_id) != state]
+    removed_list = [entity_id for entity_id in base_view if entity_id not in view]
+    return changed_list, removed_list
+
+
+# 틱별 엔티티 상태 {번호: (x, y, 상태)}를 최근 몇 개만 들고 있는다
+# 서버는 클라이언트에게 보낸 상태를, 클라이언트는 받아서 복원한 상태를 같은 방식으로 보관한다
+class SnapshotHistory:
+    def __init__(self, size=SNAPSHOT_HISTORY_SIZE):
+        self.size = size
+        self.view_dict = OrderedDict()
+
+    def clear(self):
+        self.view_dict.clear()
+
+    def get(self, tick):
+        return self.view_dict.get(tick)
+
+    def add(self, tick, view):
+        self.view_dict[tick] = view
+        while len(self.view_dict) > self.size:
+            self.view_dict.popitem(last=False)
+
+    # 받은 스냅샷을 기준 상태에 적용해서 이번 틱 상태를 만든다, 기준 상태가 없으면 None
+    def apply(self, tick, base_tick, changed_list, removed_list):
+        if base_tick == 0:
+            view = {}
+        else:
+            base_view = self.view_dict.get(base_tick)
+            if base_view is None:
+                return None
+            view = dict(base_view)
+
+        for entity_id in removed_list:
+            view.pop(entity_id, None)
+        for entity_id, pos_x, pos_y, state in changed_list:
+            view[entity_id] = (pos_x, pos_y, state)
+
+        self.add(tick, view)
+        return view
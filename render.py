@@ -0,0 +1,198 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pygame
+
+from camera import TiledBackground
+from world import SCREEN_WIDTH, SCREEN_HEIGHT, RenderLayer
+
+# 바뀐 영역이 이보다 많으면 합치는 비용보다 전체를 다시 그리는 편이 싸다
+MAX_DIRTY_RECT_COUNT = 200
+
+
+# 겹치는 렉트를 하나로 합친다
+def merge_rects(rect_list):
+    merged_list = []
+
+    for rect in sorted(rect_list, key=lambda r: (r.top, r.left)):
+        for i, merged in enumerate(merged_list):
+            if merged.colliderect(rect):
+                merged_list[i] = merged.union(rect)
+                break
+        else:
+            merged_list.append(pygame.Rect(rect))
+
+    return merged_list
+
+
+# 바뀐 부분만 다시 그리는 렌더러
+# 배경은 한 번만 준비해두고, 지난 프레임과 이미지나 위치가 달라진 스프라이트의 영역만
+# 배경으로 덮은 뒤 그 영역에 걸치는 스프라이트를 레이어 순서대로 다시 그린다
+# 카메라가 움직인 프레임은 화면 전체가 바뀌므로 전부 다시 그린다
+class DirtyRenderer:
+    def __init__(self, world, background_image):
+        self.world = world
+        camera = world.camera
+        self.background = TiledBackground(background_image, camera.field_width, camera.field_height)
+        self.screen_rect = pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+        self.drawn_sprite_dict = {}
+        self.drawn_view_position = None
+        self.is_full_redraw = True
+
+    # 다음 프레임은 화면 전체를 다시 그린다 (씬 전환 등)
+    def invalidate(self):
+        self.is_full_redraw = True
+
+    # 화면을 갱신하고 display.update에 넘길 렉트 리스트를 돌려준다
+    # extra_rect_list는 월드 밖에서 위에 덧그리는 UI 영역 (매 프레임 배경부터 다시 그린다)
+    def render(self, surface, extra_rect_list=(), alpha=1.0):
+        profiler = self.world.profiler
+        if profiler is not None:
+            profiler.begin('render.collect')
+
+        sprite_dict = {}
+        image_list = []
+        rect_list = []
+
+        # 배경 레이어는 따로 들고 있으므로 그 위 레이어만 모은다
+        for key, image, pos_x, pos_y in self.world.iter_sprites(RenderLayer.middle.value, alpha):
+            rect = image.get_rect(topleft=(int(pos_x), int(pos_y)))
+            sprite_dict[key] = (image, rect)
+            image_list.append(image)
+            rect_list.append(rect)
+
+        if profiler is not None:
+            profiler.end()
+            profiler.begin('render.diff')
+
+        camera = self.world.camera
+        view_x = camera.view_x
+        view_y = camera.view_y
+        if self.drawn_view_position != (view_x, view_y):
+            self.drawn_view_position = (view_x, view_y)
+            self.is_full_redraw = True
+
+        dirty_rect_list = list(extra_rect_list)
+
+        if not self.is_full_redraw:
+            drawn_sprite_dict = self.drawn_sprite_dict
+            for key, (image, rect) in sprite_dict.items():
+                drawn = drawn_sprite_dict.pop(key, None)
+                if drawn is None:
+                    dirty_rect_list.append(rect)
+                elif drawn[0] is not image or drawn[1] != rect:
+                    dirty_rect_list.append(drawn[1])
+                    dirty_rect_list.append(rect)
+
+            # 이번 프레임에 사라진 스프라이트
+            for image, rect in drawn_sprite_dict.values():
+                dirty_rect_list.append(rect)
+
+            dirty_rect_list = [rect.clip(self.screen_rect) for rect in merge_rects(dirty_rect_list)]
+            if len(dirty_rect_list) > MAX_DIRTY_RECT_COUNT:
+                self.is_full_redraw = True
+
+        self.drawn_sprite_dict = sprite_dict
+
+        if profiler is not None:
+            profiler.end()
+            profiler.begin('render.blit')
+
+        if self.is_full_redraw:
+            self.is_full_redraw = False
+            self.background.blit(surface, view_x, view_y, self.screen_rect)
+            surface.blits(list(zip(image_list, rect_list)), False)
+            if profiler is not None:
+                profiler.end()
+            return [self.screen_rect]
+
+        for dirty_rect in dirty_rect_list:
+            if dirty_rect.width == 0 or dirty_rect.height == 0:
+                continue
+            surface.set_clip(dirty_rect)
+            self.background.blit(surface, view_x, view_y, dirty_rect)
+            surface.blits([(image_list[i], rect_list[i]) for i in dirty_rect.collidelistall(rect_list)], False)
+        surface.set_clip(None)
+
+        if profiler is not None:
+            profiler.end()
+        return dirty_rect_list
+
+
+# 화면을 가로 띠(서브서피스)로 나눠서 띠마다 스레드 풀에서 그리는 렌더러
+# 스프라이트는 걸치는 띠마다 넣고, 띠 안에서는 렌더 레이어 순서를 그대로 지킨다
+# blit이 C 코드에서 GIL을 놓는 pygame 빌드라면 띠들이 여러 코어에서 동시에 그려진다
+# GIL을 쥔 채로 blit하는 빌드에서는 띠가 차례로 그려지므로 기본 렌더러는 DirtyRenderer로 둔다
+# 매 프레임 화면 전체를 그리므로 DirtyRenderer처럼 바뀐 영역만 고르지는 않는다
+class BandedRenderer:
+    def __init__(self, world, background_image, thread_count=None, band_count=None):
+        self.world = world
+        camera = world.camera
+        self.background = TiledBackground(background_image, camera.field_width, camera.field_height)
+        self.screen_rect = pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+        self.thread_count = thread_count if thread_count is not None else os.cpu_count() or 1
+        # 띠마다 스프라이트 수가 다르므로 스레드보다 조금 더 잘게 나눈다
+        self.band_count = band_count if band_count is not None else self.thread_count * 2
+        self.band_height = -(-SCREEN_HEIGHT // self.band_count)
+        self.executor = ThreadPoolExecutor(max_workers=self.thread_count, thread_name_prefix='render')
+        self.surface = None
+        self.band_surface_list = []
+
+    # DirtyRenderer와 같은 인터페이스, 매 프레임 전부 그리므로 할 일이 없다
+    def invalidate(self):
+        pass
+
+    def close(self):
+        self.executor.shutdown()
+
+    # 그릴 화면이 바뀌면 띠 서브서피스를 다시 만든다
+    def prepare_bands(self, surface):
+        if self.surface is surface:
+            return
+        self.surface = surface
+        self.band_surface_list = []
+        for top in range(0, SCREEN_HEIGHT, self.band_height):
+            rect = pygame.Rect(0, top, SCREEN_WIDTH, min(self.band_height, SCREEN_HEIGHT - top))
+            self.band_surface_list.append(surface.subsurface(rect))
+
+    def draw_band(self, band_surface, blit_list):
+        band_surface.blits(blit_list, False)
+
+    # 화면 전체를 그리고 display.update에 넘길 렉트 리스트를 돌려준다
+    def render(self, surface, extra_rect_list=(), alpha=1.0):
+        profiler = self.world.profiler
+        if profiler is not None:
+            profiler.begin('render.collect')
+
+        self.prepare_bands(surface)
+        band_height = self.band_height
+        last_band = len(self.band_surface_list) - 1
+        sprite_blit_list = [[] for i in range(last_band + 1)]
+
+        # 띠 경계에서 어긋나지 않도록 blit처럼 정수로 자른 좌표에서 띠 위치를 뺀다
+        for key, image, pos_x, pos_y in self.world.iter_sprites(RenderLayer.middle.value, alpha):
+            pos_x = int(pos_x)
+            pos_y = int(pos_y)
+            first_band = max(pos_y // band_height, 0)
+            end_band = min((pos_y + image.get_height() - 1) // band_height, last_band)
+            for band_index in range(first_band, end_band + 1):
+                sprite_blit_list[band_index].append((image, (pos_x, pos_y - band_index * band_height)))
+
+        # 띠마다 배경 타일부터 깔고 그 위에 스프라이트를 쌓는다, 카메라는 iter_sprites에서 이번 프레임 위치로 옮겨진다
+        camera = self.world.camera
+        band_blit_list = [self.background.get_blit_list(camera.view_x, camera.view_y + band_index * band_height,
+                                                        band_surface.get_rect()) + sprite_blit_list[band_index]
+                          for band_index, band_surface in enumerate(self.band_surface_list)]
+
+        if profiler is not None:
+            profiler.end()
+            profiler.begin('render.blit')
+
+        future_list = [self.executor.submit(self.draw_band, band_surface, blit_list)
+                       for band_surface, blit_list in zip(self.band_surface_list, band_blit_list)]
+        for future in future_list:
+            future.result()
+
+        if profiler is not None:
+            profiler.end()
+        return [self.screen_rect]
@@ -0,0 +1,220 @@
+import argparse
+import struct
+import sys
+import time
+import zlib
+
+from world import SCREEN_WIDTH, SCREEN_HEIGHT, GameConfig, OnKeyDown, World, create_key_state
+
+# 리플레이 파일 형식
+# 헤더(압축 안 함): 매직, 버전, 시드, 참가자 수, 남자 수, 군중 방식, 픽셀 충돌 여부, 필드 너비, 필드 높이
+# 본문(zlib 스트림): 스텝마다 b'S' + (dt, 키 비트마스크), 끝에 b'E' + 최종 상태 해시
+REPLAY_MAGIC = b'SQRP'
+REPLAY_VERSION = 3
+
+HEADER_STRUCT = struct.Struct('<4sHQIIBBII')
+
+# 버전 1은 픽셀 충돌이 생기기 전이라 충돌 방식 없이 충돌 박스로 판정한다
+# 버전 2까지는 필드가 화면 크기로 고정이었다
+HEADER_STRUCT_V1 = struct.Struct('<4sHQIIB')
+HEADER_STRUCT_V2 = struct.Struct('<4sHQIIBB')
+STEP_STRUCT = struct.Struct('<dB')
+HASH_SIZE = 32
+
+RECORD_STEP = b'S'
+RECORD_END = b'E'
+
+CROWD_BACKEND_LIST = ['object', 'numpy']
+
+
+def pack_key_state(key_state):
+    mask = 0
+    for i in range(OnKeyDown.max_length.value):
+        if key_state[i]:
+            mask |= 1 << i
+    return mask
+
+
+def unpack_key_state(mask):
+    key_state = create_key_state()
+    for i in range(OnKeyDown.max_length.value):
+        key_state[i] = mask & (1 << i) != 0
+    return key_state
+
+
+# 한 판의 시드, 스텝별 dt와 키 입력을 파일에 기록한다
+class ReplayRecorder:
+    def __init__(self, path, world, seed):
+        self.file = open(path, 'wb')
+        self.file.write(HEADER_STRUCT.pack(REPLAY_MAGIC, REPLAY_VERSION, seed, world.player_count,
+                                           world.man_count, CROWD_BACKEND_LIST.index(world.crowd_backend),
+                                           world.config.pixel_collision, world.field_width, world.field_height))
+        self.compressor = zlib.compressobj(9)
+        self.step_count = 0
+
+    def write(self, data):
+        self.file.write(self.compressor.compress(data))
+
+    def record(self, delta_time, key_state):
+        self.write(RECORD_STEP + STEP_STRUCT.pack(delta_time, pack_key_state(key_state)))
+        self.step_count += 1
+
+    # 판이 끝나면 최종 상태 해시를 남기고 닫는다
+    def close(self, world):
+        if self.file is None:
+            return
+        self.write(RECORD_END + world.get_state_hash())
+        self.file.write(self.compressor.flush())
+        self.file.close()
+        self.file = None
+
+
+class Replay:
+    def __init__(self, seed, player_count, man_count, crowd_backend, step_list, final_hash, pixel_collision=True,
+                 field_width=SCREEN_WIDTH, field_height=SCREEN_HEIGHT):
+        self.seed = seed
+        self.player_count = player_count
+        self.man_count = man_count
+        self.crowd_backend = crowd_backend
+        self.step_list = step_list
+        self.final_hash = final_hash
+        self.pixel_collision = pixel_collision
+        self.field_width = field_width
+        self.field_height = field_height
+
+    def create_world(self, image_lists, sound_player=None):
+        world = World(image_lists, sound_player, player_count=self.player_count, crowd_backend=self.crowd_backend,
+                      man_count=self.man_count,
+                      config=GameConfig(pixel_collision=self.pixel_collision, field_width=self.field_width,
+                                        field_height=self.field_height))
+        world.reset(self.seed)
+        return world
+
+
+# 헤더나 기록이 중간에 잘린 파일은 ValueError로 알린다
+def load_replay(path):
+    with open(path, 'rb') as file:
+        data = file.read()
+
+    if len(data) < HEADER_STRUCT_V1.size:
+        raise ValueError('not a replay file / truncated: ' + path)
+    magic, version = struct.unpack_from('<4sH', data)
+    if magic != REPLAY_MAGIC or version not in (1, 2, REPLAY_VERSION):
+        raise ValueError('not a replay file: ' + path)
+
+    header_struct = {1: HEADER_STRUCT_V1, 2: HEADER_STRUCT_V2}.get(version, HEADER_STRUCT)
+    if len(data) < header_struct.size:
+        raise ValueError('not a replay file / truncated: ' + path)
+
+    field_width = SCREEN_WIDTH
+    field_height = SCREEN_HEIGHT
+    if version == 1:
+        magic, version, seed, player_count, man_count, crowd_backend = header_struct.unpack_from(data)
+        pixel_collision = False
+    elif version == 2:
+        magic, version, seed, player_count, man_count, crowd_backend, pixel_collision = \
+            header_struct.unpack_from(data)
+    else:
+        (magic, version, seed, player_count, man_count, crowd_backend, pixel_collision,
+         field_width, field_height) = header_struct.unpack_from(data)
+
+    try:
+        data = zlib.decompress(data[header_struct.size:])
+    except zlib.error:
+        raise ValueError('truncated replay: ' + path) from None
+
+    step_list = []
+    final_hash = None
+    offset = 0
+    while offset < len(data):
+        record_type = data[offset:offset + 1]
+        offset += 1
+        if record_type == RECORD_STEP:
+            if offset + STEP_STRUCT.size > len(data):
+                raise ValueError('truncated replay step at %d' % offset)
+            delta_time, mask = STEP_STRUCT.unpack_from(data, offset)
+            offset += STEP_STRUCT.size
+            step_list.append((delta_time, unpack_key_state(mask)))
+        elif record_type == RECORD_END:
+            final_hash = data[offset:offset + HASH_SIZE]
+            if len(final_hash) != HASH_SIZE:
+                raise ValueError('truncated replay hash at %d' % offset)
+            break
+        else:
+            raise ValueError('broken replay record at %d' % offset)
+
+    return Replay(seed, player_count, man_count, CROWD_BACKEND_LIST[crowd_backend], step_list, final_hash,
+                  bool(pixel_collision), field_width, field_height)
+
+
+# 실제 시간에 맞춰 리플레이를 재생할 때 이번 프레임에 진행할 스텝을 꺼내준다
+class ReplayPlayer:
+    def __init__(self, replay):
+        self.replay = replay
+        self.step_index = 0
+        self.accumulator = 0
+
+    def is_finished(self):
+        return self.step_index >= len(self.replay.step_list)
+
+    def advance(self, frame_time):
+        self.accumulator += frame_time
+        step_list = []
+        while not self.is_finished():
+            delta_time, key_state = self.replay.step_list[self.step_index]
+            if delta_time > self.accumulator:
+                break
+            self.accumulator -= delta_time
+            step_list.append((delta_time, key_state))
+            self.step_index += 1
+        return step_list
+
+
+# 화면 없이 최대 속도로 리플레이를 돌리고 스텝별 소요 시간을 잰다
+def run_replay(replay, world):
+    step_time_list = []
+    perf_counter = time.perf_counter
+
+    for delta_time, key_state in replay.step_list:
+        start_time = perf_counter()
+        world.step(delta_time, key_state)
+        step_time_list.append(perf_counter() - start_time)
+
+    return step_time_list
+
+
+def main():
+    parser = argparse.ArgumentParser(description='리플레이를 화면 없이 빠르게 재생하고 결과를 검증한다')
+    parser.add_argument('path')
+    parser.add_argument('--top', type=int, default=10, help='가장 오래 걸린 스텝을 몇 개 보여줄지')
+    args = parser.parse_args()
+
+    from assets import load_image_lists
+
+    replay = load_replay(args.path)
+    world = replay.create_world(load_image_lists())
+
+    start_time = time.perf_counter()
+    step_time_list = run_replay(replay, world)
+    elapsed_time = time.perf_counter() - start_time
+
+    game_time = sum(delta_time for delta_time, key_state in replay.step_list)
+    print('%d steps, %.2f s of game time replayed in %.3f s' % (len(step_time_list), game_time, elapsed_time))
+
+    slowest = sorted(range(len(step_time_list)), key=lambda i: -step_time_list[i])[:args.top]
+    for i in slowest:
+        print('  step %6d  t=%7.3f  %.3f ms' % (i, sum(dt for dt, key in replay.step_list[:i]),
+                                                step_time_list[i] * 1000))
+
+    final_hash = world.get_state_hash()
+    if replay.final_hash is None:
+        print('no final hash recorded: ' + final_hash.hex())
+    elif final_hash == replay.final_hash:
+        print('final state hash OK: ' + final_hash.hex())
+    else:
+        print('final state hash MISMATCH: %s != %s' % (final_hash.hex(), replay.final_hash.hex()))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
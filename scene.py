@@ -0,0 +1,79 @@
+from concurrent.futures import ThreadPoolExecutor
+
+
+# 씬 기본 클래스
+# render는 display.update에 넘길 렉트 리스트를 돌려준다 (None이면 화면 전체, 빈 리스트면 갱신 없음)
+class GameScene:
+    def __init__(self):
+        self.is_idle = False
+
+    # 다음 씬으로 넘어가기 전에 백그라운드 스레드에서 미리 해둘 일
+    def preload(self):
+        pass
+
+    def on_enter(self):
+        pass
+
+    def on_exit(self):
+        pass
+
+    def handle_event(self, event):
+        pass
+
+    def update(self, delta_time):
+        pass
+
+    def render(self, surface):
+        return None
+
+
+# 현재 씬을 들고 있고, 씬 전환을 프레임 사이에서 한 번만 처리한다
+class SceneManager:
+    def __init__(self):
+        self.scene_dict = {}
+        self.scene_index = None
+        self.current_scene = None
+        self.next_scene_index = None
+        self.preload_future_dict = {}
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='scene-preload')
+
+    def add(self, scene_index, scene):
+        self.scene_dict[scene_index] = scene
+
+    # 전환은 apply_change가 불릴 때 처리된다
+    def change(self, scene_index):
+        self.next_scene_index = scene_index
+
+    # 다음 씬의 준비 작업을 백그라운드에서 시작한다
+    def preload(self, scene_index):
+        if scene_index not in self.preload_future_dict:
+            self.preload_future_dict[scene_index] = self.executor.submit(self.scene_dict[scene_index].preload)
+
+    def apply_change(self):
+        if self.next_scene_index is None:
+            return False
+
+        scene_index = self.next_scene_index
+        self.next_scene_index = None
+
+        if self.current_scene is not None:
+            self.current_scene.on_exit()
+
+        # 미리 시작한 준비 작업이 있으면 끝날 때까지 기다리고, 없으면 여기서 한다
+        future = self.preload_future_dict.pop(scene_index, None)
+        if future is not None:
+            future.result()
+        else:
+            self.scene_dict[scene_index].preload()
+
+        self.scene_index = scene_index
+        self.current_scene = self.scene_dict[scene_index]
+        self.current_scene.on_enter()
+        return True
+
+    # 게임 도중에 끝내도 지금 씬의 정리 작업을 한다
+    def shutdown(self):
+        if self.current_scene is not None:
+            self.current_scene.on_exit()
+            self.current_scene = None
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,99 @@
+import heapq
+from operator import attrgetter
+
+
+# 매 스텝 update를 불러야 하는 오브젝트만 골라서 들고 있는다
+# 할 일이 없는 오브젝트는 스스로 잠들고, 타이머나 이벤트가 깨운다
+# 잠드는 요청은 다음 스텝에서 이전 위치를 저장한 뒤에 반영되어 보간이 끊기지 않는다
+# 깨어난 오브젝트는 원래 업데이트 순서 자리로 돌아가므로 지금 돌고 있는 스텝에서도 차례가 오면 불린다
+# 순서, 깨어있는지, 몇 번 깨어났는지는 오브젝트의 update_order, is_awake, wake_generation에 둔다
+class UpdateScheduler:
+    def __init__(self):
+        self.active_list = []
+        self.sleep_request_set = set()
+        self.listener_dict = {}
+        self.timer_heap = []
+        self.timer_count = 0
+        self.position = -1
+
+    # 업데이트 순서대로 된 오브젝트 리스트로 처음부터 다시 시작한다, 모두 깨어있는 상태가 된다
+    def reset(self, object_list):
+        for i, game_object in enumerate(object_list):
+            game_object.update_order = i
+            game_object.is_awake = True
+        self.active_list = list(object_list)
+        self.sleep_request_set.clear()
+        self.listener_dict.clear()
+        self.timer_heap = []
+        self.position = -1
+
+    # 다음 스텝부터 부르지 않는다
+    def sleep(self, game_object):
+        self.sleep_request_set.add(game_object)
+
+    # 게임 시간이 wake_time이 되면 깨운다
+    def sleep_until(self, game_object, wake_time):
+        self.sleep(game_object)
+        self.timer_count += 1
+        heapq.heappush(self.timer_heap, (wake_time, self.timer_count, game_object, game_object.wake_generation))
+
+    # event가 발생하면 깨운다
+    def sleep_until_event(self, game_object, event):
+        self.sleep(game_object)
+        self.listener_dict.setdefault(event, []).append(game_object)
+
+    def emit(self, event):
+        listener_list = self.listener_dict.pop(event, None)
+        if listener_list:
+            self.wake_all(listener_list)
+
+    def wake(self, game_object):
+        self.wake_all([game_object])
+
+    # 걸려있던 타이머와 이벤트는 무효가 된다
+    def wake_all(self, object_list):
+        woken_list = []
+        for game_object in object_list:
+            self.sleep_request_set.discard(game_object)
+            if game_object.is_awake:
+                continue
+            game_object.is_awake = True
+            game_object.wake_generation += 1
+            woken_list.append(game_object)
+
+        if not woken_list:
+            return
+
+        # 지금 도는 중이라면 이미 지나간 자리에 들어간 만큼 위치를 밀어준다
+        if 0 <= self.position < len(self.active_list):
+            current_order = self.active_list[self.position].update_order
+            self.position += sum(1 for game_object in woken_list if game_object.update_order < current_order)
+        self.active_list += woken_list
+        self.active_list.sort(key=attrgetter('update_order'))
+
+    # 스텝마다 오브젝트를 갱신하기 전에 부른다, 잠드는 요청을 반영하고 시간이 된 타이머를 깨운다
+    def begin_step(self, now):
+        if self.sleep_request_set:
+            sleep_request_set = self.sleep_request_set
+            self.active_list = [game_object for game_object in self.active_list
+                                if game_object not in sleep_request_set]
+            for game_object in sleep_request_set:
+                game_object.is_awake = False
+            self.sleep_request_set = set()
+
+        timer_heap = self.timer_heap
+        woken_list = []
+        while timer_heap and timer_heap[0][0] <= now:
+            wake_time, count, game_object, generation = heapq.heappop(timer_heap)
+            if generation == game_object.wake_generation:
+                woken_list.append(game_object)
+        if woken_list:
+            self.wake_all(woken_list)
+
+    # 깨어있는 오브젝트를 업데이트 순서대로 돌려준다, 도는 중에 깨어난 오브젝트도 차례가 오면 나온다
+    def iter_active(self):
+        self.position = 0
+        while self.position < len(self.active_list):
+            yield self.active_list[self.position]
+            self.position += 1
+        self.position = -1
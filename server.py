@@ -0,0 +1,385 @@
+import argparse
+import asyncio
+import random
+import struct
+import time
+from collections import deque
+
+from protocol import (
+    DEFAULT_PORT, HUMAN_ENTITY_ID_BASE,
+    MESSAGE_HELLO, MESSAGE_WELCOME, MESSAGE_INPUT, MESSAGE_ROUND_START, MESSAGE_ROUND_END,
+    INPUT_STRUCT, WELCOME_STRUCT, ROUND_START_STRUCT, ROUND_END_STRUCT,
+    ProtocolError, SnapshotHistory, decode_hello, diff_views, encode_message, encode_snapshot, encode_snapshot_body,
+    read_message,
+)
+from replay import unpack_key_state
+from world import MAX_PLAYER_COUNT, CollideLayer, PlayerState, World, create_key_state
+
+TICK_RATE = 60
+SNAPSHOT_RATE = 30
+
+# 관심 영역: 화면을 가로 띠로 나누고, 내 위치 위아래 INTEREST_RANGE 안에 걸치는 띠의 참가자만 보낸다
+INTEREST_BAND_HEIGHT = 64
+INTEREST_RANGE = 320
+
+# 보내지 못하고 쌓인 데이터가 이보다 많은 클라이언트는 이번 스냅샷을 건너뛴다
+MAX_WRITE_BUFFER_SIZE = 256 * 1024
+
+# 틱이 이만큼(초) 넘게 밀리면 따라잡지 않고 현재 시간부터 다시 센다
+MAX_TICK_LAG = 0.25
+
+# 판이 끝나고 다음 판까지 참가자를 기다리는 시간(초)
+LOBBY_TIME = 3
+
+FINISHED_STATE_LIST = (PlayerState.dead.value, PlayerState.success.value)
+
+
+class ClientConnection:
+    def __init__(self, client_id, name, writer):
+        self.client_id = client_id
+        self.name = name
+        self.writer = writer
+        self.key_state = create_key_state()
+        self.input_seq = 0
+        self.ack_tick = 0
+        self.history = SnapshotHistory()
+        self.player = None
+        self.entity_id = 0
+        self.sent_byte_count = 0
+        self.snapshot_count = 0
+        self.full_snapshot_count = 0
+        self.skipped_snapshot_count = 0
+
+    def send(self, data):
+        self.writer.write(data)
+        self.sent_byte_count += len(data)
+
+
+# 필드 높이를 덮는 관심 영역 띠 개수
+def calc_interest_band_count(world):
+    return world.field_height // INTEREST_BAND_HEIGHT + 1
+
+
+# 참가자 상태를 양자화해서 관심 영역 띠별로 나눈다
+def collect_entity_bands(world, client_list):
+    band_list = [{} for i in range(calc_interest_band_count(world))]
+    last_band = len(band_list) - 1
+
+    if world.crowd is not None:
+        crowd = world.crowd
+        entity_iter = zip(range(crowd.count), crowd.pos_x.round().astype('int64').tolist(),
+                          crowd.pos_y.round().astype('int64').tolist(), crowd.state.tolist())
+    else:
+        other_player_list = world.collision_list[CollideLayer.group_b.value]
+        entity_iter = ((entity_id, round(other_player.pos_x), round(other_player.pos_y), other_player.state)
+                       for entity_id, other_player in enumerate(other_player_list))
+
+    for entity_id, pos_x, pos_y, state in entity_iter:
+        band_list[min(max(pos_y // INTEREST_BAND_HEIGHT, 0), last_band)][entity_id] = (pos_x, pos_y, state)
+
+    for client in client_list:
+        player = client.player
+        if player is None:
+            continue
+        pos_y = round(player.pos_y)
+        band_list[min(max(pos_y // INTEREST_BAND_HEIGHT, 0), last_band)][client.entity_id] = \
+            (round(player.pos_x), pos_y, player.state)
+
+    return band_list
+
+
+# 게임 진행을 서버가 전부 맡는다, 클라이언트는 입력만 보내고 스냅샷을 받는다
+class GameServer:
+    def __init__(self, image_lists, bot_count=MAX_PLAYER_COUNT, crowd_backend='object', tick_rate=TICK_RATE,
+                 snapshot_rate=SNAPSHOT_RATE, seed=None, config=None):
+        self.image_lists = image_lists
+        self.bot_count = bot_count
+        self.crowd_backend = crowd_backend
+        self.tick_rate = tick_rate
+        self.snapshot_rate = snapshot_rate
+        self.snapshot_interval = max(tick_rate // snapshot_rate, 1)
+        self.config = config
+        self.random = random.Random(seed)
+        self.server = None
+        self.port = None
+        self.client_dict = {}
+        self.next_client_id = 1
+        self.client_event = asyncio.Event()
+        self.handler_task_set = set()
+
+        # 관전 스트림, 있으면 판 진행 중에 같이 내보낸다
+        self.broadcaster = None
+
+        self.world = None
+        self.round_index = 0
+        self.round_client_list = []
+        self.tick = 0
+        self.late_tick_count = 0
+        self.tick_time_list = deque(maxlen=TICK_RATE * 60)
+
+    async def start(self, host='127.0.0.1', port=DEFAULT_PORT):
+        self.server = await asyncio.start_server(self.handle_client, host, port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        for client in list(self.client_dict.values()):
+            client.writer.close()
+        # 접속 처리 태스크가 연결 종료를 받고 끝날 때까지 기다린다
+        if self.handler_task_set:
+            await asyncio.wait(self.handler_task_set)
+
+    async def handle_client(self, reader, writer):
+        task = asyncio.current_task()
+        self.handler_task_set.add(task)
+        task.add_done_callback(self.handler_task_set.discard)
+
+        try:
+            message_type, payload = await read_message(reader)
+            if message_type != MESSAGE_HELLO:
+                raise ProtocolError('expected hello')
+            name = decode_hello(payload)
+        except (asyncio.IncompleteReadError, ConnectionError, ProtocolError, struct.error):
+            writer.close()
+            return
+
+        client = ClientConnection(self.next_client_id, name, writer)
+        self.next_client_id += 1
+        self.client_dict[client.client_id] = client
+        self.client_event.set()
+        client.send(encode_message(MESSAGE_WELCOME, WELCOME_STRUCT.pack(client.client_id, self.tick_rate,
+                                                                          self.snapshot_rate)))
+
+        try:
+            while True:
+                message_type, payload = await read_message(reader)
+                if message_type == MESSAGE_INPUT:
+                    input_seq, ack_tick, key_mask = INPUT_STRUCT.unpack(payload)
+                    # 늦게 도착한 예전 입력은 버린다
+                    if input_seq > client.input_seq:
+                        client.input_seq = input_seq
+                        client.key_state = unpack_key_state(key_mask)
+                    if ack_tick > client.ack_tick:
+                        client.ack_tick = ack_tick
+        except (asyncio.IncompleteReadError, ConnectionError, ProtocolError, struct.error):
+            pass
+        finally:
+            del self.client_dict[client.client_id]
+            # 판 도중에 나가면 탈락시킨다
+            if client.player is not None and client.player.state not in FINISHED_STATE_LIST:
+                client.player.state = PlayerState.dead.value
+            client.player = None
+            writer.close()
+
+    def start_round(self):
+        self.round_index += 1
+        seed = self.random.getrandbits(63)
+        world = World(self.image_lists, seed=seed, player_count=self.bot_count, crowd_backend=self.crowd_backend,
+                      config=self.config)
+        world.run_until_time_over = True
+
+        client_list = list(self.client_dict.values())
+        for i, client in enumerate(client_list):
+            client.player = world.player if i == 0 else world.add_human_player()
+            client.entity_id = HUMAN_ENTITY_ID_BASE + i
+            client.key_state = create_key_state()
+            client.ack_tick = 0
+            client.history.clear()
+        world.reset(seed)
+
+        self.world = world
+        self.round_client_list = client_list
+        if self.broadcaster is not None:
+            self.broadcaster.encoder.force_keyframe = True
+
+        config = world.config
+        safe_zone = world.line_safe_zone
+        for client in client_list:
+            client.send(encode_message(MESSAGE_ROUND_START, ROUND_START_STRUCT.pack(
+                self.round_index, client.entity_id, config.ready_time, config.watch_time, config.remain_time,
+                round(safe_zone.pos_x), round(safe_zone.pos_x + safe_zone.width), world.rod.width)))
+
+    def is_round_over(self):
+        if self.world.is_over:
+            return True
+        return all(player.state in FINISHED_STATE_LIST for player in self.world.human_player_list)
+
+    # 관심 영역이 같은 클라이언트는 같은 상태를 받고, 기준 상태까지 같으면 델타 본문도 같이 쓴다
+    def send_snapshots(self):
+        world = self.world
+        enemy = world.enemy
+        band_list = collect_entity_bands(world, self.round_client_list)
+        last_band = len(band_list) - 1
+        view_cache = {}
+        body_cache = {}
+        empty_view = {}
+
+        for client in self.round_client_list:
+            player = client.player
+            if player is None:
+                continue
+
+            # 느린 클라이언트는 건너뛰고, 다음에 마지막으로 받은 스냅샷 기준 델타를 보낸다
+            if client.writer.transport.get_write_buffer_size() > MAX_WRITE_BUFFER_SIZE:
+                client.skipped_snapshot_count += 1
+                continue
+
+            # 끝난 참가자는 관전하도록 전체를 보낸다
+            if player.state in FINISHED_STATE_LIST:
+                band_range = (0, last_band)
+            else:
+                pos_y = round(player.pos_y)
+                band_range = (max((pos_y - INTEREST_RANGE) // INTEREST_BAND_HEIGHT, 0),
+                              min((pos_y + INTEREST_RANGE) // INTEREST_BAND_HEIGHT, last_band))
+
+            view = view_cache.get(band_range)
+            if view is None:
+                view = {}
+                for band in band_list[band_range[0]:band_range[1] + 1]:
+                    view.update(band)
+                view_cache[band_range] = view
+
+            base_tick = client.ack_tick
+            base_view = client.history.get(base_tick) if base_tick != 0 else None
+            if base_view is None:
+                base_tick = 0
+                base_view = empty_view
+                client.full_snapshot_count += 1
+
+            body_key = (id(base_view), band_range)
+            body = body_cache.get(body_key)
+            if body is None:
+                body = encode_snapshot_body(*diff_views(base_view, view))
+                body_cache[body_key] = body
+
+            rod = player.rod
+            header = (self.tick, base_tick, world.game_timer, enemy.state, enemy.beat_rate, enemy.state_time,
+                      player.state, round(player.pos_x), round(player.pos_y), round(rod.pos_x), rod.save)
+            client.send(encode_snapshot(header, body))
+            client.history.add(self.tick, view)
+            client.snapshot_count += 1
+
+    def end_round(self):
+        world = self.world
+        success_count, dead_count, total_count = world.count_crowd_result()
+        for player in world.human_player_list:
+            if player.state == PlayerState.success.value:
+                success_count += 1
+            elif player.state == PlayerState.dead.value:
+                dead_count += 1
+        total_count += len(world.human_player_list)
+
+        for client in self.round_client_list:
+            if client.player is None:
+                continue
+            client.send(encode_message(MESSAGE_ROUND_END, ROUND_END_STRUCT.pack(
+                self.round_index, client.player.state, world.game_timer, success_count, dead_count, total_count)))
+            client.player = None
+
+        self.round_client_list = []
+        return success_count, dead_count, total_count
+
+    async def run_round(self):
+        self.start_round()
+        world = self.world
+        loop = asyncio.get_running_loop()
+        delta_time = 1 / self.tick_rate
+        next_time = loop.time()
+        perf_counter = time.perf_counter
+
+        while not self.is_round_over():
+            start_time = perf_counter()
+            for client in self.round_client_list:
+                if client.player is not None:
+                    client.player.key_state = client.key_state
+
+            world.step(delta_time)
+            self.tick += 1
+            if self.tick % self.snapshot_interval == 0:
+                self.send_snapshots()
+            if self.broadcaster is not None:
+                self.broadcaster.update(world, delta_time)
+            self.tick_time_list.append(perf_counter() - start_time)
+
+            next_time += delta_time
+            delay = next_time - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                self.late_tick_count += 1
+                if delay < -MAX_TICK_LAG:
+                    next_time = loop.time()
+                await asyncio.sleep(0)
+
+        self.send_snapshots()
+        return self.end_round()
+
+    async def wait_for_players(self, min_player_count, lobby_time):
+        while len(self.client_dict) < min_player_count:
+            self.client_event.clear()
+            await self.client_event.wait()
+        await asyncio.sleep(lobby_time)
+
+    # round_count가 0이면 계속 판을 연다
+    async def serve_rounds(self, round_count=0, min_player_count=1, lobby_time=LOBBY_TIME, verbose=True):
+        while round_count == 0 or self.round_index < round_count:
+            await self.wait_for_players(min_player_count, lobby_time)
+            tick_start = self.tick
+            late_tick_start = self.late_tick_count
+            success_count, dead_count, total_count = await self.run_round()
+
+            if verbose:
+                tick_time_list = sorted(self.tick_time_list)
+                print('round %d: %d clients, success %d, dead %d, total %d, ticks %d (late %d), '
+                      'tick p50 %.2f ms p99 %.2f ms'
+                      % (self.round_index, len(self.client_dict), success_count, dead_count, total_count,
+                         self.tick - tick_start, self.late_tick_count - late_tick_start,
+                         tick_time_list[len(tick_time_list) // 2] * 1000,
+                         tick_time_list[int(len(tick_time_list) * 0.99)] * 1000))
+
+
+async def run_server(args):
+    from assets import load_image_lists
+
+    server = GameServer(load_image_lists(), args.bots, args.crowd, args.tick_rate, args.snapshot_rate, args.seed)
+    port = await server.start(args.host, args.port)
+    print('listening on %s:%d' % (args.host, port))
+    if args.broadcast is not None:
+        from snapshot import SnapshotBroadcaster
+
+        server.broadcaster = SnapshotBroadcaster(args.host, args.broadcast)
+        print('broadcasting on %s:%d' % (args.host, server.broadcaster.port))
+    try:
+        await server.serve_rounds(args.rounds, args.min_players, args.lobby_time)
+    finally:
+        await server.close()
+        if server.broadcaster is not None:
+            server.broadcaster.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='멀티플레이 게임 서버')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--bots', type=int, default=MAX_PLAYER_COUNT, help='판마다 같이 뛰는 봇 참가자 수')
+    parser.add_argument('--crowd', choices=['object', 'numpy'], default='object')
+    parser.add_argument('--tick-rate', type=int, default=TICK_RATE)
+    parser.add_argument('--snapshot-rate', type=int, default=SNAPSHOT_RATE)
+    parser.add_argument('--min-players', type=int, default=1, help='판을 시작할 최소 접속자 수')
+    parser.add_argument('--lobby-time', type=float, default=LOBBY_TIME)
+    parser.add_argument('--rounds', type=int, default=0, help='0이면 계속')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--broadcast', metavar='PORT', type=int, help='이 포트로 관전용 상태 스트림을 내보낸다')
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run_server(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+import argparse
+import hashlib
+import time
+
+from assets import load_image_lists
+from world import (
+    MAX_PLAYER_COUNT, OnKeyDown, EnemyState, PlayerState, CollideLayer, GameConfig, World,
+    check_collide_rect, create_key_state,
+)
+
+FRAME_TIME = 1 / 60
+
+
+# 아무 키도 누르지 않는 입력
+def idle_policy(world):
+    return create_key_state()
+
+
+# 준비 시간에는 위 방향키를 연타하고, 감시 시간에는 노란 구간에서 스페이스를 누르는 입력
+def runner_policy(world):
+    key_state = create_key_state()
+
+    # 감시 시간이 시작될 때 이동 상태로 남아있지 않도록 조금 일찍 손을 뗀다
+    if world.enemy.state == EnemyState.ready.value and world.enemy.state_time < world.config.ready_time - 0.1:
+        key_state[OnKeyDown.up.value] = not world.player.key_down_list[OnKeyDown.up.value]
+    elif check_collide_rect(world.rod, world.line_safe_zone):
+        key_state[OnKeyDown.space.value] = True
+
+    return key_state
+
+
+# 한 판을 끝까지 진행시키고 진행한 스텝 수를 반환
+def run_round(world, policy=idle_policy, delta_time=FRAME_TIME):
+    world.reset()
+    step_count = 0
+
+    while not world.is_over:
+        world.step(delta_time, policy(world))
+        step_count += 1
+
+    return step_count
+
+
+# 시체가 들어간 정적 인덱스 렉트와 플레이어 속도를 해시한다, 시체는 참가자 번호로 구분한다
+def calc_collision_hash(world, index_dict=None):
+    entry_set = set()
+    for entry_list in world.spatial_grid_list[CollideLayer.group_b.value].static_cells.values():
+        for item, rect in entry_list:
+            entry_set.add((index_dict[item] if index_dict is not None else item, tuple(rect)))
+
+    sha = hashlib.sha256()
+    sha.update(repr((world.player.speed, sorted(entry_set))).encode())
+    return sha.digest()
+
+
+# 두 군중 백엔드가 같은 자리의 시체를 같은 렉트로 인덱스하고 플레이어를 똑같이 느리게 하는지 확인한다
+# 백엔드마다 난수를 다르게 뽑으므로 오브젝트 군중으로 진행시키고, 스텝마다 그 상태를 배열 군중에 옮겨서 충돌만 다시 계산한다
+# 처음 어긋난 스텝 번호를 돌려주고, 끝까지 같으면 None
+def check_crowd_backends(image_lists, seed, pixel_collision, player_count=MAX_PLAYER_COUNT, policy=None):
+    import numpy
+
+    if policy is None:
+        policy = runner_policy
+    config = GameConfig(pixel_collision=pixel_collision)
+    world = World(image_lists, seed=seed, player_count=player_count, config=config)
+    array_world = World(image_lists, seed=seed, player_count=player_count, crowd_backend='numpy',
+                        man_count=world.man_count, config=config)
+    world.run_until_time_over = True
+    crowd = array_world.crowd
+    array_player = array_world.player
+    other_player_list = world.collision_list[CollideLayer.group_b.value]
+    index_dict = {other_player: i for i, other_player in enumerate(other_player_list)}
+
+    step_count = 0
+    while not world.is_over:
+        world.step(FRAME_TIME, policy(world))
+        step_count += 1
+
+        dead_list = []
+        for i, other_player in enumerate(other_player_list):
+            if other_player.state == PlayerState.dead.value and crowd.state[i] != PlayerState.dead.value:
+                dead_list.append(i)
+            crowd.pos_x[i] = other_player.pos_x
+            crowd.pos_y[i] = other_player.pos_y
+            crowd.state[i] = other_player.state
+        if dead_list:
+            crowd.make_corpses(numpy.array(dead_list))
+
+        array_player.pos_x = world.player.pos_x
+        array_player.pos_y = world.player.pos_y
+        array_player.state = world.player.state
+        array_world.update_collision()
+
+        if calc_collision_hash(world, index_dict) != calc_collision_hash(array_world):
+            return step_count
+
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='화면 없이 게임을 빠르게 돌려본다')
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--policy', choices=['idle', 'runner'], default='runner')
+    parser.add_argument('--players', type=int, default=MAX_PLAYER_COUNT)
+    parser.add_argument('--crowd', choices=['object', 'numpy'], default='object')
+    parser.add_argument('--check-backends', action='store_true',
+                        help='두 군중 백엔드의 시체 충돌이 스텝마다 같은지 박스, 픽셀 충돌 모두 확인한다')
+    args = parser.parse_args()
+
+    if args.check_backends:
+        image_lists = load_image_lists()
+        is_failed = False
+        for pixel_collision in (False, True):
+            for i in range(args.rounds):
+                seed = (args.seed or 0) + i
+                mismatch_step = check_crowd_backends(image_lists, seed, pixel_collision, args.players)
+                if mismatch_step is not None:
+                    is_failed = True
+                    print('pixel_collision=%s seed %d: mismatch at step %d' % (pixel_collision, seed, mismatch_step))
+            print('pixel_collision=%s: checked %d rounds' % (pixel_collision, args.rounds))
+        if is_failed:
+            raise SystemExit(1)
+        return
+
+    policy = runner_policy if args.policy == 'runner' else idle_policy
+    world = World(load_image_lists(), seed=args.seed, player_count=args.players, crowd_backend=args.crowd)
+
+    success_count = 0
+    total_steps = 0
+    start_time = time.perf_counter()
+
+    for i in range(args.rounds):
+        total_steps += run_round(world, policy)
+        if world.player.state == PlayerState.success.value:
+            success_count += 1
+
+    elapsed_time = time.perf_counter() - start_time
+    print('rounds: %d, success: %d, steps: %d, %.2f s (%.0f steps/s)'
+          % (args.rounds, success_count, total_steps, elapsed_time, total_steps / max(elapsed_time, 1e-9)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,374 @@
+import socket
+import struct
+import sys
+import zlib
+from array import array
+
+from world import PLAYER_STATE_RENDER_INDEX, CollideLayer, GameConfig, RenderLayer, World
+
+# 관전용 상태 스트림
+# 프레임 = 고정 길이 헤더 + zlib 본문
+# 본문은 참가자별 값을 종류별로 이어 붙인 고정 배열 블록이다: x(int16) * n, y(int16) * n, 상태(uint8) * n, 스프라이트(uint8) * n
+# 키프레임은 블록 자체를, 델타 프레임은 직전 블록과 XOR한 것을 압축한다 (안 바뀐 값은 0이 되어 거의 사라진다)
+SNAPSHOT_MAGIC = b'SQST'
+
+# 매직, 프레임 종류, 적 상태, 프레임 번호, 참가자 수, 사람 참가자 수, 게임 시간, 제한 시간, 박자, 막대 x, 초당 프레임 수,
+# 필드 폭, 필드 높이, 본문 길이
+FRAME_HEADER_STRUCT = struct.Struct('<4sBBIIHffBhBHHI')
+
+FRAME_KEY = 1
+FRAME_DELTA = 2
+
+# 스프라이트 종류, 사람 참가자는 블록 앞쪽에 모여 있다
+SPRITE_SET_MAN = 0
+SPRITE_SET_WOMAN = 1
+SPRITE_SET_PLAYER = 2
+SPRITE_SET_NAMES = ('man', 'woman', 'player')
+
+STREAM_RATE = 10
+KEYFRAME_INTERVAL = STREAM_RATE * 5
+COMPRESS_LEVEL = 6
+
+# 보내지 못하고 쌓인 데이터가 이보다 많은 시청자는 끊는다
+MAX_PENDING_SIZE = 1024 * 1024
+RECEIVE_SIZE = 65536
+
+
+def to_little_endian(values):
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tobytes()
+
+
+def xor_bytes(a, b):
+    return (int.from_bytes(a, 'little') ^ int.from_bytes(b, 'little')).to_bytes(len(a), 'little')
+
+
+# 월드에서 (참가자 수, 사람 참가자 수, 블록)을 뽑는다
+def collect_agent_block(world):
+    human_list = world.human_player_list
+    x_list = [to_little_endian(array('h', [round(player.pos_x) for player in human_list]))]
+    y_list = [to_little_endian(array('h', [round(player.pos_y) for player in human_list]))]
+    state_list = [bytes(player.state for player in human_list)]
+    sprite_set_list = [bytes([SPRITE_SET_PLAYER]) * len(human_list)]
+    count = len(human_list)
+
+    if world.crowd is not None:
+        crowd = world.crowd
+        x_list.append(crowd.pos_x.round().astype('<i2').tobytes())
+        y_list.append(crowd.pos_y.round().astype('<i2').tobytes())
+        state_list.append(crowd.state.astype('u1').tobytes())
+        sprite_set_list.append(crowd.sprite_set.astype('u1').tobytes())
+        count += crowd.count
+    else:
+        other_player_list = world.collision_list[CollideLayer.group_b.value]
+        man_image_list = world.image_lists['man']
+        x_list.append(to_little_endian(array('h', [round(other_player.pos_x) for other_player in other_player_list])))
+        y_list.append(to_little_endian(array('h', [round(other_player.pos_y) for other_player in other_player_list])))
+        state_list.append(bytes(other_player.state for other_player in other_player_list))
+        sprite_set_list.append(bytes(SPRITE_SET_MAN if other_player.image_list is man_image_list else SPRITE_SET_WOMAN
+                                     for other_player in other_player_list))
+        count += len(other_player_list)
+
+    return count, len(human_list), b''.join(x_list + y_list + state_list + sprite_set_list)
+
+
+class SnapshotEncoder:
+    def __init__(self, stream_rate=STREAM_RATE, keyframe_interval=KEYFRAME_INTERVAL, compress_level=COMPRESS_LEVEL):
+        self.stream_rate = stream_rate
+        self.keyframe_interval = keyframe_interval
+        self.compress_level = compress_level
+        self.frame_index = 0
+        self.prev_block = None
+        self.force_keyframe = True
+
+    # (프레임, 키프레임 여부)를 돌려준다
+    def encode(self, world):
+        count, human_count, block = collect_agent_block(world)
+
+        is_keyframe = (self.force_keyframe or self.prev_block is None or len(block) != len(self.prev_block)
+                       or self.frame_index % self.keyframe_interval == 0)
+        if is_keyframe:
+            body = zlib.compress(block, self.compress_level)
+        else:
+            body = zlib.compress(xor_bytes(block, self.prev_block), self.compress_level)
+        self.prev_block = block
+        self.force_keyframe = False
+
+        header = FRAME_HEADER_STRUCT.pack(SNAPSHOT_MAGIC, FRAME_KEY if is_keyframe else FRAME_DELTA, world.enemy.state,
+                                          self.frame_index, count, human_count, world.game_timer, world.config.remain_time,
+                                          world.enemy.beat_rate, round(world.rod.pos_x), self.stream_rate,
+                                          world.field_width, world.field_height, len(body))
+        self.frame_index += 1
+        return header + body, is_keyframe
+
+
+# 복원한 한 프레임, 배열은 블록을 복사하지 않고 memoryview로 나눠서 본다
+class SnapshotFrame:
+    def __init__(self, header, block):
+        (magic, frame_type, self.enemy_state, self.frame_index, self.count, self.human_count, self.game_timer,
+         self.remain_time, self.beat_rate, self.rod_pos_x, self.stream_rate, self.field_width, self.field_height,
+         body_length) = header
+        self.block = block
+        view = memoryview(block)
+        count = self.count
+        self.pos_x = view[:count * 2].cast('h')
+        self.pos_y = view[count * 2:count * 4].cast('h')
+        self.state = view[count * 4:count * 5]
+        self.sprite_set = view[count * 5:count * 6]
+
+
+class SnapshotDecoder:
+    def __init__(self):
+        self.prev_frame = None
+
+    # 기준 프레임이 없는 델타 프레임이면 다음 키프레임까지 None을 돌려준다
+    def decode(self, header, body):
+        frame_type = header[1]
+        frame_index = header[3]
+        block = zlib.decompress(body)
+
+        if frame_type == FRAME_DELTA:
+            prev_frame = self.prev_frame
+            if prev_frame is None or prev_frame.frame_index + 1 != frame_index or len(prev_frame.block) != len(block):
+                self.prev_frame = None
+                return None
+            block = xor_bytes(block, prev_frame.block)
+
+        frame = SnapshotFrame(header, block)
+        self.prev_frame = frame
+        return frame
+
+
+# 버퍼에서 완성된 프레임을 (헤더, 본문)으로 꺼내고 쓴 길이를 돌려준다
+def parse_frames(buffer):
+    frame_list = []
+    offset = 0
+    while len(buffer) - offset >= FRAME_HEADER_STRUCT.size:
+        header = FRAME_HEADER_STRUCT.unpack_from(buffer, offset)
+        if header[0] != SNAPSHOT_MAGIC:
+            raise ValueError('broken snapshot stream')
+        end = offset + FRAME_HEADER_STRUCT.size + header[-1]
+        if len(buffer) < end:
+            break
+        frame_list.append((header, bytes(buffer[offset + FRAME_HEADER_STRUCT.size:end])))
+        offset = end
+    return frame_list, offset
+
+
+# 게임 루프 안에서 불리는 논블로킹 관전 스트림 서버
+# 새 시청자에게는 마지막 키프레임부터의 프레임을 먼저 보내고 이후 프레임을 이어서 보낸다
+class SnapshotBroadcaster:
+    def __init__(self, host='0.0.0.0', port=0, stream_rate=STREAM_RATE, keyframe_interval=KEYFRAME_INTERVAL):
+        self.listen_socket = socket.create_server((host, port))
+        self.listen_socket.setblocking(False)
+        self.port = self.listen_socket.getsockname()[1]
+        self.encoder = SnapshotEncoder(stream_rate, keyframe_interval)
+        self.frame_time = 1 / stream_rate
+        self.time = 0
+        self.viewer_list = []
+        self.catch_up_list = []
+        self.sent_byte_count = 0
+
+    def close(self):
+        for viewer_socket, pending in self.viewer_list:
+            viewer_socket.close()
+        self.viewer_list = []
+        self.listen_socket.close()
+
+    def accept_viewers(self):
+        while True:
+            try:
+                viewer_socket, address = self.listen_socket.accept()
+            except BlockingIOError:
+                return
+            viewer_socket.setblocking(False)
+            viewer_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.viewer_list.append((viewer_socket, bytearray(b''.join(self.catch_up_list))))
+
+    # 보낼 수 있는 만큼 보내고 남은 것은 쌓아둔다, 너무 밀린 시청자는 끊는다
+    def flush(self, data=b''):
+        alive_list = []
+        for viewer_socket, pending in self.viewer_list:
+            pending += data
+            try:
+                while pending:
+                    sent = viewer_socket.send(pending)
+                    self.sent_byte_count += sent
+                    del pending[:sent]
+            except BlockingIOError:
+                pass
+            except OSError:
+                viewer_socket.close()
+                continue
+
+            if len(pending) > MAX_PENDING_SIZE:
+                viewer_socket.close()
+                continue
+            alive_list.append((viewer_socket, pending))
+        self.viewer_list = alive_list
+
+    def publish(self, world):
+        frame, is_keyframe = self.encoder.encode(world)
+        if is_keyframe:
+            self.catch_up_list = []
+        self.catch_up_list.append(frame)
+        self.flush(frame)
+
+    # 매 프레임 불러준다, 스트림 속도에 맞춰 프레임을 보낸다
+    def update(self, world, delta_time):
+        self.accept_viewers()
+        self.time += delta_time
+        if self.time < self.frame_time:
+            return
+        self.time = min(self.time - self.frame_time, self.frame_time)
+        self.publish(world)
+
+
+# 관전 스트림을 받아서 프레임으로 복원하는 논블로킹 클라이언트
+class SnapshotReceiver:
+    def __init__(self, host, port):
+        self.socket = socket.create_connection((host, port))
+        self.socket.setblocking(False)
+        self.buffer = bytearray()
+        self.decoder = SnapshotDecoder()
+        self.is_connected = True
+        self.received_byte_count = 0
+
+    def close(self):
+        self.socket.close()
+        self.is_connected = False
+
+    # 지금까지 도착한 프레임을 복원해서 돌려준다
+    def poll(self):
+        while self.is_connected:
+            try:
+                data = self.socket.recv(RECEIVE_SIZE)
+            except BlockingIOError:
+                break
+            except OSError:
+                self.close()
+                break
+            if not data:
+                self.close()
+                break
+            self.buffer += data
+            self.received_byte_count += len(data)
+
+        frame_list, offset = parse_frames(self.buffer)
+        del self.buffer[:offset]
+
+        decoded_list = []
+        for header, body in frame_list:
+            frame = self.decoder.decode(header, body)
+            if frame is not None:
+                decoded_list.append(frame)
+        return decoded_list
+
+
+# 시뮬레이션 없이 받은 프레임으로 화면을 그리기 위한 월드 대용
+# 배경, 적, UI 위치는 참가자 없는 World를 무대로 만들어 그대로 쓴다
+# DirtyRenderer에 World 대신 넘길 수 있다
+# 필드가 화면보다 크면 카메라는 게임을 연 쪽처럼 첫 번째 사람 참가자를 따라간다
+class SpectatorView:
+    def __init__(self, image_lists):
+        self.image_lists = image_lists
+        self.profiler = None
+        self.sprite_image_lists = [image_lists[name] for name in SPRITE_SET_NAMES]
+        self.frame = None
+        self.prev_frame = None
+        self.create_stage(GameConfig().field_width, GameConfig().field_height)
+
+    def create_stage(self, field_width, field_height):
+        self.stage = World(self.image_lists, player_count=0,
+                           config=GameConfig(field_width=field_width, field_height=field_height))
+        self.camera = self.stage.camera
+
+    # 필드 크기가 바뀌어서 무대를 새로 만들었으면 True, 렌더러도 새 카메라로 다시 만들어야 한다
+    def apply(self, frame):
+        is_stage_changed = False
+        if (frame.field_width, frame.field_height) != (self.stage.field_width, self.stage.field_height):
+            self.create_stage(frame.field_width, frame.field_height)
+            self.frame = None
+            is_stage_changed = True
+
+        stage = self.stage
+        # 참가자 수가 같을 때만 지난 프레임과 보간한다
+        if self.frame is not None and self.frame.count == frame.count:
+            self.prev_frame = self.frame
+        else:
+            self.prev_frame = None
+        self.frame = frame
+
+        stage.game_timer = frame.game_timer
+        stage.enemy.state = frame.enemy_state
+        stage.enemy.beat_rate = frame.beat_rate
+        stage.rod.prev_pos_x = stage.rod.pos_x if self.prev_frame is not None else frame.rod_pos_x
+        stage.rod.pos_x = frame.rod_pos_x
+        return is_stage_changed
+
+    # 심장 박동처럼 시간에 따라 바뀌는 UI만 진행시킨다
+    def update(self, delta_time):
+        self.stage.delta_time = delta_time
+        self.stage.heart.update()
+
+    # 첫 번째 사람 참가자를 화면 가운데에 두고, 사람 참가자가 없으면 출발선 쪽을 본다
+    def update_camera(self, alpha):
+        camera = self.camera
+        frame = self.frame
+        if not camera.is_scrolling:
+            return
+        if frame is None or frame.human_count == 0:
+            camera.look_at(camera.field_width / 2, camera.field_height)
+            return
+
+        x = frame.pos_x[0]
+        y = frame.pos_y[0]
+        if self.prev_frame is not None:
+            x = self.prev_frame.pos_x[0] + (x - self.prev_frame.pos_x[0]) * alpha
+            y = self.prev_frame.pos_y[0] + (y - self.prev_frame.pos_y[0]) * alpha
+        player = self.stage.player
+        camera.look_at(x + player.width / 2, y + player.height / 2)
+
+    # 참가자 위치는 필드 좌표라 카메라 위치를 빼서 화면 좌표로 돌려준다
+    def iter_agents(self, start, end, alpha):
+        frame = self.frame
+        prev_frame = self.prev_frame
+        sprite_image_lists = self.sprite_image_lists
+        pos_x = frame.pos_x
+        pos_y = frame.pos_y
+        state = frame.state
+        sprite_set = frame.sprite_set
+        view_x = self.camera.view_x
+        view_y = self.camera.view_y
+
+        for i in range(start, end):
+            x = pos_x[i]
+            y = pos_y[i]
+            if prev_frame is not None:
+                x = prev_frame.pos_x[i] + (x - prev_frame.pos_x[i]) * alpha
+                y = prev_frame.pos_y[i] + (y - prev_frame.pos_y[i]) * alpha
+            yield i, sprite_image_lists[sprite_set[i]][PLAYER_STATE_RENDER_INDEX[state[i]]], x - view_x, y - view_y
+
+    # UI 레이어는 화면 좌표에, 나머지는 필드 좌표에 있다
+    def iter_sprites(self, first_layer=RenderLayer.none.value, alpha=1.0):
+        stage = self.stage
+        self.update_camera(alpha)
+        for layer_index in range(first_layer, RenderLayer.max_length.value):
+            if layer_index == RenderLayer.front_1.value:
+                if self.frame is not None:
+                    yield from self.iter_agents(self.frame.human_count, self.frame.count, alpha)
+            elif layer_index == RenderLayer.front_2.value:
+                if self.frame is not None:
+                    yield from self.iter_agents(0, self.frame.human_count, alpha)
+            else:
+                view_x = 0
+                view_y = 0
+                if layer_index < RenderLayer.ui_back.value:
+                    view_x = self.camera.view_x
+                    view_y = self.camera.view_y
+                for game_object in stage.render_list[layer_index]:
+                    index = game_object.get_render_index()
+                    if index > 0:
+                        pos_x, pos_y = game_object.get_render_position(alpha)
+                        yield game_object, game_object.image_list[index], pos_x - view_x, pos_y - view_y
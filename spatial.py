@@ -0,0 +1,79 @@
+CELL_SIZE = 64
+
+
+# 충돌 레이어 하나를 균일한 격자로 나눠 관리하는 공간 인덱스
+# 움직이는 오브젝트는 칸 경계를 넘을 때만 다시 넣고,
+# 죽어서 더 이상 움직이지 않는 오브젝트는 정적 인덱스에 한 번만 넣는다
+class SpatialGrid:
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.item_cells = {}
+        self.static_cells = {}
+        self.static_count = 0
+
+    def clear(self):
+        self.cells.clear()
+        self.item_cells.clear()
+        self.static_cells.clear()
+        self.static_count = 0
+
+    def calc_cell(self, pos_x, pos_y):
+        return int(pos_x // self.cell_size), int(pos_y // self.cell_size)
+
+    # 오브젝트의 중심 좌표가 바뀌었을 때 호출, 칸이 바뀐 경우에만 다시 넣는다
+    def update(self, item, center_x, center_y):
+        cell = self.calc_cell(center_x, center_y)
+        old_cell = self.item_cells.get(item)
+        if old_cell == cell:
+            return False
+
+        if old_cell is not None:
+            self.cells[old_cell].discard(item)
+        self.cells.setdefault(cell, set()).add(item)
+        self.item_cells[item] = cell
+        return True
+
+    def remove(self, item):
+        old_cell = self.item_cells.pop(item, None)
+        if old_cell is not None:
+            self.cells[old_cell].discard(item)
+
+    # 움직이지 않게 된 오브젝트를 겹치는 모든 칸의 정적 인덱스에 넣는다
+    def make_static(self, item, rect):
+        self.remove(item)
+        left, top = self.calc_cell(rect.left, rect.top)
+        right, bottom = self.calc_cell(rect.right - 1, rect.bottom - 1)
+        for cell_y in range(top, bottom + 1):
+            for cell_x in range(left, right + 1):
+                self.static_cells.setdefault((cell_x, cell_y), []).append((item, rect))
+        self.static_count += 1
+
+    # 렉트와 겹치는 정적 오브젝트를 찾는다
+    def query_static(self, rect):
+        for item, item_rect in self.query_static_rects(rect):
+            yield item
+
+    # 렉트와 겹치는 정적 오브젝트를 넣을 때의 렉트와 같이 (오브젝트, 렉트)로 돌려준다
+    def query_static_rects(self, rect):
+        if self.static_count == 0:
+            return
+
+        left, top = self.calc_cell(rect.left, rect.top)
+        right, bottom = self.calc_cell(rect.right - 1, rect.bottom - 1)
+        found = set()
+        for cell_y in range(top, bottom + 1):
+            for cell_x in range(left, right + 1):
+                for item, item_rect in self.static_cells.get((cell_x, cell_y), ()):
+                    if item not in found and rect.colliderect(item_rect):
+                        found.add(item)
+                        yield item, item_rect
+
+    # 렉트 근처에 있는 움직이는 오브젝트 후보를 찾는다
+    # 중심 좌표로만 칸을 정하므로 한 칸 바깥까지 같이 본다
+    def query_moving(self, rect):
+        left, top = self.calc_cell(rect.left, rect.top)
+        right, bottom = self.calc_cell(rect.right - 1, rect.bottom - 1)
+        for cell_y in range(top - 1, bottom + 2):
+            for cell_x in range(left - 1, right + 2):
+                yield from self.cells.get((cell_x, cell_y), ())
@@ -0,0 +1,246 @@
+import argparse
+import csv
+import itertools
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from world import GameConfig, EnemyState, OnKeyDown, World, create_key_state
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+FRAME_TIME = 1 / 60
+
+# 난이도 설정 이름과 값 변환 함수
+SWEEP_PARAMETERS = {
+    'ready_time': float,
+    'watch_time': float,
+    'remain_time': float,
+    'beat_rate_min': int,
+    'beat_rate_max': int,
+    'other_player_speed': float,
+    'pixel_collision': int,
+    'field_width': int,
+    'field_height': int,
+}
+
+worker_image_lists = None
+
+
+# '0:10/35:4/44:2' 형태의 움직임 확률 일정표
+def parse_move_range_schedule(text):
+    schedule = []
+    for item in text.split('/'):
+        start_time, move_range = item.split(':')
+        schedule.append((float(start_time), int(move_range)))
+    return tuple(schedule)
+
+
+def format_move_range_schedule(schedule):
+    return '/'.join('%g:%d' % (start_time, move_range) for start_time, move_range in schedule)
+
+
+# name=v1,v2,... 형태의 인자를 (이름, 값 리스트)로 바꾼다
+def parse_grid_argument(text):
+    name, values = text.split('=', 1)
+    if name == 'move_range_schedule':
+        return name, [parse_move_range_schedule(value) for value in values.split(',')]
+    if name not in SWEEP_PARAMETERS:
+        raise argparse.ArgumentTypeError('unknown parameter: ' + name)
+    return name, [SWEEP_PARAMETERS[name](value) for value in values.split(',')]
+
+
+# 심장박동 막대를 사람처럼 약간씩 어긋난 타이밍으로 누르는 봇
+# 왕복마다 timing_error(초) 표준편차로 반응 시간 오차를 새로 뽑는다
+class RhythmBot:
+    def __init__(self, rng, timing_error):
+        self.rng = rng
+        self.timing_error = timing_error
+        self.is_left = None
+        self.offset = 0
+
+    def __call__(self, world):
+        key_state = create_key_state()
+        rod = world.rod
+
+        if world.enemy.state != EnemyState.watch.value:
+            self.is_left = None
+            return key_state
+
+        if self.is_left != rod.is_left:
+            self.is_left = rod.is_left
+            self.offset = self.rng.gauss(0, self.timing_error)
+
+        velocity = world.enemy.beat_rate * rod.speed
+        if not rod.is_left:
+            velocity = -velocity
+
+        # 오차만큼 어긋난 위치를 보고 노란 구간 안이라고 판단하면 누른다
+        perceived_pos_x = rod.pos_x + velocity * self.offset
+        safe_zone = world.line_safe_zone
+        if safe_zone.pos_x - rod.width < perceived_pos_x < safe_zone.pos_x + safe_zone.width:
+            key_state[OnKeyDown.space.value] = True
+
+        return key_state
+
+
+# 캐시는 부모가 미리 만들어두므로 워커는 읽기만 한다
+def init_worker():
+    global worker_image_lists
+    from assets import load_image_lists
+    worker_image_lists = load_image_lists()
+
+
+# 한 설정값으로 여러 판을 돌리고 합계만 돌려준다
+def run_task(config_kwargs, seed_list, player_count, crowd_backend, timing_error, delta_time):
+    config = GameConfig(**config_kwargs)
+    world = World(worker_image_lists, seed=seed_list[0], player_count=player_count, crowd_backend=crowd_backend,
+                  config=config)
+    world.run_until_time_over = True
+
+    bin_count = int(math.ceil(config.remain_time)) + 1
+    death_histogram = [0] * bin_count
+    result = {
+        'rounds': 0,
+        'success': 0,
+        'dead': 0,
+        'total': 0,
+        'rod_pass': 0,
+        'rod_miss': 0,
+        'player_survived': 0,
+    }
+
+    for seed in seed_list:
+        world.reset(seed)
+        bot = RhythmBot(random.Random(seed), timing_error)
+
+        while not world.is_over:
+            world.step(delta_time, bot(world))
+
+        success_count, dead_count, total_count = world.count_crowd_result()
+        result['rounds'] += 1
+        result['success'] += success_count
+        result['dead'] += dead_count
+        result['total'] += total_count
+        result['rod_pass'] += world.rod.pass_count
+        result['rod_miss'] += world.rod.miss_count
+        if world.rod.miss_count == 0:
+            result['player_survived'] += 1
+        for death_time in world.death_time_list:
+            death_histogram[min(int(death_time), bin_count - 1)] += 1
+
+    result['death_histogram'] = death_histogram
+    return result
+
+
+def merge_result(total, result):
+    if total is None:
+        return result
+    for key, value in result.items():
+        if key == 'death_histogram':
+            total[key] = [a + b for a, b in zip(total[key], value)]
+        else:
+            total[key] += value
+    return total
+
+
+# 열(column) 단위로 모은 결과를 CSV로 쓴다, parquet를 고르면 pyarrow로 쓴다
+def write_columns(path, columns, output_format):
+    if output_format == 'parquet':
+        import pyarrow
+        import pyarrow.parquet
+        pyarrow.parquet.write_table(pyarrow.table(columns), path + '.parquet')
+        return path + '.parquet'
+
+    names = list(columns)
+    with open(path + '.csv', 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(names)
+        writer.writerows(zip(*[columns[name] for name in names]))
+    return path + '.csv'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='난이도 설정 조합마다 여러 판을 병렬로 돌려 통계를 낸다')
+    parser.add_argument('--param', action='append', type=parse_grid_argument, default=[],
+                        help='name=v1,v2,... (여러 번 지정하면 모든 조합을 돈다)')
+    parser.add_argument('--rounds', type=int, default=100, help='설정 조합마다 돌릴 판 수')
+    parser.add_argument('--chunk', type=int, default=10, help='작업 하나에 묶을 판 수')
+    parser.add_argument('--players', type=int, default=120)
+    parser.add_argument('--crowd', choices=['object', 'numpy'], default='numpy' if numpy is not None else 'object')
+    parser.add_argument('--timing-error', type=float, default=0.05, help='봇의 반응 시간 오차 표준편차(초)')
+    parser.add_argument('--dt', type=float, default=FRAME_TIME)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--output', default='sweep')
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    args = parser.parse_args()
+
+    names = [name for name, values in args.param]
+    point_list = [dict(zip(names, values)) for values in itertools.product(*[values for name, values in args.param])]
+
+    # 워커마다 빈 캐시를 동시에 만들지 않게 풀을 띄우기 전에 한 번 만든다
+    from assets import build_image_cache
+    build_image_cache()
+
+    start_time = time.perf_counter()
+    future_list = []
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker) as executor:
+        for point_index, point in enumerate(point_list):
+            seed_list = [args.seed + point_index * 1000000 + i for i in range(args.rounds)]
+            for i in range(0, args.rounds, args.chunk):
+                future = executor.submit(run_task, point, seed_list[i:i + args.chunk], args.players, args.crowd,
+                                         args.timing_error, args.dt)
+                future_list.append((point_index, future))
+
+        total_list = [None] * len(point_list)
+        for point_index, future in future_list:
+            total_list[point_index] = merge_result(total_list[point_index], future.result())
+    elapsed_time = time.perf_counter() - start_time
+
+    def format_value(name, value):
+        if name == 'move_range_schedule':
+            return format_move_range_schedule(value)
+        return value
+
+    summary = {'point': []}
+    summary.update({name: [] for name in names})
+    summary.update({'rounds': [], 'success_rate': [], 'death_rate': [], 'rod_miss_rate': [],
+                    'player_survival_rate': []})
+    curve = {'point': [], 'time': [], 'deaths': [], 'alive_rate': []}
+
+    for point_index, (point, total) in enumerate(zip(point_list, total_list)):
+        summary['point'].append(point_index)
+        for name in names:
+            summary[name].append(format_value(name, point[name]))
+        summary['rounds'].append(total['rounds'])
+        summary['success_rate'].append(total['success'] / total['total'])
+        summary['death_rate'].append(total['dead'] / total['total'])
+        summary['rod_miss_rate'].append(total['rod_miss'] / max(total['rod_pass'], 1))
+        summary['player_survival_rate'].append(total['player_survived'] / total['rounds'])
+
+        # 초 단위 생존 곡선
+        dead_count = 0
+        for second, deaths in enumerate(total['death_histogram']):
+            dead_count += deaths
+            curve['point'].append(point_index)
+            curve['time'].append(second)
+            curve['deaths'].append(deaths)
+            curve['alive_rate'].append(1 - dead_count / total['total'])
+
+    summary_path = write_columns(args.output + '_summary', summary, args.format)
+    curve_path = write_columns(args.output + '_curve', curve, args.format)
+
+    round_count = len(point_list) * args.rounds
+    print('%d points x %d rounds in %.2f s (%.1f rounds/s, %d workers)'
+          % (len(point_list), args.rounds, elapsed_time, round_count / elapsed_time, args.workers))
+    print('wrote ' + summary_path + ', ' + curve_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+from collections import OrderedDict
+
+import pygame
+
+TEXT_CACHE_SIZE = 256
+
+
+# 같은 (폰트, 글자, 안티앨리어스, 색) 조합은 한 번만 렌더링하는 캐시
+# 오래 안 쓴 것부터 버린다 (LRU)
+class TextCache:
+    def __init__(self, max_size=TEXT_CACHE_SIZE):
+        self.max_size = max_size
+        self.surface_dict = OrderedDict()
+        self.hit_count = 0
+        self.miss_count = 0
+
+    # font.render와 같은 인자 순서
+    def render(self, font, text, antialias, color):
+        key = (font, text, antialias, tuple(color))
+        surface = self.surface_dict.get(key)
+
+        if surface is not None:
+            self.surface_dict.move_to_end(key)
+            self.hit_count += 1
+            return surface
+
+        self.miss_count += 1
+        surface = font.render(text, antialias, color)
+        self.surface_dict[key] = surface
+        if len(self.surface_dict) > self.max_size:
+            self.surface_dict.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.surface_dict.clear()
+
+
+# 타이머처럼 적은 종류의 글자로 계속 바뀌는 텍스트를 글자 단위로 캐시해서 조합한다
+class GlyphText:
+    def __init__(self, font, color, antialias=True):
+        self.font = font
+        self.color = color
+        self.antialias = antialias
+        self.glyph_dict = {}
+        self.last_text = None
+        self.last_surface = None
+
+    def get_glyph(self, char):
+        glyph = self.glyph_dict.get(char)
+        if glyph is None:
+            glyph = self.font.render(char, self.antialias, self.color)
+            self.glyph_dict[char] = glyph
+        return glyph
+
+    def render(self, text):
+        if text == self.last_text:
+            return self.last_surface
+
+        glyph_list = [self.get_glyph(char) for char in text]
+        surface = pygame.Surface((sum(glyph.get_width() for glyph in glyph_list), self.font.get_height()),
+                                 pygame.SRCALPHA)
+        pos_x = 0
+        for glyph in glyph_list:
+            surface.blit(glyph, (pos_x, 0))
+            pos_x += glyph.get_width()
+
+        self.last_text = text
+        self.last_surface = surface
+        return surface
+
+
+# 텍스트를 가로 가운데 정렬해서 그린다
+def blit_centered(surface, text_surface, pos_y):
+    text_rect = text_surface.get_rect()
+    text_rect.centerx = round(surface.get_width() / 2)
+    text_rect.y = pos_y
+    surface.blit(text_surface, text_rect)
+    return text_rect
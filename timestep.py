@@ -0,0 +1,45 @@
+# 게임 진행은 항상 같은 간격으로, 렌더링은 남은 시간만큼 보간해서 그린다
+FIXED_DELTA_TIME = 1 / 120
+
+# 렌더링이 밀렸을 때 한 프레임에 몰아서 진행할 최대 스텝 수 (나머지 프레임은 건너뛴다)
+MAX_STEP_COUNT = 8
+
+# 창을 끌거나 디버거에 멈췄을 때처럼 한 번에 너무 긴 시간이 들어오면 잘라낸다
+MAX_FRAME_TIME = 0.25
+
+
+class FixedTimestep:
+    def __init__(self, step_time=FIXED_DELTA_TIME, max_step_count=MAX_STEP_COUNT, max_frame_time=MAX_FRAME_TIME):
+        self.step_time = step_time
+        self.max_step_count = max_step_count
+        self.max_frame_time = max_frame_time
+        self.accumulator = 0
+        self.alpha = 0
+        self.dropped_time = 0
+        self.skipped_frame_count = 0
+
+    def reset(self):
+        self.accumulator = 0
+        self.alpha = 0
+
+    # 이번 프레임에 흐른 시간을 넣으면 진행할 스텝 수를 돌려준다
+    def advance(self, frame_time):
+        if frame_time > self.max_frame_time:
+            self.dropped_time += frame_time - self.max_frame_time
+            frame_time = self.max_frame_time
+
+        self.accumulator += frame_time
+        step_count = int(self.accumulator / self.step_time)
+
+        # 한계를 넘는 만큼은 따라잡지 않고 버린다, 게임이 잠깐 느려지는 대신 멈추지 않는다
+        if step_count > self.max_step_count:
+            self.dropped_time += (step_count - self.max_step_count) * self.step_time
+            step_count = self.max_step_count
+            self.accumulator = self.step_time * step_count
+
+        if step_count > 1:
+            self.skipped_frame_count += step_count - 1
+
+        self.accumulator -= step_count * self.step_time
+        self.alpha = self.accumulator / self.step_time
+        return step_count
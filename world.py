@@ -0,0 +1,1139 @@
+import bisect
+import hashlib
+import random
+import struct
+import time
+from enum import Enum
+from operator import attrgetter
+
+import pygame
+
+from camera import Camera, TiledBackground
+from collision import MaskCache
+from scheduler import UpdateScheduler
+from spatial import SpatialGrid
+
+SCREEN_WIDTH = 640
+SCREEN_HEIGHT = 900
+MAX_PLAYER_COUNT = 120
+
+PLATFORM_HEIGHT = 40
+PLAYER_COL_WIDTH = 12
+PLAYER_COL_HEIGHT = 33
+
+READY_TIME = 4
+WATCH_TIME = 4
+
+OTHER_PLAYER_MOVE_RANGE = 10
+REMAIN_TIME = 80
+PLAYER_SPEED = 3
+OTHER_PLAYER_SPEED = 4.5
+
+BEAT_RATE_MIN = 5
+BEAT_RATE_MAX = 12
+
+# 시체에 닿았는지를 충돌 박스 대신 스프라이트 픽셀로 판정한다
+PIXEL_COLLISION = True
+
+# 타이머로 잠든 참가자를 움직일 시간보다 이만큼(초) 일찍 깨운다
+WAKE_MARGIN = 0.05
+
+# 사람 참가자 화면에서 이만큼 더 떨어진 참가자는 준비 시간 동안 이 간격(초)으로만 깨어나서 밀린 이동을 몰아서 한다
+OFFSCREEN_MARGIN = 64
+OFFSCREEN_UPDATE_INTERVAL = 0.5
+
+# (게임 시간, 감시 시간에 움직이는 확률 1/n) 시간이 지나면 더 많은 참가자가 움직이다 죽는다
+MOVE_RANGE_SCHEDULE = ((0, OTHER_PLAYER_MOVE_RANGE), (35, 4), (44, 2))
+
+ROAD_POS_X = 18
+
+
+class Scene(Enum):
+    menu = 0
+    play = 1
+    result = 2
+    watch = 3
+
+
+class RenderLayer(Enum):
+    none = 0
+    back = 1
+    middle = 2
+    front_1 = 3
+    front_2 = 4
+    ui_back = 5
+    ui_middle = 6
+    ui_front = 7
+    max_length = 8
+
+
+class CollideLayer(Enum):
+    none = 0
+    group_a = 1
+    group_b = 2
+    max_length = 3
+
+
+class OnKeyDown(Enum):
+    space = 0
+    left = 1
+    right = 2
+    up = 3
+    down = 4
+    enter = 5
+    max_length = 6
+
+
+class EnemyState(Enum):
+    ready = 0
+    watch = 1
+
+
+class PlayerState(Enum):
+    idle = 0
+    move = 1
+    dead = 2
+    success = 3
+    max_length = 4
+
+
+# 스케줄러로 잠든 오브젝트를 깨우는 이벤트
+class WorldEvent(Enum):
+    enemy_ready = 0
+    enemy_watch = 1
+
+
+# 상태 값으로 바로 찾는 이미지 인덱스 표 (0이면 그리지 않는다)
+PLAYER_STATE_RENDER_INDEX = (1, 2, 3, 1)
+ENEMY_STATE_RENDER_INDEX = (1, 2)
+
+# 이펙트 이미지가 바뀌는 시간, 마지막 시간이 지나면 사라진다
+EFFECT_FRAME_END_TIME = (0.05, 0.1, 0.15, 0.2, 0.25)
+EFFECT_RENDER_INDEX = (1, 2, 3, 4, 5, 0)
+
+
+class SoundEvent(Enum):
+    voice = 0
+    heartbeat_slow = 1
+    heartbeat_fast = 2
+    gunshot = 3
+    clear = 4
+
+
+# 화면/사운드 없이 돌릴 때 쓰는 빈 사운드 플레이어
+class NullSoundPlayer:
+    def play(self, sound_event, index=0):
+        pass
+
+    def stop(self, sound_event):
+        pass
+
+
+# 난이도 설정값, 기본값은 원래 게임과 같다
+class GameConfig:
+    def __init__(self, ready_time=READY_TIME, watch_time=WATCH_TIME, remain_time=REMAIN_TIME,
+                 beat_rate_min=BEAT_RATE_MIN, beat_rate_max=BEAT_RATE_MAX, other_player_speed=OTHER_PLAYER_SPEED,
+                 move_range_schedule=MOVE_RANGE_SCHEDULE, pixel_collision=PIXEL_COLLISION,
+                 field_width=SCREEN_WIDTH, field_height=SCREEN_HEIGHT):
+        self.ready_time = ready_time
+        self.watch_time = watch_time
+        self.remain_time = remain_time
+        self.beat_rate_min = beat_rate_min
+        self.beat_rate_max = beat_rate_max
+        self.other_player_speed = other_player_speed
+        self.move_range_schedule = tuple(move_range_schedule)
+        self.pixel_collision = pixel_collision
+        # 필드(코스) 크기, 화면보다 크면 카메라가 플레이어를 따라간다
+        self.field_width = max(field_width, SCREEN_WIDTH)
+        self.field_height = max(field_height, SCREEN_HEIGHT)
+
+    # 지금 게임 시간에 맞는 움직임 확률
+    def get_move_range(self, game_timer):
+        move_range = self.move_range_schedule[0][1]
+        for start_time, schedule_range in self.move_range_schedule[1:]:
+            if game_timer > start_time:
+                move_range = schedule_range
+        return move_range
+
+
+def create_key_state():
+    return [False] * OnKeyDown.max_length.value
+
+
+# 오브젝트는 수천 개까지 만들어지므로 속성을 __slots__로 고정해서 인스턴스마다 dict를 두지 않는다
+# 슬롯은 역할별로 묶어둔다 (위치, 스프라이트, 충돌, 스케줄러)
+class GameObject:
+    __slots__ = (
+        'world',
+        'pos_x', 'pos_y', 'prev_pos_x', 'prev_pos_y',
+        'image_list', 'width', 'height', 'render_time',
+        'col_width', 'col_height', 'rect',
+        'update_order', 'is_awake', 'wake_generation',
+    )
+
+    def __init__(self, world, image_list, render_layer, collide_layer, pos_x=0, pos_y=0):
+        self.world = world
+        self.image_list = image_list
+        self.width, self.height = self.image_list[1].get_size()
+        # 충돌 렉트는 충돌 계산할 때 calc_rect_collider로 만든다
+        self.rect = None
+        self.col_width = self.width
+        self.col_height = self.height
+        self.pos_x = pos_x
+        self.pos_y = pos_y
+        self.prev_pos_x = pos_x
+        self.prev_pos_y = pos_y
+        self.render_time = 0
+        self.update_order = len(world.update_object_list)
+        self.is_awake = False
+        self.wake_generation = 0
+        world.update_object_list.append(self)
+        world.render_list[render_layer].append(self)
+        world.collision_list[collide_layer].append(self)
+
+    def initialize(self):
+        pass
+
+    # 움직이지 않는 오브젝트는 한 번 불린 뒤로 스케줄러에서 빠진다
+    def update(self):
+        self.world.scheduler.sleep(self)
+
+    # 이번 프레임에 그릴 이미지 인덱스, 0이면 그리지 않는다
+    def get_render_index(self):
+        return 1
+
+    # 스텝 시작 전 위치를 저장해두고 렌더링할 때 보간에 쓴다
+    def save_previous_position(self):
+        self.prev_pos_x = self.pos_x
+        self.prev_pos_y = self.pos_y
+
+    # 순간이동한 경우 보간하지 않도록 이전 위치를 현재 위치로 맞춘다
+    def snap_previous_position(self):
+        self.prev_pos_x = self.pos_x
+        self.prev_pos_y = self.pos_y
+
+    # alpha는 지난 스텝과 이번 스텝 사이의 비율 (0 ~ 1)
+    def get_render_position(self, alpha=1.0):
+        return (self.prev_pos_x + (self.pos_x - self.prev_pos_x) * alpha,
+                self.prev_pos_y + (self.pos_y - self.prev_pos_y) * alpha)
+
+    def render(self, surface, alpha=1.0):
+        index = self.get_render_index()
+        if index > 0:
+            surface.blit(self.image_list[index], self.get_render_position(alpha))
+
+
+class Enemy(GameObject):
+    __slots__ = ('state', 'state_time', 'is_voice_ready', 'beat_rate')
+
+    def __init__(self, world, image_list, render_layer, collide_layer, pos_x=0, pos_y=0):
+        super().__init__(world, image_list, render_layer, collide_layer, pos_x, pos_y)
+        self.state = EnemyState.ready.value
+        self.state_time = 0
+        self.is_voice_ready = True
+        self.beat_rate = 0
+
+    def initialize(self):
+        self.state = EnemyState.ready.value
+        self.state_time = 0
+        self.is_voice_ready = True
+        self.beat_rate = 0
+
+    def update(self):
+        self.state_time += self.world.delta_time
+
+        if self.state == EnemyState.ready.value:
+            if self.is_voice_ready is True:
+                self.is_voice_ready = False
+                self.world.sound_player.stop(SoundEvent.heartbeat_slow)
+                self.world.sound_player.stop(SoundEvent.heartbeat_fast)
+                self.world.sound_player.play(SoundEvent.voice)
+
+            if self.state_time >= self.world.config.ready_time:
+                self.state_time = 0
+                self.set_state(EnemyState.watch.value)
+                self.beat_rate = self.world.random.randint(self.world.config.beat_rate_min,
+                                                           self.world.config.beat_rate_max)
+
+                if self.beat_rate <= 8:
+                    self.world.sound_player.play(SoundEvent.heartbeat_slow)
+                else:
+                    self.world.sound_player.play(SoundEvent.heartbeat_fast)
+
+        elif self.state == EnemyState.watch.value:
+            if self.state_time >= self.world.config.watch_time:
+                self.state_time = 0
+                self.set_state(EnemyState.ready.value)
+                self.is_voice_ready = True
+
+    # 상태가 바뀌면 그 상태를 기다리며 잠든 참가자들을 깨운다
+    def set_state(self, state):
+        self.state = state
+        if state == EnemyState.ready.value:
+            self.world.scheduler.emit(WorldEvent.enemy_ready)
+        else:
+            self.world.scheduler.emit(WorldEvent.enemy_watch)
+
+    def get_render_index(self):
+        return ENEMY_STATE_RENDER_INDEX[self.state]
+
+
+class Player(GameObject):
+    __slots__ = ('state', 'speed', 'key_down_list', 'key_state', 'rod')
+
+    def __init__(self, world, image_list, render_layer, collide_layer, pos_x=0, pos_y=0):
+        super().__init__(world, image_list, render_layer, collide_layer, pos_x, pos_y)
+        self.state = PlayerState.idle.value
+        self.speed = PLAYER_SPEED
+        self.key_down_list = []
+        self.col_width = PLAYER_COL_WIDTH
+        self.col_height = PLAYER_COL_HEIGHT
+        for i in range(OnKeyDown.max_length.value):
+            self.key_down_list.append(False)
+
+        # 이 참가자의 입력과 심장박동 막대
+        self.key_state = create_key_state()
+        self.rod = None
+
+    def initialize(self):
+        self.state = PlayerState.idle.value
+        self.speed = PLAYER_SPEED
+        self.col_width = PLAYER_COL_WIDTH
+        self.col_height = PLAYER_COL_HEIGHT
+        self.pos_x = self.world.field_width / 2 - self.width / 2
+        self.pos_y = self.world.field_height - PLATFORM_HEIGHT - self.height
+        self.key_state = create_key_state()
+
+    def restore_speed(self):
+        self.speed = PLAYER_SPEED
+
+    def update(self):
+        if self.state == PlayerState.success.value or self.state == PlayerState.dead.value:
+            # 분석용으로 시간이 끝날 때까지 돌리는 판에서는 플레이어가 끝나도 계속 진행한다
+            if self.world.run_until_time_over:
+                return
+
+            if self.state == PlayerState.dead.value:
+                self.world.play_gunshot_sound()
+
+            self.world.is_over = True
+            return
+
+        key = self.key_state
+
+        if key[OnKeyDown.left.value] and self.key_down_list[OnKeyDown.left.value] is False:
+            self.key_down_list[OnKeyDown.left.value] = True
+            self.pos_x -= self.speed
+            self.state = PlayerState.move.value
+        elif not key[OnKeyDown.left.value] and self.key_down_list[OnKeyDown.left.value] is True:
+            self.key_down_list[OnKeyDown.left.value] = False
+            self.state = PlayerState.idle.value
+
+        if key[OnKeyDown.right.value] and self.key_down_list[OnKeyDown.right.value] is False:
+            self.key_down_list[OnKeyDown.right.value] = True
+            self.pos_x += self.speed
+            self.state = PlayerState.move.value
+        elif not key[OnKeyDown.right.value] and self.key_down_list[OnKeyDown.right.value] is True:
+            self.key_down_list[OnKeyDown.right.value] = False
+            self.state = PlayerState.idle.value
+
+        if key[OnKeyDown.up.value] and self.key_down_list[OnKeyDown.up.value] is False:
+            self.key_down_list[OnKeyDown.up.value] = True
+            self.pos_y -= self.speed
+            self.state = PlayerState.move.value
+        elif not key[OnKeyDown.up.value] and self.key_down_list[OnKeyDown.up.value] is True:
+            self.key_down_list[OnKeyDown.up.value] = False
+            self.state = PlayerState.idle.value
+
+        if key[OnKeyDown.down.value] and self.key_down_list[OnKeyDown.down.value] is False:
+            self.key_down_list[OnKeyDown.down.value] = True
+            self.pos_y += self.speed
+            self.state = PlayerState.move.value
+        elif not key[OnKeyDown.down.value] and self.key_down_list[OnKeyDown.down.value] is True:
+            self.key_down_list[OnKeyDown.down.value] = False
+            self.state = PlayerState.idle.value
+
+        if self.world.enemy.state == EnemyState.watch.value and self.state == PlayerState.move.value:
+            self.state = PlayerState.dead.value
+
+        if self.pos_x < 0:
+            self.pos_x = 0
+
+        if self.pos_x > self.world.field_width - self.width:
+            self.pos_x = self.world.field_width - self.width
+
+        if self.pos_y >= self.world.field_height - PLATFORM_HEIGHT - self.height:
+            self.pos_y = self.world.field_height - PLATFORM_HEIGHT - self.height
+
+        if self.pos_y <= 28:
+            self.state = PlayerState.success.value
+
+    def get_render_index(self):
+        return PLAYER_STATE_RENDER_INDEX[self.state]
+
+
+class OtherPlayer(GameObject):
+    # 상태, 이동, 감시 시간 타이머
+    __slots__ = ('state', 'speed', 'move_time', 'move_index', 'check_move', 'wait_time', 'after_wait_time',
+                 'sleep_step')
+
+    def __init__(self, world, image_list, render_layer, collide_layer, pos_x=0, pos_y=0):
+        super().__init__(world, image_list, render_layer, collide_layer, pos_x, pos_y)
+        self.state = PlayerState.idle.value
+        self.speed = self.world.config.other_player_speed
+        self.move_time = 0
+        self.col_width = PLAYER_COL_WIDTH
+        self.col_height = PLAYER_COL_HEIGHT
+        self.move_index = 0
+        self.wait_time = 0
+        self.after_wait_time = 0
+        self.check_move = False
+        self.sleep_step = None
+
+    def initialize(self):
+        self.state = PlayerState.idle.value
+        self.speed = self.world.config.other_player_speed
+        self.move_time = 0
+        self.col_width = PLAYER_COL_WIDTH
+        self.col_height = PLAYER_COL_HEIGHT
+        self.move_index = 0
+        self.wait_time = 0
+        self.after_wait_time = 0
+        self.check_move = False
+        self.sleep_step = None
+        self.pos_x = self.world.random.randint(0, self.world.field_width - self.width)
+        self.pos_y = self.world.field_height - PLATFORM_HEIGHT - self.height
+        self.update_spatial_grid()
+
+    # 공간 인덱스의 칸 위치를 갱신, 죽었다면 정적 인덱스로 옮긴다
+    def update_spatial_grid(self):
+        spatial_grid = self.world.spatial_grid_list[CollideLayer.group_b.value]
+        if self.state == PlayerState.dead.value:
+            if self.world.config.pixel_collision:
+                spatial_grid.make_static(self, calc_sprite_rect(self))
+            else:
+                spatial_grid.make_static(self, calc_rect_collider(self))
+        else:
+            spatial_grid.update(self, self.pos_x + self.width / 2, self.pos_y + self.height - self.col_height / 2)
+
+    def restore_speed(self):
+        self.speed = self.world.config.other_player_speed
+
+    def move(self, delta_time):
+        self.move_time += delta_time
+        if self.move_time >= 0.1:
+            self.move_time = 0
+            self.state = PlayerState.move.value
+            index = self.world.random.randint(1, 20)
+            if index <= 15:
+                self.pos_y -= self.speed
+            elif index <= 17:
+                self.pos_x -= self.speed
+            elif index <= 19:
+                self.pos_x += self.speed
+            else:
+                self.pos_y += self.speed
+        else:
+            self.state = PlayerState.idle.value
+
+    def update(self):
+        if self.pos_y <= 28 or self.state == PlayerState.dead.value:
+            self.world.scheduler.sleep(self)
+            return
+
+        # 타이머로 자는 동안 지나간 스텝 시간을 스텝마다 더했을 때와 같은 순서로 더한다
+        # 준비 시간에 화면 밖에서 잤다면 그동안의 이동을 스텝마다 한 것처럼 몰아서 한다
+        if self.sleep_step is not None:
+            if self.check_move:
+                for delta_time in self.world.delta_time_list[self.sleep_step:-1]:
+                    self.wait_time += delta_time
+            else:
+                for delta_time in self.world.delta_time_list[self.sleep_step:-1]:
+                    self.move(delta_time)
+                    self.clamp_position()
+            self.sleep_step = None
+
+        enemy = self.world.enemy
+
+        if enemy.state == EnemyState.ready.value:
+            self.check_move = False
+            self.move(self.world.delta_time)
+        elif enemy.state == EnemyState.watch.value:
+            if self.check_move is False:
+                self.move_index = self.world.random.randint(1, self.world.other_player_move_range)
+                self.check_move = True
+            if self.move_index == 1:
+                if self.wait_time == 0:
+                    self.after_wait_time = self.world.random.random() * (self.world.config.watch_time - 2)
+
+                self.wait_time += self.world.delta_time
+
+                if self.wait_time >= self.after_wait_time:
+                    self.move(self.world.delta_time)
+
+                if self.wait_time >= self.after_wait_time + 1:
+                    self.world.play_gunshot_sound()
+                    self.world.record_death(1)
+                    self.state = PlayerState.dead.value
+
+        self.clamp_position()
+        self.update_spatial_grid()
+        self.schedule_sleep()
+
+    def clamp_position(self):
+        if self.pos_x < 0:
+            self.pos_x = 0
+
+        if self.pos_x > self.world.field_width - self.width:
+            self.pos_x = self.world.field_width - self.width
+
+        if self.pos_y >= self.world.field_height - PLATFORM_HEIGHT - self.world.player.height:
+            self.pos_y = self.world.field_height - PLATFORM_HEIGHT - self.world.player.height
+
+    # 다음 스텝에 할 일이 없으면 스케줄러에서 빠진다
+    # 끝난 참가자는 계속, 이번 감시 시간에 움직이지 않을 참가자는 준비 시간까지, 움직일 참가자는 움직이기 직전까지 잔다
+    # 화면 밖의 참가자는 준비 시간에도 잠깐씩 자고, 감시 시간이 되기 직전에는 깨어있는다
+    def schedule_sleep(self):
+        world = self.world
+        if self.pos_y <= 28 or self.state == PlayerState.dead.value:
+            world.scheduler.sleep(self)
+        elif world.enemy.state == EnemyState.watch.value:
+            if self.move_index != 1:
+                world.scheduler.sleep_until_event(self, WorldEvent.enemy_ready)
+            elif self.after_wait_time - self.wait_time > WAKE_MARGIN * 2:
+                self.sleep_step = len(world.delta_time_list)
+                world.scheduler.sleep_until(self, world.game_timer + self.after_wait_time - self.wait_time - WAKE_MARGIN)
+        elif world.is_off_screen(self.pos_x + self.width / 2, self.pos_y + self.height / 2):
+            sleep_time = min(OFFSCREEN_UPDATE_INTERVAL,
+                             world.config.ready_time - world.enemy.state_time - WAKE_MARGIN)
+            if sleep_time > WAKE_MARGIN * 2:
+                self.sleep_step = len(world.delta_time_list)
+                world.scheduler.sleep_until(self, world.game_timer + sleep_time)
+
+    def get_render_index(self):
+        return PLAYER_STATE_RENDER_INDEX[self.state]
+
+
+class Heart(GameObject):
+    __slots__ = ('is_bigger', 'beat_interval')
+
+    def __init__(self, world, image_list, render_layer, collide_layer, pos_x=0, pos_y=0):
+        super().__init__(world, image_list, render_layer, collide_layer, pos_x, pos_y)
+        self.is_bigger = False
+        self.beat_interval = 0.5
+
+    def initialize(self):
+        self.is_bigger = False
+        self.beat_interval = 0.5
+
+    def update(self):
+        self.render_time += self.world.delta_time
+        enemy = self.world.enemy
+
+        if enemy.state == EnemyState.watch.value:
+            if enemy.beat_rate <= 8:
+                if self.render_time >= 1.06:
+                    self.render_time = 0
+            else:
+                if self.render_time >= 0.53:
+                    self.render_time = 0
+
+    def get_render_index(self):
+        render_index = 1
+        enemy = self.world.enemy
+
+        if enemy.state == EnemyState.watch.value:
+            if enemy.beat_rate <= 8:
+                if self.render_time < 0.53:
+                    render_index = 2
+            else:
+                if self.render_time < 0.265:
+                    render_index = 2
+
+        return render_index
+
+
+class Rod(GameObject):
+    __slots__ = ('player', 'effect', 'is_left', 'speed', 'key_down', 'save', 'is_missed', 'pass_count', 'miss_count')
+
+    def __init__(self, world, image_list, render_layer, collide_layer, pos_x=0, pos_y=0):
+        super().__init__(world, image_list, render_layer, collide_layer, pos_x, pos_y)
+        self.player = None
+        self.effect = None
+        self.is_left = True
+        self.speed = 50
+        self.key_down = False
+        self.save = False
+        self.is_missed = False
+        self.pass_count = 0
+        self.miss_count = 0
+
+    # 판 단위 통계, initialize는 준비 시간 내내 불리므로 따로 초기화한다
+    def reset_stats(self):
+        self.is_missed = False
+        self.pass_count = 0
+        self.miss_count = 0
+
+    # 막대가 한쪽 끝에 닿을 때마다 이번 왕복에서 놓쳤는지 센다
+    def count_pass(self):
+        self.pass_count += 1
+        if self.is_missed or self.save is False:
+            self.miss_count += 1
+        self.is_missed = False
+
+    def initialize(self):
+        self.is_left = True
+        self.speed = 50
+        self.pos_x = ROAD_POS_X
+        self.key_down = False
+        self.save = False
+        self.snap_previous_position()
+
+    # 이번 스텝에 지나온 구간 전체가 노란 구간과 겹치는지 확인
+    # 박자가 빨라서 한 스텝에 많이 움직여도 구간을 건너뛰지 않는다
+    def check_safe_zone(self):
+        self.rect = calc_rect_collider(self)
+        sweep_rect = self.rect.union(pygame.Rect(self.prev_pos_x, self.pos_y, self.col_width, self.col_height))
+        return sweep_rect.colliderect(calc_rect_collider(self.world.line_safe_zone))
+
+    def update(self):
+        world = self.world
+        enemy = world.enemy
+
+        if enemy.state == EnemyState.watch.value:
+            key = self.player.key_state
+
+            if key[OnKeyDown.space.value] and self.key_down is False:
+                self.key_down = True
+            elif not key[OnKeyDown.space.value] and self.key_down is True:
+                self.key_down = False
+
+            if self.is_left is True:
+                self.pos_x += enemy.beat_rate * self.speed * world.delta_time
+
+                if self.pos_x < 300:
+                    if self.key_down is True:
+                        if self.check_safe_zone():
+                            if self.save is False:
+                                self.effect.effect_on(self.pos_x - 6, self.pos_y - 6)
+                                self.save = True
+                        elif self.save is False:
+                            self.effect.effect_on(self.pos_x - 6, self.pos_y - 6)
+                            self.player.state = PlayerState.dead.value
+                            self.is_missed = True
+                else:
+                    self.pos_x = 300
+                    self.is_left = False
+                    self.count_pass()
+
+                    if self.save is False:
+                        self.player.state = PlayerState.dead.value
+
+                    self.save = False
+
+            elif self.is_left is False:
+                self.pos_x -= enemy.beat_rate * self.speed * world.delta_time
+
+                if self.pos_x > ROAD_POS_X:
+                    if self.key_down is True:
+                        if self.check_safe_zone():
+                            if self.save is False:
+                                self.effect.effect_on(self.pos_x - 6, self.pos_y - 6)
+                                self.save = True
+                        elif self.save is False:
+                            self.effect.effect_on(self.pos_x - 6, self.pos_y - 6)
+                            self.player.state = PlayerState.dead.value
+                            self.is_missed = True
+                else:
+                    self.pos_x = ROAD_POS_X
+                    self.is_left = True
+                    self.count_pass()
+
+                    if self.save is False:
+                        self.player.state = PlayerState.dead.value
+
+                    self.save = False
+        else:
+            self.initialize()
+
+
+class Effect(GameObject):
+    __slots__ = ('render_state',)
+
+    def __init__(self, world, image_list, render_layer, collide_layer, pos_x=0, pos_y=0):
+        super().__init__(world, image_list, render_layer, collide_layer, pos_x, pos_y)
+        self.render_time = 0
+        self.render_state = False
+
+    def initialize(self):
+        self.render_time = 0
+        self.render_state = False
+        self.pos_x = 0
+        self.pos_y = 0
+
+    def effect_on(self, pos_x, pos_y):
+        self.initialize()
+        self.render_state = True
+        self.pos_x = pos_x
+        self.pos_y = pos_y
+        self.snap_previous_position()
+        self.world.scheduler.wake(self)
+
+    def update(self):
+        if self.render_state is True:
+            self.render_time += self.world.delta_time
+
+        # 다 그린 이펙트는 다음 effect_on까지 잠든다
+        if self.render_state is not True or self.render_time >= EFFECT_FRAME_END_TIME[-1]:
+            self.world.scheduler.sleep(self)
+
+    def get_render_index(self):
+        if self.render_state is not True:
+            return 0
+
+        return EFFECT_RENDER_INDEX[bisect.bisect_right(EFFECT_FRAME_END_TIME, self.render_time)]
+
+
+# 충돌 계산을 위해 렉트 객체를 만들어주는 함수
+def calc_rect_collider(game_object):
+    # 렉트 객체 초기화
+    rect = pygame.Rect(0, 0, 0, 0)
+
+    # 오브젝트가 플레이어라면 충돌 렉트 사이즈에 맞게 재조정
+    if isinstance(game_object, Player) or isinstance(game_object, OtherPlayer):
+        rect.left = game_object.pos_x + game_object.width / 2 - game_object.col_width / 2
+        rect.top = game_object.pos_y + game_object.height - game_object.col_height
+        rect.width = game_object.col_width
+        rect.height = game_object.col_height
+    # 나머지 경우에는 이미지 크기와 위치를 그대로 적용
+    else:
+        rect.left = game_object.pos_x
+        rect.top = game_object.pos_y
+        rect.width = game_object.col_width
+        rect.height = game_object.col_height
+
+    return rect  # 렉트 객체를 반환
+
+
+# 스프라이트를 그리는 위치와 크기의 렉트, 픽셀 충돌의 렉트 사전 검사에 쓴다
+def calc_sprite_rect(game_object):
+    return pygame.Rect(game_object.pos_x, game_object.pos_y, game_object.width, game_object.height)
+
+
+# 두 객체가 렉트 충돌을 하는지 판별하는 함수
+def check_collide_rect(a, b):
+    # calc_rect_collider함수로 렉트 객체를 생성한 뒤 비교
+    a.rect = calc_rect_collider(a)
+    b.rect = calc_rect_collider(b)
+
+    # 충돌 결과를 리턴
+    return a.rect.colliderect(b.rect)
+
+
+# 한 판의 게임 상태를 전부 들고 있는 객체
+# 창, 오디오, 폰트 없이 step()에 시간과 키 입력을 직접 넣어서 진행시킬 수 있다
+class World:
+    # crowd_backend가 'numpy'면 다른 참가자를 OtherPlayer 객체 대신 crowd.ArrayCrowd 배열로 진행시킨다
+    # man_count를 주지 않으면 남녀 비율을 seed에서 정한다
+    def __init__(self, image_lists, sound_player=None, seed=None, player_count=MAX_PLAYER_COUNT,
+                 crowd_backend='object', man_count=None, config=None):
+        self.config = config if config is not None else GameConfig()
+        self.random = random.Random(seed)
+        self.sound_player = sound_player if sound_player is not None else NullSoundPlayer()
+
+        # 오브젝트 관리 리스트 생성
+        # 매 스텝 실제로 update를 부르는 것은 스케줄러에서 깨어있는 오브젝트뿐이다
+        self.update_object_list = []
+        self.scheduler = UpdateScheduler()
+
+        self.render_list = []
+        for i in range(RenderLayer.max_length.value):
+            self.render_list.append([])
+
+        self.collision_list = []
+        for i in range(CollideLayer.max_length.value):
+            self.collision_list.append([])
+
+        # 시체와의 픽셀 충돌에 쓰는 프레임별 마스크
+        self.mask_cache = MaskCache()
+
+        # 필드가 화면보다 크면 카메라가 보는 영역만 그리고, 배경은 타일로 나눠서 보이는 타일만 그린다
+        self.field_width = self.config.field_width
+        self.field_height = self.config.field_height
+        self.camera = Camera(SCREEN_WIDTH, SCREEN_HEIGHT, self.field_width, self.field_height)
+        self.background_tiles = TiledBackground(image_lists['background'][1], self.field_width, self.field_height)
+        self.near_view_step = -1
+        self.near_view_rect_list = []
+
+        self.spatial_grid_list = []
+        for i in range(CollideLayer.max_length.value):
+            self.spatial_grid_list.append(SpatialGrid())
+
+        self.delta_time = 0
+        self.delta_time_list = []
+        self.key_state = create_key_state()
+        self.game_timer = 0
+        self.other_player_move_range = self.config.get_move_range(0)
+        self.is_over = False
+        self.run_until_time_over = False
+        self.death_time_list = []
+
+        # profiler.Profiler를 넣으면 스텝과 렌더링의 구간별 시간을 잰다
+        self.profiler = None
+
+        # 오브젝트 초기화
+        self.background = GameObject(self, image_lists['background'], RenderLayer.back.value,
+                                     CollideLayer.none.value)
+
+        self.heart = Heart(self, image_lists['heart'], RenderLayer.ui_front.value, CollideLayer.none.value)
+        self.heart.pos_x = 0
+        self.heart.pos_y = SCREEN_HEIGHT - 45
+
+        self.line = GameObject(self, image_lists['line'], RenderLayer.ui_back.value, CollideLayer.none.value)
+        self.line.pos_x = 10
+        self.line.pos_y = SCREEN_HEIGHT - 28
+
+        self.line_safe_zone = GameObject(self, image_lists['line_safe_zone'], RenderLayer.ui_back.value,
+                                         CollideLayer.none.value)
+        self.line_safe_zone.pos_x = 140
+        self.line_safe_zone.pos_y = SCREEN_HEIGHT - 28
+
+        self.rod = Rod(self, image_lists['rod'], RenderLayer.ui_middle.value, CollideLayer.none.value)
+        self.rod.pos_x = ROAD_POS_X
+        self.rod.pos_y = SCREEN_HEIGHT - self.rod.height - 3
+
+        self.effect = Effect(self, image_lists['effect'], RenderLayer.ui_middle.value, CollideLayer.none.value)
+
+        self.enemy = Enemy(self, image_lists['enemy'], RenderLayer.middle.value, CollideLayer.none.value)
+        self.enemy.pos_x = self.field_width / 2 - self.enemy.width / 2
+        self.enemy.pos_y = 18
+
+        self.player = Player(self, image_lists['player'], RenderLayer.front_2.value, CollideLayer.group_a.value)
+        self.player.rod = self.rod
+        self.rod.player = self.player
+        self.rod.effect = self.effect
+
+        # 사람 참가자 목록, 보통은 self.player 하나이고 서버에서는 add_human_player로 늘어난다
+        self.image_lists = image_lists
+        self.human_player_list = [self.player]
+
+        if man_count is None:
+            man_count = self.random.randint(int((player_count + 1) / 3 * 1), int((player_count + 1) / 3 * 2))
+        woman_count = player_count - man_count
+        self.player_count = player_count
+        self.man_count = man_count
+        self.crowd_backend = crowd_backend
+
+        self.crowd = None
+        if crowd_backend == 'numpy':
+            from crowd import ArrayCrowd
+            self.crowd = ArrayCrowd(self, image_lists['man'], image_lists['woman'], man_count, woman_count)
+        else:
+            for i in range(man_count):
+                OtherPlayer(self, image_lists['man'], RenderLayer.front_1.value, CollideLayer.group_b.value)
+
+            for i in range(woman_count):
+                OtherPlayer(self, image_lists['woman'], RenderLayer.front_1.value, CollideLayer.group_b.value)
+
+        if self.config.pixel_collision:
+            for name in ('player', 'man', 'woman'):
+                self.mask_cache.prepare(image_lists[name])
+
+        self.reset()
+
+    # 새 판을 시작할 수 있도록 모든 상태를 되돌린다
+    # seed를 주면 난수를 다시 시드해서 같은 입력이면 같은 판이 나오게 한다
+    def reset(self, seed=None):
+        if seed is not None:
+            self.random.seed(seed)
+            if self.crowd is not None:
+                self.crowd.seed(self.random.getrandbits(64))
+
+        self.delta_time = 0
+        self.delta_time_list = []
+        self.key_state = create_key_state()
+        self.game_timer = 0
+        self.other_player_move_range = self.config.get_move_range(0)
+        self.is_over = False
+        self.death_time_list = []
+        self.near_view_step = -1
+        for player in self.human_player_list:
+            player.rod.reset_stats()
+
+        for spatial_grid in self.spatial_grid_list:
+            spatial_grid.clear()
+
+        for game_object in self.update_object_list:
+            game_object.initialize()
+            game_object.snap_previous_position()
+        self.scheduler.reset(self.update_object_list)
+
+        # 사람 참가자가 여럿이면 첫 참가자 말고는 출발선에 흩어서 세운다
+        for player in self.human_player_list[1:]:
+            player.pos_x = self.random.randint(0, self.field_width - player.width)
+            player.snap_previous_position()
+
+        if self.crowd is not None:
+            self.crowd.initialize()
+            self.crowd.save_previous_position()
+
+    # 사람 참가자를 한 명 더 넣는다, 참가자마다 자기 입력과 심장박동 막대를 가진다
+    # 업데이트 순서는 기본 참가자와 같게 막대와 이펙트는 적보다 앞, 참가자는 사람 참가자 끝에 둔다
+    def add_human_player(self):
+        image_lists = self.image_lists
+        rod = Rod(self, image_lists['rod'], RenderLayer.ui_middle.value, CollideLayer.none.value)
+        rod.pos_x = ROAD_POS_X
+        rod.pos_y = self.rod.pos_y
+        effect = Effect(self, image_lists['effect'], RenderLayer.ui_middle.value, CollideLayer.none.value)
+        player = Player(self, image_lists['player'], RenderLayer.front_2.value, CollideLayer.group_a.value)
+        player.rod = rod
+        rod.player = player
+        rod.effect = effect
+
+        del self.update_object_list[-3:]
+        index = self.update_object_list.index(self.enemy)
+        self.update_object_list[index:index] = [rod, effect]
+        index = self.update_object_list.index(self.human_player_list[-1]) + 1
+        self.update_object_list.insert(index, player)
+        self.human_player_list.append(player)
+
+        for game_object in (rod, effect, player):
+            game_object.initialize()
+            game_object.snap_previous_position()
+        self.scheduler.reset(self.update_object_list)
+        return player
+
+    # 리플레이 검증용으로 게임 상태 전체를 해시한다
+    def get_state_hash(self):
+        sha = hashlib.sha256()
+        player = self.player
+        enemy = self.enemy
+        rod = self.rod
+        sha.update(struct.pack('<ddiddB', self.game_timer, enemy.state_time, enemy.state, enemy.beat_rate,
+                               rod.pos_x, rod.save))
+        sha.update(struct.pack('<dddi', player.pos_x, player.pos_y, player.speed, player.state))
+
+        for game_object in self.collision_list[CollideLayer.group_b.value]:
+            sha.update(struct.pack('<ddi', game_object.pos_x, game_object.pos_y, game_object.state))
+
+        if self.crowd is not None:
+            sha.update(self.crowd.pos_x.tobytes())
+            sha.update(self.crowd.pos_y.tobytes())
+            sha.update(self.crowd.state.tobytes())
+
+        return sha.digest()
+
+    # 참가자가 죽은 시간을 남긴다 (난이도 분석용)
+    def record_death(self, count):
+        self.death_time_list.extend([self.game_timer] * count)
+
+    # (결승선 도착, 사망, 전체) 참가자 수
+    def count_crowd_result(self):
+        if self.crowd is not None:
+            return self.crowd.count_success(), self.crowd.count_state(PlayerState.dead.value), self.crowd.count
+
+        success_count = 0
+        dead_count = 0
+        other_player_list = self.collision_list[CollideLayer.group_b.value]
+        for other_player in other_player_list:
+            if other_player.state == PlayerState.dead.value:
+                dead_count += 1
+            elif other_player.pos_y <= 28:
+                success_count += 1
+        return success_count, dead_count, len(other_player_list)
+
+    # 사람 참가자마다 화면에 보이는 영역을 여유를 두고 넓힌 렉트, 스텝마다 한 번만 계산한다
+    # 렌더링 카메라는 보간된 위치를 따라가므로 시뮬레이션에서는 이번 스텝의 위치로 따로 계산한다
+    def get_near_view_rect_list(self):
+        step = len(self.delta_time_list)
+        if self.near_view_step != step:
+            self.near_view_step = step
+            self.near_view_rect_list = [
+                self.camera.calc_view_rect(player.pos_x + player.width / 2, player.pos_y + player.height / 2)
+                .inflate(OFFSCREEN_MARGIN * 2, OFFSCREEN_MARGIN * 2)
+                for player in self.human_player_list
+            ]
+        return self.near_view_rect_list
+
+    # 필드 좌표가 어느 사람 참가자의 화면 근처에도 없는지, 필드가 화면보다 크지 않으면 항상 False
+    def is_off_screen(self, pos_x, pos_y):
+        if not self.camera.is_scrolling:
+            return False
+        for rect in self.get_near_view_rect_list():
+            if rect.collidepoint(pos_x, pos_y):
+                return False
+        return True
+
+    def play_gunshot_sound(self):
+        index = self.random.randint(0, 5)
+        self.sound_player.play(SoundEvent.gunshot, index)
+
+    # delta_time(초)만큼 게임을 진행시킨다
+    # 한 스텝은 시간 진행, 오브젝트 갱신, 충돌 처리 순서로 진행된다
+    def step(self, delta_time, key_state=None):
+        if self.is_over:
+            return
+
+        profiler = self.profiler
+        if profiler is None:
+            self.advance_time(delta_time, key_state)
+            self.update_objects()
+            self.update_collision()
+            return
+
+        profiler.begin('update')
+        self.advance_time(delta_time, key_state)
+        self.update_objects()
+        profiler.end()
+        profiler.begin('collision')
+        self.update_collision()
+        profiler.end()
+
+    def advance_time(self, delta_time, key_state=None):
+        self.delta_time = delta_time
+        if key_state is not None:
+            self.key_state = key_state
+            self.player.key_state = key_state
+
+        # 잠든 오브젝트는 움직이지 않으므로 이전 위치가 이미 현재 위치와 같다
+        for game_object in self.scheduler.active_list:
+            game_object.save_previous_position()
+
+        if self.crowd is not None:
+            self.crowd.save_previous_position()
+
+        self.game_timer += delta_time
+        self.delta_time_list.append(delta_time)
+        self.other_player_move_range = self.config.get_move_range(self.game_timer)
+
+        if self.game_timer >= self.config.remain_time:
+            self.game_timer = self.config.remain_time
+            for player in self.human_player_list:
+                player.state = PlayerState.dead.value
+            if self.run_until_time_over:
+                self.is_over = True
+
+        self.scheduler.begin_step(self.game_timer)
+
+    def update_objects(self):
+        profiler = self.profiler
+        if profiler is None:
+            for game_object in self.scheduler.iter_active():
+                game_object.update()
+
+            if self.crowd is not None:
+                self.crowd.update()
+            return
+
+        # 같은 클래스가 연달아 있는 구간을 하나로 묶어서 잰다
+        perf_counter = time.perf_counter
+        run_name = None
+        run_start_time = 0
+        for game_object in self.scheduler.iter_active():
+            name = type(game_object).__name__
+            if name != run_name:
+                now = perf_counter()
+                if run_name is not None:
+                    profiler.add('update.' + run_name, run_start_time, now)
+                run_name = name
+                run_start_time = now
+            game_object.update()
+        if run_name is not None:
+            profiler.add('update.' + run_name, run_start_time, perf_counter())
+
+        if self.crowd is not None:
+            profiler.begin('update.ArrayCrowd')
+            self.crowd.update()
+            profiler.end()
+
+    def update_collision(self):
+        spatial_grid = self.spatial_grid_list[CollideLayer.group_b.value]
+        for player in self.human_player_list:
+            player.restore_speed()
+
+            # 시체와 닿아있으면 느려진다, 플레이어 근처 칸의 시체만 확인한다
+            if self.config.pixel_collision:
+                # 렉트가 겹치는 시체만 프레임 마스크로 다시 확인한다
+                player.rect = calc_sprite_rect(player)
+                image = player.image_list[player.get_render_index()]
+                for item, item_rect in spatial_grid.query_static_rects(player.rect):
+                    if self.mask_cache.overlap(image, player.rect, self.get_corpse_image(item), item_rect):
+                        player.speed = 1
+                        break
+                continue
+
+            player.rect = calc_rect_collider(player)
+            for item in spatial_grid.query_static(player.rect):
+                player.speed = 1
+                break
+
+    # 정적 인덱스에 들어간 시체의 이미지, 군중 배열이면 참가자 번호로 찾는다
+    def get_corpse_image(self, item):
+        if self.crowd is not None:
+            return self.crowd.get_image(item)
+        return item.image_list[item.get_render_index()]
+
+    # 카메라를 이번 프레임의 플레이어 위치에 맞추고 필드에서 보이는 영역을 돌려준다
+    def update_camera(self, alpha=1.0):
+        player = self.player
+        pos_x, pos_y = player.get_render_position(alpha)
+        self.camera.look_at(pos_x + player.width / 2, pos_y + player.height / 2)
+        return self.camera.get_view_rect()
+
+    # 렌더 레이어에서 렉트 근처에 있을 수 있는 오브젝트
+    # 필드가 크면 다른 참가자는 공간 인덱스에서 보이는 칸만 찾아서 원래 그리는 순서로 정렬한다
+    def get_visible_objects(self, layer_index, rect):
+        if layer_index != RenderLayer.front_1.value or not self.camera.is_scrolling or self.crowd is not None:
+            return self.render_list[layer_index]
+
+        spatial_grid = self.spatial_grid_list[CollideLayer.group_b.value]
+        margin = spatial_grid.cell_size * 2
+        visible_set = set(spatial_grid.query_moving(rect))
+        visible_set.update(spatial_grid.query_static(rect.inflate(margin, margin)))
+        return sorted(visible_set, key=attrgetter('update_order'))
+
+    # 한 레이어에서 보이는 스프라이트를 (키, 이미지, 화면 x, 화면 y)로 돌려준다
+    # UI 레이어는 화면 좌표에, 나머지는 필드 좌표에 있다
+    def iter_layer_sprites(self, layer_index, alpha, view_rect):
+        if layer_index >= RenderLayer.ui_back.value:
+            rect = pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+        else:
+            rect = view_rect
+
+        for game_object in self.get_visible_objects(layer_index, rect):
+            index = game_object.get_render_index()
+            if index > 0:
+                image = game_object.image_list[index]
+                pos_x, pos_y = game_object.get_render_position(alpha)
+                if rect.colliderect((pos_x, pos_y, game_object.width, game_object.height)):
+                    yield game_object, image, pos_x - rect.x, pos_y - rect.y
+
+        if layer_index == RenderLayer.front_1.value and self.crowd is not None:
+            yield from self.crowd.iter_sprites(alpha, view_rect)
+
+    # 그릴 스프라이트를 렌더 레이어 순서대로 (키, 이미지, 화면 x, 화면 y) 형태로 돌려준다
+    # alpha는 지난 스텝과 이번 스텝 사이의 보간 비율
+    # 배경 레이어는 background_tiles로 따로 그리므로 돌려주지 않는다
+    def iter_sprites(self, first_layer=RenderLayer.none.value, alpha=1.0):
+        view_rect = self.update_camera(alpha)
+        for layer_index in range(max(first_layer, RenderLayer.middle.value), RenderLayer.max_length.value):
+            yield from self.iter_layer_sprites(layer_index, alpha, view_rect)
+
+    # 레이어마다 그릴 (이미지, 위치)를 모아서 blits 한 번으로 넘긴다
+    def render(self, surface, alpha=1.0):
+        profiler = self.profiler
+        view_rect = self.update_camera(alpha)
+        for layer_index in range(RenderLayer.max_length.value):
+            if profiler is not None:
+                profiler.begin('render.' + RenderLayer(layer_index).name)
+
+            if layer_index == RenderLayer.back.value:
+                self.background_tiles.blit(surface, view_rect.x, view_rect.y)
+            else:
+                blit_list = [(image, (pos_x, pos_y)) for key, image, pos_x, pos_y
+                             in self.iter_layer_sprites(layer_index, alpha, view_rect)]
+                if blit_list:
+                    surface.blits(blit_list, False)
+
+            if profiler is not None:
+                profiler.end()